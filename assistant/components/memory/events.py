@@ -0,0 +1,3 @@
+MEMORY_STORED = "memory.stored"
+MEMORY_MODEL_PROGRESS = "memory.model.progress"
+MEMORY_READY = "memory.ready"
@@ -0,0 +1,263 @@
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryIndexConfig(BaseModel):
+    # Exact search up to this many candidates, the IVF index above.
+    flat_threshold: int = 10000
+    # Inverted lists per square root of the memories at training time.
+    lists_per_sqrt: float = 1.0
+    # Lists scored per query, more is slower with better recall.
+    nprobe: int = 12
+    # Retrain once the index holds this many times the memories it was trained on.
+    retrain_growth: float = 2.0
+    train_iterations: int = 10
+    # Training sample size per list.
+    train_sample: int = 40
+
+
+class MemoryRecord(BaseModel):
+    id: str
+    summary: str
+    entities: List[str] = Field(default_factory=list)
+    topics: List[str] = Field(default_factory=list)
+    created_at: datetime = Field(default_factory=datetime.now)
+
+
+class MemoryHit(BaseModel):
+    memory: MemoryRecord
+    score: float
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, np.finfo(np.float32).eps)
+
+
+def kmeans(vectors: np.ndarray, count: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means, unit centroids maximising cosine similarity."""
+    centroids = vectors[rng.choice(len(vectors), count, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        empty = np.flatnonzero(np.bincount(assignments, minlength=count) == 0)
+        sums[empty] = vectors[rng.choice(len(vectors), len(empty))]
+        centroids = normalize(sums)
+    return centroids
+
+
+class MemoryIndex:
+    """Cosine index over memory embeddings, exact when small and IVF when large.
+
+    Unit vectors live in a growable memory-mapped matrix, records in an
+    append-only log whose line number is the row. Entities and topics have
+    inverted lists for filtering. Past `flat_threshold` memories, k-means
+    centroids split the rows into inverted lists and a query only scores the
+    `nprobe` lists closest to it. The log is opened per append, so a failed
+    load leaves no handle behind.
+    """
+
+    def __init__(self, path: Optional[str], config: Optional[MemoryIndexConfig] = None, capacity: int = 1024):
+        self.path = path
+        self.config = config or MemoryIndexConfig()
+        self.capacity = capacity
+        self.vectors: Optional[np.ndarray] = None
+        self.records: List[MemoryRecord] = []
+        self.entities: Dict[str, List[int]] = {}
+        self.topics: Dict[str, List[int]] = {}
+
+        self.centroids: Optional[np.ndarray] = None
+        self.trained_size = 0
+        self.lists: List[np.ndarray] = []
+        self.pending: List[List[int]] = []
+
+        self.rng = np.random.default_rng(0)
+        self.lock = threading.Lock()
+        self.log_path = None if path is None else os.path.join(path, "memories.jsonl")
+
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    @property
+    def dim(self) -> Optional[int]:
+        return None if self.vectors is None else self.vectors.shape[1]
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _load(self) -> None:
+        vectors_path = os.path.join(self.path, "vectors.npy")
+        if not os.path.exists(vectors_path):
+            return
+
+        self.vectors = np.load(vectors_path, mmap_mode="r+")
+        if os.path.exists(self.log_path):
+            with open(self.log_path) as f:
+                # NOTE: Vectors are flushed before their record is logged, rows past the log are a torn write.
+                for line in f:
+                    self._index_record(MemoryRecord.model_validate_json(line))
+
+        centroids_path = os.path.join(self.path, "centroids.npy")
+        if os.path.exists(centroids_path) and self.records:
+            self.centroids = np.load(centroids_path)
+            self.trained_size = len(self.records)
+            self._assign_all()
+
+    def _index_record(self, record: MemoryRecord) -> None:
+        row = len(self.records)
+        self.records.append(record)
+        for entity in {e.lower() for e in record.entities}:
+            self.entities.setdefault(entity, []).append(row)
+        for topic in {t.lower() for t in record.topics}:
+            self.topics.setdefault(topic, []).append(row)
+
+    def _reserve(self, dim: int, required: int) -> None:
+        if self.vectors is not None and required <= len(self.vectors):
+            return
+
+        capacity = max(required, self.capacity if self.vectors is None else 2 * len(self.vectors))
+        if self.path is None:
+            vectors = np.zeros((capacity, dim), dtype=np.float32)
+        else:
+            vectors_path = os.path.join(self.path, "vectors.npy")
+            vectors = np.lib.format.open_memmap(
+                vectors_path + ".tmp", mode="w+", dtype=np.float32, shape=(capacity, dim)
+            )
+
+        if self.vectors is not None:
+            vectors[: len(self.records)] = self.vectors[: len(self.records)]
+
+        if self.path is not None:
+            vectors.flush()
+            del vectors
+            self.vectors = None
+            os.replace(vectors_path + ".tmp", vectors_path)
+            vectors = np.load(vectors_path, mmap_mode="r+")
+        self.vectors = vectors
+
+    def add(self, vector: np.ndarray, record: MemoryRecord) -> None:
+        self.add_many(np.asarray(vector)[np.newaxis, :], [record])
+
+    def add_many(self, vectors: np.ndarray, records: Sequence[MemoryRecord]) -> None:
+        vectors = normalize(vectors)
+        with self.lock:
+            if self.dim is not None and vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional embeddings, got {vectors.shape[1]}")
+
+            start = len(self.records)
+            self._reserve(vectors.shape[1], start + len(vectors))
+            self.vectors[start : start + len(vectors)] = vectors
+            if isinstance(self.vectors, np.memmap):
+                self.vectors.flush()
+
+            for record in records:
+                self._index_record(record)
+            if self.log_path is not None:
+                with open(self.log_path, "a") as log:
+                    log.write("".join(record.model_dump_json() + "\n" for record in records))
+
+            if self.centroids is not None:
+                self._assign(start, len(self.records))
+            if len(self.records) >= self.config.flat_threshold and (
+                self.centroids is None or len(self.records) >= self.trained_size * self.config.retrain_growth
+            ):
+                self._train()
+
+    def _train(self) -> None:
+        size = len(self.records)
+        count = max(1, int(np.sqrt(size) * self.config.lists_per_sqrt))
+        sample = self.rng.choice(size, min(size, count * self.config.train_sample), replace=False)
+        sample.sort()
+
+        self.centroids = kmeans(np.asarray(self.vectors[sample]), count, self.config.train_iterations, self.rng)
+        self.trained_size = size
+        self._assign_all()
+        if self.path is not None:
+            np.save(os.path.join(self.path, "centroids.npy"), self.centroids)
+        logger.info(f"Trained {count} inverted lists on {len(sample)} of {size} memories")
+
+    def _assign_all(self) -> None:
+        self.pending = [[] for _ in range(len(self.centroids))]
+        self.lists = [np.zeros(0, dtype=np.int64) for _ in range(len(self.centroids))]
+        self._assign(0, len(self.records))
+
+    def _assign(self, start: int, end: int, chunk: int = 16384) -> None:
+        for offset in range(start, end, chunk):
+            stop = min(end, offset + chunk)
+            assignments = np.argmax(self.vectors[offset:stop] @ self.centroids.T, axis=1)
+            for row, list_id in enumerate(assignments.tolist(), offset):
+                self.pending[list_id].append(row)
+
+    def _list(self, list_id: int) -> np.ndarray:
+        # NOTE: New rows are kept in a Python list and merged into the array on the first query that needs them.
+        if self.pending[list_id]:
+            pending = np.asarray(self.pending[list_id], dtype=np.int64)
+            self.lists[list_id] = np.concatenate([self.lists[list_id], pending])
+            self.pending[list_id] = []
+        return self.lists[list_id]
+
+    def _candidates(self, entities: Optional[Iterable[str]], topics: Optional[Iterable[str]]) -> Optional[np.ndarray]:
+        """Rows having any of the entities and any of the topics, None without filters."""
+        candidates = None
+        for wanted, inverted in ((entities, self.entities), (topics, self.topics)):
+            if not wanted:
+                continue
+            rows = {row for value in wanted for row in inverted.get(value.lower(), [])}
+            candidates = rows if candidates is None else candidates & rows
+        if candidates is None:
+            return None
+        return np.fromiter(sorted(candidates), dtype=np.int64, count=len(candidates))
+
+    def search(
+        self,
+        vector: np.ndarray,
+        k: int = 5,
+        entities: Optional[Iterable[str]] = None,
+        topics: Optional[Iterable[str]] = None,
+    ) -> List[MemoryHit]:
+        """Top `k` memories by cosine similarity, restricted to any of `entities` and any of `topics`."""
+        query = normalize(vector).reshape(-1)
+        with self.lock:
+            if not self.records:
+                return []
+
+            candidates = self._candidates(entities, topics)
+            if candidates is not None and len(candidates) <= self.config.flat_threshold:
+                rows = candidates
+            elif self.centroids is None:
+                rows = candidates
+            else:
+                probes = self.config.nprobe
+                nearest = np.argpartition(-(self.centroids @ query), min(probes, len(self.centroids)) - 1)[:probes]
+                rows = np.concatenate([self._list(int(list_id)) for list_id in nearest])
+                if candidates is not None:
+                    rows = rows[np.isin(rows, candidates, assume_unique=True)]
+
+            if rows is None:
+                scores = self.vectors[: len(self.records)] @ query
+                rows = np.arange(len(self.records))
+            else:
+                if len(rows) == 0:
+                    return []
+                scores = self.vectors[rows] @ query
+
+            k = min(k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [MemoryHit(memory=self.records[int(rows[i])], score=float(scores[i])) for i in top]
+
+    def close(self) -> None:
+        with self.lock:
+            if isinstance(self.vectors, np.memmap):
+                self.vectors.flush()
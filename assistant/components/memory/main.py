@@ -0,0 +1,174 @@
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from queue import Queue
+from typing import Deque, List, Optional
+
+import numpy as np
+from ollama import Client
+from pydantic import BaseModel
+
+from assistant.components.shadow.main import MemorySummary
+from assistant.core import service
+from assistant.core.component import Component
+from assistant.utils import observe
+from assistant.utils.provisioning import ProvisionStatus, PullProgress, RetryConfig, provisioner
+from assistant.utils.stats import LatencyStats, LatencySummary
+
+from . import events
+from .index import MemoryHit, MemoryIndex, MemoryIndexConfig, MemoryRecord
+
+
+class MemoryStats(BaseModel):
+    memories: int
+    lists: int
+    # Summaries held back until the model is ready, and those dropped meanwhile.
+    pending: int = 0
+    dropped: int = 0
+    # Index lookup only, the query embedding is not included.
+    search: LatencySummary
+
+
+class Memory(Component):
+    @property
+    def version(self) -> str:
+        return "0.0.1"
+
+    @property
+    def events(self) -> List[str]:
+        return [events.MEMORY_STORED, events.MEMORY_MODEL_PROGRESS, events.MEMORY_READY]
+
+    def initialize(self) -> None:
+        super().initialize()
+        self.started = time.perf_counter()
+        self.url = url = self.get_config("url", "http://localhost:11434")
+        self.model = self.get_config("model", "nomic-embed-text")
+        self.keep_alive = self.get_config("keep_alive", "30m")
+        self.client = Client(url)
+
+        self.index = MemoryIndex(
+            self.get_config("path", "./.storage/memory"),
+            MemoryIndexConfig.model_validate(self.get_config("index", {})),
+        )
+        self.search_latency = LatencyStats()
+
+        self.summaries = Queue()
+        observe(self.summaries, self.store_summary)
+        self.logger.info(f"Plugin '{self.name}' initialized with {len(self.index)} memories")
+
+        # NOTE: Summaries are held back until the embedding model is on the server,
+        # only the newest `max_pending` are kept so a model that never arrives cannot pile them up.
+        self.ready = threading.Event()
+        self.pending: Deque[MemorySummary] = deque(maxlen=self.get_config("max_pending", 100))
+        self.pending_lock = threading.Lock()
+        self.dropped = 0
+        self.provision_status = ProvisionStatus(model=self.model)
+        self.provision_retry = RetryConfig.model_validate(self.get_config("provision_retry", {}))
+        self.provision_failures = 0
+        self.retry_timer: Optional[threading.Timer] = None
+        self.provision()
+
+    def shutdown(self) -> None:
+        super().shutdown()
+        if self.retry_timer is not None:
+            self.retry_timer.cancel()
+        self.index.close()
+        self.logger.info(f"Plugin '{self.name}' shutdown done.")
+
+    def on_model_progress(self, progress: PullProgress):
+        self.provision_status.progress = progress
+        self.proxy(events.MEMORY_MODEL_PROGRESS)(progress)
+
+    def provision(self):
+        provisioner.ensure(self.url, self.model, on_progress=self.on_model_progress).add_done_callback(
+            self.on_model_provisioned
+        )
+
+    def on_model_provisioned(self, future: "Future[ProvisionStatus]"):
+        if future.exception() is not None:
+            self.provision_failures += 1
+            delay = self.provision_retry.delay(self.provision_failures)
+            self.provision_status.error = str(future.exception())
+            self.logger.error(
+                f"Model '{self.model}' unavailable, memories are held back, retrying in {delay:.0f}s: {self.provision_status.error}"
+            )
+            self.retry_timer = threading.Timer(delay, self.provision)
+            self.retry_timer.daemon = True
+            self.retry_timer.start()
+            return
+
+        self.provision_status = future.result().model_copy(
+            update={"progress": self.provision_status.progress, "time_to_ready": time.perf_counter() - self.started}
+        )
+        with self.pending_lock:
+            self.ready.set()
+            for summary in self.pending:
+                self.summaries.put_nowait(summary)
+            self.pending.clear()
+        self.logger.info(f"Ready {self.provision_status.time_to_ready:.2f}s after initialization")
+        self.proxy(events.MEMORY_READY)(self.provision_status)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        response = self.client.embed(model=self.model, input=texts, keep_alive=self.keep_alive)
+        return np.asarray(response.embeddings, dtype=np.float32)
+
+    def on_summary(self, summary: MemorySummary):
+        with self.pending_lock:
+            if not self.ready.is_set():
+                if len(self.pending) == self.pending.maxlen:
+                    self.dropped += 1
+                    self.logger.warning(f"Model '{self.model}' not ready, dropped the oldest held back summary")
+                self.pending.append(summary)
+                return
+        self.summaries.put_nowait(summary)
+
+    def store_summary(self, summary: MemorySummary):
+        try:
+            self.remember(summary.summary, summary.entities, summary.topics)
+        except Exception as e:
+            self.logger.exception(f"Failed to store memory: {e}")
+
+    @service
+    def remember(
+        self, summary: str, entities: Optional[List[str]] = None, topics: Optional[List[str]] = None
+    ) -> MemoryRecord:
+        record = MemoryRecord(id=str(uuid.uuid4()), summary=summary, entities=entities or [], topics=topics or [])
+        self.index.add(self.embed([summary])[0], record)
+        self.logger.info(f"Stored memory {record.id}, {len(self.index)} in total")
+        self.proxy(events.MEMORY_STORED)(record)
+        return record
+
+    @service
+    def recall(
+        self,
+        query: str,
+        k: int = 5,
+        entities: Optional[List[str]] = None,
+        topics: Optional[List[str]] = None,
+    ) -> List[MemoryHit]:
+        """Memories closest to `query`, restricted to any of `entities` and any of `topics` when given."""
+        if not self.ready.is_set():
+            self.logger.warning(f"Model '{self.model}' not ready, nothing recalled")
+            return []
+
+        vector = self.embed([query])[0]
+        started = time.perf_counter()
+        hits = self.index.search(vector, k, entities, topics)
+        self.search_latency.add(time.perf_counter() - started)
+        return hits
+
+    @service
+    def model_status(self) -> ProvisionStatus:
+        return self.provision_status
+
+    @service
+    def memory_stats(self) -> MemoryStats:
+        return MemoryStats(
+            memories=len(self.index),
+            lists=0 if self.index.centroids is None else len(self.index.centroids),
+            search=self.search_latency.summary(),
+            pending=len(self.pending),
+            dropped=self.dropped,
+        )
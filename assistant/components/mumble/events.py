@@ -3,6 +3,9 @@ MUMBLE_CLIENT_DISCONNECTED = "mumble.client.disconnected"
 
 MUMBLE_AUDIO_CHUNK = "mumble.audio.chunk"
 MUMBLE_AUDIO_SPEECH = "mumble.audio.speech"
+MUMBLE_AUDIO_SPEECH_SPECULATIVE = "mumble.audio.speech.speculative"
+MUMBLE_AUDIO_SPEECH_SPECULATION_CANCELLED = "mumble.audio.speech.speculation_cancelled"
+MUMBLE_AUDIO_SPEECH_PARTIAL = "mumble.audio.speech.partial"
 
 MUMBLE_AUDIO_PLAY = "mumble.audio.play"
 
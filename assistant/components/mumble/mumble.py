@@ -1,9 +1,9 @@
 import threading
-from datetime import datetime
+from datetime import datetime, timedelta
 from functools import partial
 from queue import Queue
 from time import sleep
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import numpy as np
 import reactivex as rx
@@ -35,6 +35,11 @@ from uuid import uuid4, UUID
 
 from . import events
 
+# Fake silence fed once a user's packets stop for SILENCE_AFTER_MS, as many chunks as the VAD endpoint needs.
+SILENCE_AFTER_MS = 100
+SILENCE_CHUNKS = 16
+SILENCE_CHUNK_MS = 32
+
 
 class Sentence(BaseModel):
     text: str
@@ -45,6 +50,8 @@ class Sentence(BaseModel):
 class SourceInfo(BaseModel):
     user: str
     sequence_id: int
+    # Channel the user spoke in, conversations are keyed by it.
+    channel: Optional[str] = None
 
 
 class SpeechSegment(BaseModel):
@@ -53,6 +60,9 @@ class SpeechSegment(BaseModel):
     data: NDArray[np.int16] = Field(repr=False)
     timestamp: datetime = Field(default_factory=datetime.now)
     segment_id: UUID = Field(default_factory=uuid4)
+    speech_end: Optional[datetime] = None
+    speculative: bool = False
+    partial: bool = False
 
     class Config:
         arbitrary_types_allowed = True
@@ -70,6 +80,9 @@ class MumbleInterface(Component):
             events.MUMBLE_CLIENT_DISCONNECTED,
             events.MUMBLE_AUDIO_CHUNK,
             events.MUMBLE_AUDIO_SPEECH,
+            events.MUMBLE_AUDIO_SPEECH_SPECULATIVE,
+            events.MUMBLE_AUDIO_SPEECH_SPECULATION_CANCELLED,
+            events.MUMBLE_AUDIO_SPEECH_PARTIAL,
             events.MUMBLE_AUDIO_PLAY,
             events.MUMBLE_PLAYBACK_DONE,
             events.MUMBLE_PLAYBACK_IN_PROGRESS,
@@ -102,6 +115,13 @@ class MumbleInterface(Component):
 
         self.fixed_chunker_for_source: Dict[str, FixedLengthAudioChunker] = {}
         self.speech_filter_for_source: Dict[str, VadFilter] = {}
+        self.utterance_for_source: Dict[str, UUID] = {}
+        self.sequence_by_user: dict[str, int] = {}
+        self.speculate_after = self.get_config("speculate_after", None)
+        self.stream_every = self.get_config("stream_every", None)
+        self.fake_silence_timers: dict[str, threading.Timer] = {}
+        self.last_packet_at: dict[str, datetime] = {}
+        self.silence_lock = threading.RLock()
 
         self.client.callbacks.set_callback(
             PYMUMBLE_CLBK_SOUNDRECEIVED, self.on_sound_from_source
@@ -125,8 +145,6 @@ class MumbleInterface(Component):
         )
         self.client.is_ready()  # waits connection
 
-        self.fake_silence_timers: dict[str, threading.Timer] = {}
-
         if mumble_channel:
             if channel := self.client.channels.find_by_name(mumble_channel):
                 channel: Channel = channel
@@ -138,8 +156,6 @@ class MumbleInterface(Component):
             user: User = self.client.users[session["session"]]
             self.add_speech_filter(user)
 
-        self.sequence_by_user: dict[str, int] = {}
-
         # self.event_bus.subscribe(events.MUMBLE_AUDIO_PLAY, self.on_play)
         self.logger.info(f"Plugin '{self.name}' initialized and ready")
 
@@ -155,8 +171,13 @@ class MumbleInterface(Component):
             self.speech_filter_for_source[username] = VadFilter(
                 callback=partial(self.on_speech, source),
                 min_speech=16,
-                silence_end=16,
+                silence_end=SILENCE_CHUNKS,
                 preroll_size=16,
+                speculate_after=self.speculate_after,
+                on_speculate=partial(self.on_speculative_speech, source),
+                on_speculation_cancel=partial(self.on_speculation_cancel, source),
+                progress_every=self.stream_every,
+                on_progress=partial(self.on_partial_speech, source),
             )
 
         if username not in self.fixed_chunker_for_source:
@@ -172,7 +193,6 @@ class MumbleInterface(Component):
             silence = create_empty_audio(32, PYMUMBLE_SAMPLERATE, np.int16)
             self.fixed_chunker_for_source[username](silence)
 
-
     def shutdown(self) -> None:
         super().shutdown()
         self.logger.info(f"Plugin '{self.name}' disconnection from server.")
@@ -190,20 +210,94 @@ class MumbleInterface(Component):
         username = source.get("name", None)
         assert username is not None
 
-        # HACK: Adding some silence if there was no new segments of audio
-        if username in self.fake_silence_timers:
-            self.fake_silence_timers[username].cancel()
+        with self.silence_lock:
+            self.last_packet_at[username] = datetime.now()
+            # HACK: Adding some silence if there was no new segments of audio
+            if username in self.fake_silence_timers:
+                self.fake_silence_timers[username].cancel()
+                del self.fake_silence_timers[username]
+
+            self.schedule_silence(username, SILENCE_AFTER_MS / 1000, SILENCE_CHUNKS)
+            self.fixed_chunker_for_source[username](chunk.pcm)
+
+    def schedule_silence(self, username: str, delay: float, remaining: int):
+        timer = threading.Timer(delay, self.on_fake_silence, args=(username, remaining))
+        self.fake_silence_timers[username] = timer
+        timer.start()
+
+    def on_fake_silence(self, username: str, remaining: int):
+        with self.silence_lock:
+            # NOTE: A packet that arrived meanwhile replaced this timer.
+            if self.fake_silence_timers.get(username) is not threading.current_thread():
+                return
             del self.fake_silence_timers[username]
 
-        def callback():
-            self.logger.debug("Adding some silence on callback")
-            for _ in range(16):
-                silence = create_empty_audio(32, PYMUMBLE_SAMPLERATE, np.int16)
+            if self.speculate_after is None:
+                self.logger.debug("Adding some silence on callback")
+                count = remaining
+            elif remaining == SILENCE_CHUNKS:
+                # NOTE: Catches up with the gap already waited for, then keeps pace with the
+                # clock so speculation fires `speculate_after` chunks before the endpoint.
+                count = SILENCE_AFTER_MS // SILENCE_CHUNK_MS
+            else:
+                count = 1
+
+            for _ in range(min(count, remaining)):
+                silence = create_empty_audio(SILENCE_CHUNK_MS, PYMUMBLE_SAMPLERATE, np.int16)
                 self.fixed_chunker_for_source[username](silence)
 
-        self.fake_silence_timers[username] = threading.Timer(0.100, callback)
-        self.fake_silence_timers[username].start()
-        self.fixed_chunker_for_source[username](chunk.pcm)
+            if remaining > count:
+                self.schedule_silence(username, SILENCE_CHUNK_MS / 1000, remaining - count)
+
+    def speech_end(self, username: str) -> datetime:
+        # NOTE: Fake silence is fed after the packets stop, the last real packet
+        # tells when the speaker actually stopped.
+        if username in self.last_packet_at:
+            return self.last_packet_at[username]
+        silence = self.speech_filter_for_source[username].silence_count
+        return datetime.now() - timedelta(milliseconds=silence * SILENCE_CHUNK_MS)
+
+    def channel_name(self, user: User) -> Optional[str]:
+        try:
+            return str(self.client.channels[user.get_property("channel_id")]["name"])
+        except Exception:
+            return None
+
+    def utterance_id(self, username: str) -> UUID:
+        if username not in self.utterance_for_source:
+            self.utterance_for_source[username] = uuid4()
+        return self.utterance_for_source[username]
+
+    def on_speculative_speech(self, user: User, speech: np.ndarray):
+        username = str(user.get_property("name"))
+        info = SourceInfo(user=username, sequence_id=self.sequence_by_user.get(username, 0), channel=self.channel_name(user))
+        segment = SpeechSegment(
+            source="mumble",
+            source_info=info,
+            data=speech,
+            segment_id=self.utterance_id(username),
+            speech_end=self.speech_end(username),
+            speculative=True,
+        )
+        self.logger.debug(f"Speculative segment '{segment.segment_id}' from '{username}'")
+        self.proxy(events.MUMBLE_AUDIO_SPEECH_SPECULATIVE)(segment)
+
+    def on_speculation_cancel(self, user: User):
+        username = str(user.get_property("name"))
+        self.logger.debug(f"Speech from '{username}' resumed, speculation cancelled")
+        self.proxy(events.MUMBLE_AUDIO_SPEECH_SPECULATION_CANCELLED)(self.utterance_id(username))
+
+    def on_partial_speech(self, user: User, speech: np.ndarray):
+        username = str(user.get_property("name"))
+        info = SourceInfo(user=username, sequence_id=self.sequence_by_user.get(username, 0), channel=self.channel_name(user))
+        segment = SpeechSegment(
+            source="mumble",
+            source_info=info,
+            data=speech,
+            segment_id=self.utterance_id(username),
+            partial=True,
+        )
+        self.proxy(events.MUMBLE_AUDIO_SPEECH_PARTIAL)(segment)
 
     def on_speech(self, user: User, speech: np.ndarray):
         self.logger.info(f"{type(speech)}, {user}")
@@ -212,8 +306,14 @@ class MumbleInterface(Component):
         if username not in self.sequence_by_user:
             self.sequence_by_user[username] = 0
 
-        info = SourceInfo(user=username, sequence_id=self.sequence_by_user[username])
-        segment = SpeechSegment(source="mumble", source_info=info, data=speech)
+        info = SourceInfo(user=username, sequence_id=self.sequence_by_user[username], channel=self.channel_name(user))
+        segment = SpeechSegment(
+            source="mumble",
+            source_info=info,
+            data=speech,
+            segment_id=self.utterance_for_source.pop(username, None) or uuid4(),
+            speech_end=self.speech_end(username),
+        )
 
         self.sequence_by_user[username] += 1
         self.fixed_chunker_for_source[username].clear()
@@ -0,0 +1,152 @@
+import logging
+import threading
+from collections import deque
+from typing import Callable, Deque, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class ContextConfig(BaseModel):
+    # Upper bound of the rendered context, summary included.
+    max_tokens: int = 1024
+    # Recent turns kept verbatim, older ones are folded into the summary.
+    recent_tokens: int = 512
+    # Length the running summary is asked to stay within.
+    summary_tokens: int = 256
+    # Rough token estimate for the Ollama models in use.
+    chars_per_token: float = 4.0
+
+
+def estimate_tokens(text: str, chars_per_token: float = 4.0) -> int:
+    return int(len(text) / chars_per_token) + 1 if text else 0
+
+
+def truncate_tokens(text: str, tokens: int, chars_per_token: float = 4.0) -> str:
+    """Keep the end of `text`, the most recent part of a running summary."""
+    limit = int(tokens * chars_per_token)
+    return text if len(text) <= limit else text[-limit:]
+
+
+# (previous summary, turns to fold in) -> new summary, None keeps the turns pending
+Summarizer = Callable[[str, List[str]], Optional[str]]
+
+
+class RollingContext:
+    """Conversation context bounded by a token budget.
+
+    Recent turns stay verbatim, turns pushed out of the recent window are
+    folded into a running summary by a background thread. Until a fold
+    finishes the evicted turns are rendered verbatim, oldest dropped first, so
+    the rendered context never exceeds `max_tokens`.
+    """
+
+    def __init__(self, summarize: Summarizer, config: Optional[ContextConfig] = None):
+        self.summarize = summarize
+        self.config = config or ContextConfig()
+        self.summary = ""
+        self.recent: Deque[Tuple[str, int]] = deque()
+        self.pending: Deque[Tuple[str, int]] = deque()
+        self.recent_tokens = 0
+        # Bumped on clear() so a fold that was in flight is dropped.
+        self.generation = 0
+        self.folds = 0
+
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.folding = False
+        self.stopped = False
+        self.thread = threading.Thread(target=self._worker, name="context-summary", daemon=True)
+        self.thread.start()
+
+    def tokens(self, text: str) -> int:
+        return estimate_tokens(text, self.config.chars_per_token)
+
+    def append(self, text: str) -> None:
+        with self.lock:
+            turn = (text, self.tokens(text))
+            self.recent.append(turn)
+            self.recent_tokens += turn[1]
+            # NOTE: The newest turn always stays verbatim, even if it alone is over budget.
+            while self.recent_tokens > self.config.recent_tokens and len(self.recent) > 1:
+                evicted = self.recent.popleft()
+                self.recent_tokens -= evicted[1]
+                self.pending.append(evicted)
+            if self.pending:
+                self.wakeup.notify()
+
+    def render(self, extra: Optional[str] = None) -> str:
+        """The summary and turns within budget, followed by `extra`, which is not counted."""
+        with self.lock:
+            budget = self.config.max_tokens - self.tokens(self.summary) - self.recent_tokens
+            pending = []
+            for text, tokens in reversed(self.pending):
+                if tokens > budget:
+                    break
+                pending.append(text)
+                budget -= tokens
+
+            parts = ([f"Summary of the earlier conversation: {self.summary}"] if self.summary else [])
+            parts += list(reversed(pending)) + [text for text, _ in self.recent]
+            if extra:
+                parts.append(extra)
+            return " ".join(parts)
+
+    def turns(self) -> List[str]:
+        """Everything still held verbatim, oldest first."""
+        with self.lock:
+            return [text for text, _ in self.pending] + [text for text, _ in self.recent]
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.pending) + len(self.recent)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.summary = ""
+            self.recent.clear()
+            self.pending.clear()
+            self.recent_tokens = 0
+            self.generation += 1
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every evicted turn is folded into the summary."""
+        with self.wakeup:
+            return self.wakeup.wait_for(lambda: not self.pending and not self.folding, timeout)
+
+    def close(self) -> None:
+        with self.wakeup:
+            self.stopped = True
+            self.wakeup.notify_all()
+        self.thread.join()
+
+    def _worker(self) -> None:
+        while True:
+            with self.wakeup:
+                self.wakeup.wait_for(lambda: self.pending or self.stopped)
+                if self.stopped:
+                    return
+                # NOTE: Everything evicted while the previous fold ran is folded in one call,
+                # so a slow model falls behind by at most one summary.
+                batch = list(self.pending)
+                summary, generation = self.summary, self.generation
+                self.folding = True
+
+            try:
+                folded = self.summarize(summary, [text for text, _ in batch])
+            except Exception as e:
+                logger.exception(f"Failed to fold {len(batch)} turns into the summary: {e}")
+                folded = None
+
+            with self.wakeup:
+                self.folding = False
+                if folded is not None and generation == self.generation:
+                    self.summary = truncate_tokens(folded.strip(), self.config.summary_tokens, self.config.chars_per_token)
+                    for _ in batch:
+                        self.pending.popleft()
+                    self.folds += 1
+                self.wakeup.notify_all()
+                if folded is None and not self.stopped:
+                    # NOTE: Back off instead of spinning on a failing model, the turns stay pending.
+                    self.wakeup.wait(1.0)
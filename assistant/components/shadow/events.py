@@ -0,0 +1,3 @@
+SHADOW_MEMORY_SUMMARY = "shadow.memory.summary"
+SHADOW_MODEL_PROGRESS = "shadow.model.progress"
+SHADOW_READY = "shadow.ready"
@@ -1,21 +1,30 @@
+from concurrent.futures import CancelledError, Future
 from datetime import datetime
-from queue import Queue
+import random
 import threading
+import time
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, Hashable, List, Optional, Tuple
 
 from langchain.schema import (
     HumanMessage,
     SystemMessage,
 )
 from langchain_ollama import ChatOllama
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationError
 
 from assistant.components.mumble.mumble import SpeechSegment
+from assistant.components.shadow import events
+from assistant.components.shadow.context import ContextConfig, RollingContext
+from assistant.components.shadow.prefilter import Prefilter, PrefilterConfig, PrefilterStats
+from assistant.components.shadow.streaming import AsyncLLMClient, StreamResult, StreamStats
 from assistant.components.transcriber.types import Transcript
+from assistant.core import service
 from assistant.core.component import Component
-from assistant.utils import ensure_model_exists, event_context
-from assistant.utils.utils import observe
+from assistant.utils import event_context
+from assistant.utils.provisioning import ProvisionStatus, PullProgress, RetryConfig, provisioner
+from assistant.utils.shards import ShardConfig, ShardPool, ShardStats, conversation_key
+from assistant.utils.stats import LatencyStats, LatencySummary
 
 DECISION_SYSTEM_PROMPT = """
 You are an AI assistant that processes transcription chunks. Your job is to:
@@ -42,6 +51,25 @@ class ActionDecision(BaseModel):
     )
 
 
+# NOTE: Sent in the user message, so every decision shares the same system prompt prefix.
+BATCH_DECISION_PROMPT = """
+The chunks below arrived one after another while you were busy. Each one is prefixed with its id in
+square brackets. Decide for every chunk separately, in order, treating earlier chunks as context for
+later ones. Return exactly one decision per chunk id.
+"""
+
+
+class ChunkDecision(ActionDecision):
+    chunk_id: int = Field(description="Id of the transcription chunk this decision is for")
+
+
+class BatchDecision(BaseModel):
+    decisions: List[ChunkDecision] = Field(
+        description="One decision per transcription chunk, in chunk order",
+        default_factory=list,
+    )
+
+
 CONDENSED_MEMORY_PROMPT = """
 You are an AI assistant that processes transcription context to create concise, meaningful memory summaries. Your job is to:
 
@@ -77,6 +105,15 @@ class MemorySummary(BaseModel):
         default_factory=list
     )
 
+ROLLING_SUMMARY_PROMPT = """
+You maintain a running summary of a transcribed conversation. You receive the current summary and the
+turns that have just left the recent context. Return an updated summary that folds the new turns in.
+
+Keep names, dates, numbers, decisions and open questions. Drop filler and repetition. Correct earlier
+statements when the new turns clarify them. Reply with the summary text only, in at most {words} words.
+"""
+
+
 class StreamToken(BaseModel):
     token: str = Field(repr=True)
     done: bool = Field(repr=True)
@@ -89,12 +126,33 @@ class QueryResponse(BaseModel):
         self.tokens.append(StreamToken(token=t, done=bool(t == "")))
 
 
+# Model load time reported by Ollama above which a call counts as a cold start.
+COLD_LOAD_SECONDS = 0.5
+
+# Prefilter reason of a chunk that was not classified yet, None means it goes to the LLM.
+UNCLASSIFIED = object()
+
+
 class TranscriptionAction(str, Enum):
     ADD_TO_CONTEXT = "ADD_TO_CONTEXT"
     STORE_IN_MEMORY = "STORE_IN_MEMORY"
     DISCARD = "DISCARD"
 
 
+class Conversation:
+    """State of one conversation, a Mumble channel or user or a watched file."""
+
+    def __init__(self, key: Hashable, context: RollingContext):
+        self.key = key
+        self.context = context
+        # The decision in flight and how many transcripts it covers, so a newer transcript can supersede it.
+        self.inflight: Optional[Future] = None
+        self.inflight_size = 0
+        self.inflight_lock = threading.Lock()
+        self.interrupted = threading.Event()
+        self.last_decision: Optional[ActionDecision] = None
+
+
 class Shadow(Component):
     @property
     def version(self) -> str:
@@ -102,89 +160,401 @@ class Shadow(Component):
 
     @property
     def events(self) -> List[str]:
-        return []
+        return [events.SHADOW_MEMORY_SUMMARY, events.SHADOW_MODEL_PROGRESS, events.SHADOW_READY]
 
     def initialize(self) -> None:
         super().initialize()
-        model = self.get_config("model", "llama3.2:3b")
-        self.llm = self.create_llm(model)
+        self.started = time.perf_counter()
+        self.model = self.get_config("model", "llama3.2:3b")
+        self.llm = self.create_llm(self.model)
 
-        # Conversation context that we're building
-        self.context: List[str] = []
+        # NOTE: Runnables are built once, the JSON schema in `format` constrains the streamed output.
+        self.decider = self.llm.bind(format=ActionDecision.model_json_schema())
+        self.batch_decider = self.llm.bind(format=BatchDecision.model_json_schema())
+        self.memorizer = self.llm.bind(format=MemorySummary.model_json_schema())
+        self.client = AsyncLLMClient(self.get_config("max_concurrency", 2))
+        self.cold_latency = LatencyStats()
+        self.warm_latency = LatencyStats()
+
+        self.supersede = self.get_config("supersede", True)
+
+        self.context_config = ContextConfig.model_validate(self.get_config("context", {}))
+        self.prefilter = Prefilter(PrefilterConfig.model_validate(self.get_config("prefilter", {})))
 
         self.is_processing = threading.Event()
         self.logger.info(f"Plugin '{self.name}' initialized and ready")
 
-        self.transcripts = Queue()
-        observe(self.transcripts, lambda args: self.process_transcript(*args))
-
+        # NOTE: Every conversation has its own context and is decided in order, different ones in parallel.
+        # Transcripts that queue up while the LLM is busy are decided in one prompt.
+        self.max_batch_size = max(1, self.get_config("max_batch_size", 8))
+        self.mumble_by = self.get_config("mumble_by", "channel")
+        self.conversations = ShardPool(
+            self.process_conversation,
+            ShardConfig.model_validate(self.get_config("shards", {})),
+            create=lambda key: Conversation(key, RollingContext(self.summarize_turns, self.context_config)),
+            evict=lambda key, conversation: conversation.context.close(),
+            max_batch=self.max_batch_size,
+            name="shadow",
+        )
 
+        # NOTE: Shadow starts degraded and flips to ready once the model is on the server,
+        # a pull can take minutes and must not hold up the rest of the pipeline.
+        self.ready = threading.Event()
+        self.provision_status = ProvisionStatus(model=self.model)
+        self.provision_retry = RetryConfig.model_validate(self.get_config("provision_retry", {}))
+        self.provision_failures = 0
+        self.retry_timer: Optional[threading.Timer] = None
+        self.provision()
 
     def shutdown(self) -> None:
         super().shutdown()
+        if self.retry_timer is not None:
+            self.retry_timer.cancel()
+        self.conversations.close()
+        self.client.cancel_all()
+        self.client.close()
         self.logger.info(f"Plugin '{self.name}' shutdown done.")
 
     def create_llm(self, model: str):
         url = self.get_config("url", "localhost:11434")
         temperature = self.get_config("temperature", 0.0)
-        ensure_model_exists(url, model)
+        # NOTE: Ollama unloads idle models after 5 minutes by default, sparse speech would reload it every time.
+        keep_alive = self.get_config("keep_alive", "30m")
 
         self.logger.info(f"Creating Ollama using '{model}' model.")
         return ChatOllama(
             base_url=url,
             model=model,
             temperature=temperature,
+            keep_alive=keep_alive,
         )
 
-    def on_transcript(self, segment: SpeechSegment, transcript: Transcript):
-        self.transcripts.put_nowait((segment, transcript))
+    def provision(self):
+        self.provision_model().add_done_callback(self.on_model_provisioned)
 
+    def provision_model(self) -> "Future[ProvisionStatus]":
+        url = self.get_config("url", "localhost:11434")
+        return provisioner.ensure(url, self.model, on_progress=self.on_model_progress)
+
+    def on_model_progress(self, progress: PullProgress):
+        self.provision_status.progress = progress
+        self.logger.info(f"Pulling '{progress.model}': {progress.status} {progress.fraction or 0:.0%}")
+        self.proxy(events.SHADOW_MODEL_PROGRESS)(progress)
+
+    def on_model_provisioned(self, future: "Future[ProvisionStatus]"):
+        if future.exception() is not None:
+            self.provision_failures += 1
+            delay = self.provision_retry.delay(self.provision_failures)
+            self.provision_status.error = str(future.exception())
+            self.logger.error(
+                f"Model '{self.model}' unavailable, staying degraded and retrying in {delay:.0f}s: {self.provision_status.error}"
+            )
+            self.retry_timer = threading.Timer(delay, self.provision)
+            self.retry_timer.daemon = True
+            self.retry_timer.start()
+            return
+
+        self.provision_status = future.result().model_copy(
+            update={"progress": self.provision_status.progress, "time_to_ready": time.perf_counter() - self.started}
+        )
+        self.ready.set()
+        self.logger.info(f"Ready {self.provision_status.time_to_ready:.2f}s after initialization")
+        self.proxy(events.SHADOW_READY)(self.provision_status)
+        if self.get_config("warmup", True):
+            threading.Thread(target=self.warmup, name="shadow-warmup", daemon=True).start()
+
+    def warmup(self):
+        """Load the model and prime its cache with the decision system prompt."""
+        started = time.perf_counter()
+        try:
+            self.invoke(
+                self.decider,
+                ActionDecision,
+                [SystemMessage(content=DECISION_SYSTEM_PROMPT), HumanMessage(content='Transcription chunk: "uh"')],
+            )
+            self.logger.info(f"Warmed up in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            self.logger.warning(f"Warm-up failed: {e}")
+
+    def invoke(self, runnable, schema: Optional[type], messages, conversation: Optional[Conversation] = None):
+        """Stream a completion and parse it into `schema`, or return the text without one.
+
+        With a `conversation` the call is its decision in flight, raises
+        `CancelledError` when a newer transcript supersedes it or the user interrupts.
+        """
+        stream = self.client.stream(self.model, runnable, messages)
+        if conversation is not None:
+            # NOTE: Submitted under the lock, a transcript arriving meanwhile always sees the call in flight.
+            with conversation.inflight_lock:
+                future = conversation.inflight = self.client.submit(stream)
+        else:
+            future = self.client.submit(stream)
+        try:
+            result: StreamResult = future.result()
+        finally:
+            if conversation is not None:
+                with conversation.inflight_lock:
+                    if conversation.inflight is future:
+                        conversation.inflight = None
+
+        self.record_latency(result)
+        if schema is None:
+            return result.content
+        try:
+            return schema.model_validate_json(result.content)
+        except ValidationError as e:
+            self.logger.warning(f"Failed to parse the LLM response into {schema.__name__}: {e}")
+            return None
+
+    def record_latency(self, result: StreamResult):
+        load_seconds = (result.metadata.get("load_duration") or 0) / 1e9
+        if load_seconds > COLD_LOAD_SECONDS:
+            self.cold_latency.add(result.elapsed)
+            self.logger.info(f"Cold start, model load took {load_seconds:.2f}s of {result.elapsed:.2f}s")
+        else:
+            self.warm_latency.add(result.elapsed)
+
+        if result.ttft is not None:
+            self.logger.debug(
+                f"First token after {result.ttft:.2f}s, {result.tokens} tokens "
+                f"at {result.tokens_per_second or 0:.1f} tokens/s"
+            )
+
+    @service
+    def prefilter_stats(self) -> PrefilterStats:
+        return self.prefilter.get_stats()
+
+    @service
+    def llm_latency(self) -> Dict[str, LatencySummary]:
+        return {"cold": self.cold_latency.summary(), "warm": self.warm_latency.summary()}
+
+    @service
+    def stream_stats(self) -> StreamStats:
+        return self.client.get_stats()
+
+    @service
+    def model_status(self) -> ProvisionStatus:
+        return self.provision_status
+
+    @service
+    def shard_stats(self) -> ShardStats:
+        return self.conversations.get_stats()
+
+    @service
+    def interrupt(self) -> bool:
+        """Abandon the decisions in flight, their transcripts are dropped."""
+        cancelled = False
+        for conversation in self.conversations.states().values():
+            conversation.interrupted.set()
+            with conversation.inflight_lock:
+                if conversation.inflight is not None and conversation.inflight.cancel():
+                    cancelled = True
+        return cancelled
+
+    def on_interrupt(self):
+        self.interrupt()
+
+    def summarize_turns(self, summary: str, turns: List[str]) -> Optional[str]:
+        if not self.ready.is_set():
+            return None
+
+        started = time.perf_counter()
+        messages = [
+            SystemMessage(content=ROLLING_SUMMARY_PROMPT.format(words=int(self.context_config.summary_tokens * 0.75))),
+            HumanMessage(content=f"Current summary: {summary or '(empty)'}\r\nNew turns:\r\n -" + "\r\n -".join(turns)),
+        ]
+        folded = self.invoke(self.llm, None, messages)
+        self.logger.debug(f"Folded {len(turns)} turns into the summary in {time.perf_counter() - started:.2f}s")
+        return folded
+
+    def conversation(self, key: Hashable) -> Conversation:
+        return self.conversations.state(key)
+
+    def on_transcript(self, segment: SpeechSegment, transcript: Transcript):
+        # NOTE: Classified once here, the reason travels with the chunk to its decision.
+        reason = self.prefilter.classify(transcript)
+        conversation: Conversation = self.conversations.submit(
+            conversation_key(segment, self.mumble_by), (segment, transcript, reason)
+        )
 
-    def process_transcript(self, segment: SpeechSegment, t: Transcript):
+        # NOTE: A chunk the prefilter discards never reaches the LLM, it must not cancel the decision in flight.
+        if self.supersede and reason is None:
+            with conversation.inflight_lock:
+                # NOTE: The superseded transcripts are decided again together with the newer one,
+                # a full batch is left to finish so a steady stream cannot starve the decisions.
+                if conversation.inflight is not None and conversation.inflight_size < self.max_batch_size:
+                    conversation.inflight.cancel()
+
+    def process_conversation(
+        self, key: Hashable, conversation: Conversation, items: List[Tuple[SpeechSegment, Transcript, Optional[str]]]
+    ):
+        conversation.inflight_size = len(items)
+        conversation.interrupted.clear()
+        chunks = [(segment, t) for segment, t, _ in items]
+        reasons = [reason for _, _, reason in items]
+        try:
+            if len(items) == 1:
+                self.process_transcript(*chunks[0], conversation=conversation, reason=reasons[0])
+            else:
+                self.process_batch(chunks, conversation, reasons=reasons)
+        except CancelledError:
+            if conversation.interrupted.is_set():
+                self.logger.info(f"Interrupted, dropped {len(items)} transcripts of '{key}'")
+            else:
+                self.logger.info(f"Superseded, deciding {len(items)} transcripts of '{key}' with the newer ones")
+                self.conversations.push_front(key, items)
+        except Exception as e:
+            self.logger.exception(f"Failed to process {len(items)} transcripts of '{key}': {e}")
+
+    def process_transcript(
+        self,
+        segment: SpeechSegment,
+        t: Transcript,
+        conversation: Optional[Conversation] = None,
+        reason: Optional[str] = UNCLASSIFIED,
+    ):
+        conversation = conversation or self.conversation(conversation_key(segment, self.mumble_by))
         self.logger.info(f"-> {datetime.now() - segment.timestamp}")
 
         self.logger.info(f"({t.language}: {t.duration}) -> {t.transcript}...")
 
         with event_context(self.is_processing):
-            if self.context:
-                combined_context = " ".join(self.context + [t.transcript])
-            else:
-                combined_context = t.transcript
-
-            messages = [
-                SystemMessage(content=DECISION_SYSTEM_PROMPT),
-                HumanMessage(content=f'Transcription chunk: "{combined_context}"'),
-            ]
-
-            decision: Optional[ActionDecision] = self.llm.with_structured_output(
-                ActionDecision
-            ).invoke(messages)
-
-            self.last_decision = decision
+            if reason is UNCLASSIFIED:
+                reason = self.prefilter.classify(t)
+            decision = self.prefiltered(t, reason, conversation) or self.decide(t, conversation)
+            conversation.last_decision = decision
             if decision is None:
                 return
 
-            self.logger.info(f"[{decision.action}] {decision.reason}")
+            self.apply(t, decision, conversation)
+            return decision
 
-            if decision.action == TranscriptionAction.ADD_TO_CONTEXT:
-                self.context.append(t.transcript)
+    def process_batch(
+        self,
+        items: List[Tuple[SpeechSegment, Transcript]],
+        conversation: Optional[Conversation] = None,
+        reasons: Optional[List[Optional[str]]] = None,
+    ):
+        conversation = conversation or self.conversation(conversation_key(items[0][0], self.mumble_by))
+        self.logger.info(f"-> {len(items)} queued for '{conversation.key}', oldest {datetime.now() - items[0][0].timestamp}")
 
-            elif decision.action == TranscriptionAction.STORE_IN_MEMORY:
-                self.logger.info("[MEM_DUMP]")
+        with event_context(self.is_processing):
+            transcripts = [t for _, t in items]
+            if reasons is None:
+                reasons = [self.prefilter.classify(t) for t in transcripts]
+            decisions = [self.prefiltered(t, reason, conversation) for t, reason in zip(transcripts, reasons)]
+            undecided = [i for i, decision in enumerate(decisions) if decision is None]
+            if len(undecided) == 1:
+                decisions[undecided[0]] = self.decide(transcripts[undecided[0]], conversation)
+            elif undecided:
+                for i, decision in zip(undecided, self.decide_batch([transcripts[i] for i in undecided], conversation)):
+                    decisions[i] = decision
+
+            for t, decision in zip(transcripts, decisions):
+                self.logger.info(f"({t.language}: {t.duration}) -> {t.transcript}...")
+                if decision is not None:
+                    self.apply(t, decision, conversation)
+                    conversation.last_decision = decision
+
+            return decisions
+
+    def prefiltered(self, t: Transcript, reason: Optional[str], conversation: Conversation) -> Optional[ActionDecision]:
+        """DISCARD decided locally for obvious noise, None when the LLM has to decide."""
+        if reason is None:
+            return None
+
+        decision = ActionDecision(action=TranscriptionAction.DISCARD, reason=f"Prefilter: {reason}")
+        if self.ready.is_set() and random.random() < self.prefilter.config.sample_rate:
+            # NOTE: Sampled chunks are still decided by the prefilter, the LLM only scores it.
+            sampled = self.decide(t, conversation)
+            if sampled is not None:
+                agreed = sampled.action == TranscriptionAction.DISCARD
+                self.prefilter.record_sample(agreed)
+                if not agreed:
+                    self.logger.info(f"Prefilter disagreed with [{sampled.action}] on '{t.transcript}'")
+
+        stats = self.prefilter.get_stats()
+        self.logger.info(f"Prefiltered ({reason}), bypass rate {stats.bypass_rate:.0%} of {stats.total}")
+        return decision
+
+    def decide(self, t: Transcript, conversation: Conversation) -> Optional[ActionDecision]:
+        if not self.ready.is_set():
+            # NOTE: Degraded until the model arrives, chunks are kept so the context is there once it does.
+            return ActionDecision(action=TranscriptionAction.ADD_TO_CONTEXT, reason="Model not ready")
+
+        context = conversation.context
+        combined_context = context.render(t.transcript)
+
+        messages = [
+            SystemMessage(content=DECISION_SYSTEM_PROMPT),
+            HumanMessage(content=f'Transcription chunk: "{combined_context}"'),
+        ]
+
+        prompt_tokens = sum(context.tokens(m.content) for m in messages)
+        started = time.perf_counter()
+        decision: Optional[ActionDecision] = self.invoke(self.decider, ActionDecision, messages, conversation)
+        self.logger.info(
+            f"Decision took {time.perf_counter() - started:.2f}s for ~{prompt_tokens} prompt tokens "
+            f"({len(context)} turns in context)"
+        )
+        return decision
+
+    def decide_batch(self, transcripts: List[Transcript], conversation: Conversation) -> List[Optional[ActionDecision]]:
+        """One decision per transcript from a single prompt, missing ones are decided on their own."""
+        if not self.ready.is_set():
+            return [self.decide(t, conversation) for t in transcripts]
+
+        chunks = "\r\n".join(f'[{i}] "{t.transcript}"' for i, t in enumerate(transcripts))
+        messages = [
+            SystemMessage(content=DECISION_SYSTEM_PROMPT),
+            HumanMessage(
+                content=f'{BATCH_DECISION_PROMPT}\r\nContext: "{conversation.context.render()}"\r\nTranscription chunks:\r\n{chunks}'
+            ),
+        ]
+
+        prompt_tokens = sum(conversation.context.tokens(m.content) for m in messages)
+        started = time.perf_counter()
+        batch: Optional[BatchDecision] = self.invoke(self.batch_decider, BatchDecision, messages, conversation)
+        elapsed = time.perf_counter() - started
+        self.logger.info(
+            f"Batch of {len(transcripts)} decisions took {elapsed:.2f}s for ~{prompt_tokens} prompt tokens "
+            f"({len(transcripts) / elapsed:.2f} decisions/s)"
+        )
 
-                context = "\r\n -".join(self.context)
+        by_id = {d.chunk_id: d for d in batch.decisions} if batch is not None else {}
+        decisions = []
+        for i, t in enumerate(transcripts):
+            decision = by_id.get(i)
+            if decision is None:
+                self.logger.warning(f"No decision for chunk {i} in the batch, deciding it alone")
+                decision = self.decide(t, conversation)
+            decisions.append(decision)
+        return decisions
 
-                messages = [
-                    SystemMessage(content=CONDENSED_MEMORY_PROMPT),
-                    HumanMessage(content=f"Context: {context}\r\n")
-                ]
+    def apply(self, t: Transcript, decision: ActionDecision, conversation: Conversation):
+        self.logger.info(f"[{decision.action}] {decision.reason}")
 
-                summary: MemorySummary = self.llm.with_structured_output(MemorySummary).invoke(messages)
-                self.logger.info(f"{summary}")
+        if decision.action == TranscriptionAction.ADD_TO_CONTEXT:
+            conversation.context.append(t.transcript)
 
-                self.context = []
-            elif decision.action == TranscriptionAction.DISCARD:
-                pass
+        elif decision.action == TranscriptionAction.STORE_IN_MEMORY:
+            self.logger.info("[MEM_DUMP]")
 
-            return decision
+            # NOTE: Turns still pending a fold are in `turns()`, the summary covers the rest.
+            context = "\r\n -".join(
+                ([conversation.context.summary] if conversation.context.summary else []) + conversation.context.turns()
+            )
+
+            messages = [
+                SystemMessage(content=CONDENSED_MEMORY_PROMPT),
+                HumanMessage(content=f"Context: {context}\r\n")
+            ]
+
+            summary: MemorySummary = self.invoke(self.memorizer, MemorySummary, messages)
+            self.logger.info(f"{summary}")
+            if summary is not None:
+                self.proxy(events.SHADOW_MEMORY_SUMMARY)(summary)
 
+            conversation.context.clear()
+        elif decision.action == TranscriptionAction.DISCARD:
+            pass
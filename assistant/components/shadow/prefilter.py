@@ -0,0 +1,120 @@
+import importlib
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+from pydantic import BaseModel, Field, computed_field
+
+from assistant.components.transcriber.types import Transcript
+
+FILLERS = [
+    "uh", "uhh", "um", "umm", "hmm", "hm", "mm", "mhm", "mm-hmm", "uh-huh", "ah", "oh", "eh", "er", "erm",
+    "yeah", "yep", "yup", "ok", "okay", "right", "so", "well", "like", "huh", "oops", "wow", "nah",
+]
+
+# Phrases Whisper hallucinates for silence, music or noise. Short replies like
+# "thank you" or "you" are real answers too and are left to the LLM.
+NOISE_PHRASES = [
+    "thanks for watching",
+    "thank you for watching",
+    "subtitles by the amara.org community",
+    "please subscribe",
+]
+
+ANNOTATION = re.compile(r"^[\[(*♪].*[\])*♪]$")
+WORD = re.compile(r"[\w'-]+")
+
+
+class PrefilterConfig(BaseModel):
+    enabled: bool = True
+    # Chunks of at most this many words made only of fillers are discarded.
+    max_filler_words: int = 4
+    # Short chunks transcribed with a language probability below this are discarded.
+    min_language_probability: float = 0.5
+    max_low_confidence_words: int = 6
+    fillers: List[str] = Field(default_factory=lambda: list(FILLERS))
+    noise_phrases: List[str] = Field(default_factory=lambda: list(NOISE_PHRASES))
+    # Optional "module:function" taking the text and returning the probability it can be discarded.
+    classifier: Optional[str] = None
+    classifier_threshold: float = 0.9
+    # Fraction of bypassed chunks also sent to the LLM to measure agreement.
+    sample_rate: float = 0.05
+
+
+class PrefilterStats(BaseModel):
+    total: int = 0
+    bypassed: int = 0
+    reasons: Dict[str, int] = Field(default_factory=dict)
+    sampled: int = 0
+    agreed: int = 0
+
+    @computed_field
+    @property
+    def bypass_rate(self) -> float:
+        return self.bypassed / self.total if self.total else 0.0
+
+    @computed_field
+    @property
+    def agreement(self) -> Optional[float]:
+        return self.agreed / self.sampled if self.sampled else None
+
+
+def load_classifier(path: str) -> Callable[[str], float]:
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+class Prefilter:
+    """Cheap local rules that discard obvious noise before it reaches the LLM.
+
+    `classify` returns the reason a chunk can be discarded, or None when the
+    LLM has to decide. Rules only ever discard, anything uncertain goes on.
+    """
+
+    def __init__(self, config: Optional[PrefilterConfig] = None):
+        self.config = config or PrefilterConfig()
+        self.fillers = {f.lower() for f in self.config.fillers}
+        self.noise_phrases = {" ".join(WORD.findall(p.lower())) for p in self.config.noise_phrases}
+        self.classifier = load_classifier(self.config.classifier) if self.config.classifier else None
+        self.stats = PrefilterStats()
+        self.lock = threading.Lock()
+
+    def classify(self, t: Transcript) -> Optional[str]:
+        reason = self._classify(t) if self.config.enabled else None
+        with self.lock:
+            self.stats.total += 1
+            if reason is not None:
+                self.stats.bypassed += 1
+                self.stats.reasons[reason] = self.stats.reasons.get(reason, 0) + 1
+        return reason
+
+    def _classify(self, t: Transcript) -> Optional[str]:
+        text = t.transcript.strip()
+        words = [w.lower() for w in WORD.findall(text)]
+
+        if not words:
+            return "empty"
+        if ANNOTATION.match(text):
+            return "annotation"
+        if " ".join(words) in self.noise_phrases:
+            return "noise phrase"
+        if len(words) <= self.config.max_filler_words and all(w in self.fillers for w in words):
+            return "filler"
+        if (
+            t.language_probability is not None
+            and t.language_probability < self.config.min_language_probability
+            and len(words) <= self.config.max_low_confidence_words
+        ):
+            return "low language confidence"
+        if self.classifier is not None and self.classifier(text) >= self.config.classifier_threshold:
+            return "classifier"
+        return None
+
+    def record_sample(self, agreed: bool) -> None:
+        with self.lock:
+            self.stats.sampled += 1
+            self.stats.agreed += int(agreed)
+
+    def get_stats(self) -> PrefilterStats:
+        with self.lock:
+            return self.stats.model_copy(deep=True)
@@ -0,0 +1,147 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+from assistant.utils.stats import LatencyStats, LatencySummary
+
+
+class StreamResult(BaseModel):
+    content: str
+    # Seconds until the first content token, None if nothing was generated.
+    ttft: Optional[float] = None
+    elapsed: float
+    tokens: int
+    tokens_per_second: Optional[float] = None
+    # Ollama's final chunk: load, prompt and eval counts and durations.
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+
+
+class StreamStats(BaseModel):
+    ttft: LatencySummary
+    # Generation speed samples, in tokens per second rather than seconds.
+    tokens_per_second: LatencySummary
+    completed: int = 0
+    cancelled: int = 0
+
+
+class AsyncLLMClient:
+    """Streams chat completions on an event loop of its own.
+
+    Calls are submitted from any thread and return a `Future` that can be
+    cancelled, which cancels the stream and closes the request, so Ollama
+    stops generating. At most `max_concurrency` streams run per model, the
+    rest wait for a slot.
+    """
+
+    def __init__(self, max_concurrency: int = 2):
+        self.max_concurrency = max_concurrency
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.futures: Set[Future] = set()
+        self.lock = threading.Lock()
+
+        self.ttft = LatencyStats()
+        self.throughput = LatencyStats()
+        self.completed = 0
+        self.cancelled = 0
+
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="shadow-llm", daemon=True)
+        self.thread.start()
+
+    def submit(self, coroutine: Coroutine) -> Future:
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        with self.lock:
+            self.futures.add(future)
+        future.add_done_callback(self._done)
+        return future
+
+    def run(self, coroutine: Coroutine, timeout: Optional[float] = None) -> Any:
+        """Submit and wait, raises `concurrent.futures.CancelledError` if cancelled meanwhile."""
+        return self.submit(coroutine).result(timeout)
+
+    async def stream(
+        self,
+        model: str,
+        runnable,
+        messages: List,
+        on_token: Optional[Callable[[str], None]] = None,
+    ) -> StreamResult:
+        async with self._semaphore(model):
+            started = time.perf_counter()
+            first = None
+            parts = []
+            metadata = {}
+            async for chunk in runnable.astream(messages):
+                if chunk.content:
+                    if first is None:
+                        first = time.perf_counter()
+                    parts.append(chunk.content)
+                    if on_token is not None:
+                        on_token(chunk.content)
+                if chunk.response_metadata:
+                    metadata = dict(chunk.response_metadata)
+            finished = time.perf_counter()
+
+        result = StreamResult(
+            content="".join(parts),
+            ttft=first - started if first is not None else None,
+            elapsed=finished - started,
+            tokens=metadata.get("eval_count") or len(parts),
+            metadata=metadata,
+        )
+        # NOTE: Ollama's eval timing excludes queueing and prompt processing, fall back to wall time after the first token.
+        if metadata.get("eval_duration"):
+            result.tokens_per_second = result.tokens / (metadata["eval_duration"] / 1e9)
+        elif first is not None and finished > first:
+            result.tokens_per_second = result.tokens / (finished - first)
+
+        if result.ttft is not None:
+            self.ttft.add(result.ttft)
+        if result.tokens_per_second is not None:
+            self.throughput.add(result.tokens_per_second)
+        return result
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        # Only ever called on the loop thread.
+        if model not in self.semaphores:
+            self.semaphores[model] = asyncio.Semaphore(self.max_concurrency)
+        return self.semaphores[model]
+
+    def _done(self, future: Future) -> None:
+        with self.lock:
+            self.futures.discard(future)
+            if future.cancelled():
+                self.cancelled += 1
+            else:
+                self.completed += 1
+
+    def cancel_all(self) -> int:
+        with self.lock:
+            futures = list(self.futures)
+        return sum(future.cancel() for future in futures)
+
+    def get_stats(self) -> StreamStats:
+        with self.lock:
+            completed, cancelled = self.completed, self.cancelled
+        return StreamStats(
+            ttft=self.ttft.summary(),
+            tokens_per_second=self.throughput.summary(),
+            completed=completed,
+            cancelled=cancelled,
+        )
+
+    async def _shutdown(self) -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def close(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
@@ -1,9 +1,8 @@
-from queue import Queue
-from typing import List
+from typing import Hashable, List
 from assistant.components.mumble.mumble import SpeechSegment
 from assistant.components.transcriber.types import Transcript
 from assistant.core.component import Component
-from assistant.utils.utils import observe
+from assistant.utils.shards import ShardConfig, ShardPool, conversation_key
 from datetime import datetime
 from . import events
 
@@ -23,17 +22,26 @@ class SystemIII(Component):
         super().initialize()
         self.logger.info(f"Plugin '{self.name}' initialized and ready")
 
-        self.transcripts = Queue()
-        observe(self.transcripts, lambda args: self.process_transcript(*args))
+        # NOTE: Transcripts of one conversation are processed in order, different conversations in parallel.
+        self.mumble_by = self.get_config("mumble_by", "channel")
+        self.conversations = ShardPool(
+            self.process_conversation,
+            ShardConfig.model_validate(self.get_config("shards", {})),
+            name="system",
+        )
 
     def shutdown(self) -> None:
         super().shutdown()
+        self.conversations.close()
         self.logger.info(f"Plugin '{self.name}' shutdown done.")
 
     def on_transcript(self, segment: SpeechSegment, transcript: Transcript):
-        self.transcripts.put_nowait((segment, transcript))
+        self.conversations.submit(conversation_key(segment, self.mumble_by), (segment, transcript))
+
+    def process_conversation(self, key: Hashable, state, items: List):
+        for segment, transcript in items:
+            self.process_transcript(segment, transcript)
 
     def process_transcript(self, segment: SpeechSegment, transcript: Transcript):
         self.logger.info(f"-> {datetime.now() - segment.timestamp}")
         self.logger.info(f"T -> {transcript}")
-
@@ -0,0 +1,196 @@
+import io
+import logging
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict
+
+import numpy as np
+import requests
+import soundfile as sf
+from numpy.typing import NDArray
+
+from assistant.config import SPEECH_PIPELINE_SAMPLERATE
+
+from .types import Segment, Transcript, TranscriptionOptions, Word
+
+
+class TranscriptionError(RuntimeError):
+    """A backend failed to transcribe a segment, the cause is chained."""
+
+
+class TranscriptionBackend(ABC):
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.logger = logging.getLogger(f"component.transcriber.{self.name}")
+
+    @property
+    @abstractmethod
+    def name(self) -> str:
+        pass
+
+    @property
+    def workers(self) -> int:
+        """Number of segments worth transcribing in parallel with this backend."""
+        return 4
+
+    @abstractmethod
+    def load(self) -> None:
+        """Load models up front."""
+        pass
+
+    @abstractmethod
+    def warmup(self) -> None:
+        """Run a first inference before real traffic."""
+        pass
+
+    @abstractmethod
+    def transcribe(self, data: NDArray[np.int16], options: TranscriptionOptions) -> Transcript:
+        pass
+
+
+class WhisperxHttpBackend(TranscriptionBackend):
+    """Sends FLAC encoded segments to an external whisperx service."""
+
+    @property
+    def name(self) -> str:
+        return "whisperx"
+
+    def load(self) -> None:
+        """Nothing to load, the models live in the whisperx service."""
+
+    def warmup(self) -> None:
+        """Nothing to warm up, the whisperx service keeps its models loaded."""
+
+    def transcribe(self, data: NDArray[np.int16], options: TranscriptionOptions) -> Transcript:
+        try:
+            audio = io.BytesIO()
+            sf.write(
+                audio,
+                data,
+                SPEECH_PIPELINE_SAMPLERATE,
+                format="FLAC",
+            )
+            audio.seek(0)
+
+            url = self.config.get("url", "http://localhost:8000")
+
+            request = {
+                "whisper_model": options.model,
+                "diarize": options.diarize,
+                "align_words": options.align_words,
+            }
+            if options.language:
+                request["language"] = options.language
+
+            response = requests.post(
+                f"{url}/transcribe",
+                files={"file": ("audio.flac", audio, "audio/flac")},
+                data=request,
+            )
+
+            if not response.status_code == 200:
+                raise requests.exceptions.HTTPError(
+                    f"Transcription failed with status code: {response.status_code}"
+                )
+
+            return Transcript.model_validate(response.json())
+
+        except requests.exceptions.RequestException as e:
+            self.logger.error(f"Failed to process transcription request: {str(e)}")
+            raise TranscriptionError("Transcription failed due to network or connection issues") from e
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """Runs a CTranslate2 quantised Whisper model in-process on the CPU.
+
+    Audio is handed over as float32 samples, so there is no FLAC encoding and no
+    network hop. Diarization is not supported and the flag is ignored.
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        self.models: Dict[str, Any] = {}
+        self.lock = threading.Lock()
+        self.cpu_threads = self.config.get("cpu_threads", 2)
+
+    @property
+    def name(self) -> str:
+        return "faster_whisper"
+
+    @property
+    def workers(self) -> int:
+        return self.config.get("workers", max(1, (os.cpu_count() or 1) // self.cpu_threads))
+
+    def load(self) -> None:
+        self.model(self.config.get("model", "small"))
+
+    def model(self, name: str):
+        with self.lock:
+            if name not in self.models:
+                try:
+                    from faster_whisper import WhisperModel
+                except ImportError as e:
+                    raise RuntimeError(
+                        "Backend 'faster_whisper' requires the 'faster-whisper' package"
+                    ) from e
+
+                self.logger.info(f"Loading '{name}' model ({self.config.get('compute_type', 'int8')}).")
+                self.models[name] = WhisperModel(
+                    name,
+                    device="cpu",
+                    compute_type=self.config.get("compute_type", "int8"),
+                    cpu_threads=self.cpu_threads,
+                    num_workers=self.workers,
+                    download_root=self.config.get("download_root", None),
+                )
+            return self.models[name]
+
+    def warmup(self) -> None:
+        # NOTE: First inference allocates buffers and pages weights in, keep it
+        # out of the first real utterance.
+        silence = np.zeros(SPEECH_PIPELINE_SAMPLERATE, dtype=np.int16)
+        for name in list(self.models):
+            self.transcribe(silence, TranscriptionOptions(model=name, language="en"))
+
+    def transcribe(self, data: NDArray[np.int16], options: TranscriptionOptions) -> Transcript:
+        if options.diarize:
+            self.logger.debug("Diarization is not supported, ignored.")
+
+        audio = data.astype(np.float32) / 32768.0
+        segments, info = self.model(options.model).transcribe(
+            audio,
+            language=options.language,
+            word_timestamps=options.align_words,
+            beam_size=self.config.get("beam_size", 1),
+        )
+
+        transcript_segments = [
+            Segment(
+                text=s.text.strip(),
+                start=s.start,
+                end=s.end,
+                words=[Word(word=w.word.strip(), start=w.start, end=w.end) for w in s.words or []],
+            )
+            for s in segments
+        ]
+
+        return Transcript(
+            transcript=" ".join(s.text for s in transcript_segments),
+            language=info.language,
+            language_probability=info.language_probability,
+            duration=info.duration,
+            segments=transcript_segments,
+        )
+
+
+BACKENDS = {
+    "whisperx": WhisperxHttpBackend,
+    "faster_whisper": FasterWhisperBackend,
+}
+
+
+def create_backend(name: str, config: Dict[str, Any]) -> TranscriptionBackend:
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transcription backend '{name}'")
+    return BACKENDS[name](config)
@@ -1,3 +1,5 @@
 TRANSCRIPTION_QUEUE_ADDED = "transcription.queue.added"
 TRANSCRIPTION_SEGMENT_DONE = "transcription.segment.done"
+TRANSCRIPTION_SEGMENT_PARTIAL = "transcription.segment.partial"
 TRANSCRIPTION_SEGMENT_STARTED = "transcription.segment.started"
+TRANSCRIPTION_SEGMENT_DROPPED = "transcription.segment.dropped"
@@ -1,10 +1,7 @@
+import time
 from datetime import datetime
-import io
-from queue import Queue
-from typing import List, Optional
-
-import requests
-import soundfile as sf
+from typing import Dict, List, Optional
+from uuid import UUID
 
 from assistant.config import (
     SPEECH_PIPELINE_SAMPLERATE,
@@ -13,12 +10,27 @@ from assistant.core import service
 from assistant.core.component import Component
 from assistant.components.mumble.mumble import SpeechSegment
 from assistant.core.config_manager import ConfigManager
-from assistant.utils.utils import observe
-from .types import Transcript
+from assistant.utils.utils import consume
+from assistant.utils.stats import LatencyStats
+from .backends import create_backend
+from .profiles import (
+    LanguageHints,
+    LanguageHintsConfig,
+    LanguageHintStats,
+    ProfileSelector,
+    ProfileStats,
+    RequestProfile,
+)
+from .scheduler import QueueStats, SchedulerConfig, SegmentScheduler
+from .speculation import Confirmation, SpeculationStats, SpeculationTracker
+from .streaming import StreamTracker
+from .types import Transcript, TranscriptionOptions
 from .events import (
     TRANSCRIPTION_SEGMENT_STARTED,
     TRANSCRIPTION_QUEUE_ADDED,
     TRANSCRIPTION_SEGMENT_DONE,
+    TRANSCRIPTION_SEGMENT_DROPPED,
+    TRANSCRIPTION_SEGMENT_PARTIAL,
 )
 
 
@@ -38,12 +50,51 @@ class TranscriberService(Component):
             TRANSCRIPTION_SEGMENT_DONE,
             TRANSCRIPTION_QUEUE_ADDED,
             TRANSCRIPTION_SEGMENT_STARTED,
+            TRANSCRIPTION_SEGMENT_DROPPED,
+            TRANSCRIPTION_SEGMENT_PARTIAL,
         ]
 
     def initialize(self) -> None:
         super().initialize()
-        self.speech_segments = Queue()
-        self.speech_segments_observer = observe(self.speech_segments, self.transcribe_segment, threaded=True, max_workers=4)
+        backend = self.get_config("backend", "whisperx")
+        backend_config = self.get_config(backend, {})
+        self.backend = create_backend(backend, backend_config)
+        options = TranscriptionOptions(
+            model=backend_config.get("model", "small"),
+            diarize=backend_config.get("diarize", False),
+            align_words=backend_config.get("align", False),
+        )
+        profiles = [RequestProfile.model_validate(p) for p in self.get_config("profiles", [])]
+        self.profiles = ProfileSelector(
+            profiles, options, baseline_rate=self.get_config("profile_baseline_rate", 0.0)
+        )
+        self.languages = LanguageHints(
+            LanguageHintsConfig.model_validate(self.get_config("language_hints", {}))
+        )
+
+        self.logger.info(f"Loading '{self.backend.name}' transcription backend.")
+        self.backend.load()
+        self.backend.warmup()
+
+        scheduler = SchedulerConfig.model_validate(self.get_config("scheduler", {}))
+        self.speculations = SpeculationTracker()
+        self.end_of_speech_latency = LatencyStats()
+        streaming = self.get_config("streaming", {})
+        self.streams = StreamTracker(
+            overlap=streaming.get("overlap", 1.0),
+            idle_timeout=streaming.get("idle_timeout", 30.0),
+        )
+        self.speech_segments = SegmentScheduler(
+            scheduler, on_drop=self.on_dropped, duration=self.queued_seconds
+        )
+        # NOTE: Workers pull from the scheduler only when idle, so ranking applies
+        # to everything still waiting instead of to a thread pool's FIFO backlog.
+        self.speech_segments_observer = consume(
+            self.speech_segments,
+            self.transcribe_segment,
+            workers=scheduler.workers or self.backend.workers,
+            name="transcriber",
+        )
 
         self.logger.info(f"Plugin '{self.name}' initialized and ready")
 
@@ -53,43 +104,173 @@ class TranscriberService(Component):
         self.logger.info(f"Plugin '{self.name}' shutdown done.")
 
     def on_speech(self, segment: SpeechSegment):
+        confirmation, transcript = self.speculations.confirm(segment)
+
+        if confirmation == Confirmation.HIT:
+            self.streams.discard(segment.segment_id)
+            self.logger.info(f"Speculation hit for segment '{segment.segment_id}'")
+            self.proxy(TRANSCRIPTION_SEGMENT_STARTED)(segment)
+            self.complete(segment, transcript)
+        elif confirmation == Confirmation.PENDING:
+            self.streams.discard(segment.segment_id)
+        elif self.streams.submit_final(segment) is not False:
+            self.speech_segments.put_nowait(segment)
+
+    def on_partial_speech(self, segment: SpeechSegment):
+        # NOTE: A speculated utterance is transcribed from its stream by the speculation,
+        # windows resume if speech continues and the speculation is cancelled.
+        if self.speculations.is_speculating(segment.segment_id):
+            return
+        if self.streams.submit_partial(segment):
+            self.speech_segments.put_nowait(segment)
+
+    def on_speculative_speech(self, segment: SpeechSegment):
+        self.speculations.begin(segment)
         self.speech_segments.put_nowait(segment)
 
+    def on_speculation_cancelled(self, segment_id: UUID):
+        self.speculations.cancel(segment_id)
+
+    def on_dropped(self, segment: SpeechSegment):
+        if segment.speculative:
+            if confirmed := self.speculations.resolve(segment, None):
+                self.speech_segments.put_nowait(confirmed)
+            return
+
+        # NOTE: A dropped window still releases its stream, the final segment may be waiting for it.
+        if following := self.streams.done(segment):
+            self.speech_segments.put_nowait(following)
+        if not segment.partial:
+            self.emit_subscribed(TRANSCRIPTION_SEGMENT_DROPPED, segment)
+
+    def emit_subscribed(self, event: str, *args):
+        # NOTE: Partial and dropped segments are optional to consume, unlike
+        # `proxy` this does not warn about every window nobody listens to.
+        if event in self.event_handlers:
+            self.proxy(event)(*args)
+
+    def queued_seconds(self, segment: SpeechSegment) -> float:
+        """Audio a queued segment transcribes, only the window of a streamed utterance."""
+        if (stream := self.streams.get(segment)) is not None:
+            return stream.window_seconds(segment)
+        return len(segment.data) / SPEECH_PIPELINE_SAMPLERATE
+
+    @service
+    def queue_stats(self) -> QueueStats:
+        return self.speech_segments.stats()
+
+    @service
+    def profile_stats(self) -> Dict[str, ProfileStats]:
+        return self.profiles.report()
+
+    @service
+    def language_stats(self) -> LanguageHintStats:
+        return self.languages.stats()
+
+    @service
+    def speculation_stats(self) -> SpeculationStats:
+        return self.speculations.stats(self.end_of_speech_latency.summary())
+
+    def complete(self, segment: SpeechSegment, transcript: Transcript):
+        speech_end = segment.speech_end or segment.timestamp
+        self.end_of_speech_latency.add((datetime.now() - speech_end).total_seconds())
+        self.languages.finished(segment)
+        self.proxy(TRANSCRIPTION_SEGMENT_DONE)(segment, transcript)
+
     def transcribe_segment(self, segment: SpeechSegment):
+        if segment.speculative:
+            self.transcribe_speculation(segment)
+            return
+
+        if segment.partial or self.streams.get(segment):
+            self.transcribe_window(segment)
+            return
+
         self.logger.info(f"-> {datetime.now() - segment.timestamp}")
         self.proxy(TRANSCRIPTION_SEGMENT_STARTED)(segment)
-        whisperx = self.get_config("whisperx", {})
+        self.complete(segment, self.transcribe(segment))
+
+    def transcribe_window(self, segment: SpeechSegment):
+        if (stream := self.streams.get(segment)) is None:
+            self.logger.debug(f"Skipped window of finished utterance '{segment.segment_id}'")
+            return
+
+        offset, window = stream.window(segment)
+        duration = len(segment.data) / SPEECH_PIPELINE_SAMPLERATE
+
+        if not segment.partial:
+            self.proxy(TRANSCRIPTION_SEGMENT_STARTED)(segment)
 
         try:
-            audio = io.BytesIO()
-            sf.write(
-                audio,
-                segment.data,
-                SPEECH_PIPELINE_SAMPLERATE,
-                format="FLAC",
-            )
-            audio.seek(0)
-
-            url = whisperx.get("url", "http://localhost:8000")
-
-            response = requests.post(
-                f"{url}/transcribe",
-                files={"file": ("audio.flac", audio, "audio/flac")},
-                data={
-                    "whisper_model": whisperx.get("model", "small"),
-                    "diarize": whisperx.get("diarize", False),
-                    "align_words": whisperx.get("align", False),
-                },
+            # NOTE: Word timestamps are needed to drop the overlap between windows.
+            transcript = self.transcribe(
+                segment.model_copy(update={"data": window}), {"align_words": True}
             )
+            stitched = stream.update(transcript, offset, duration, final=not segment.partial)
+        except Exception:
+            if segment.partial:
+                raise
+            # NOTE: Fall back to the whole utterance, streamed state is unusable.
+            stitched = self.transcribe(segment)
+        finally:
+            if following := self.streams.done(segment):
+                self.speech_segments.put_nowait(following)
+
+        if not segment.partial:
+            self.complete(segment, stitched)
+        elif self.streams.get(segment) is not None:
+            # NOTE: A discarded stream was completed by its speculation already.
+            self.logger.debug(f"Partial '{segment.segment_id}' ({offset:.2f}s+) -> {stitched.transcript}")
+            self.emit_subscribed(TRANSCRIPTION_SEGMENT_PARTIAL, segment, stitched)
+
+    def transcribe_speculation(self, segment: SpeechSegment):
+        if not self.speculations.is_current(segment):
+            self.logger.debug(f"Skipped cancelled speculation '{segment.segment_id}'")
+            return
+
+        transcript = None
+        try:
+            transcript = self.transcribe_speculative(segment)
+        except Exception as e:
+            self.logger.warning(f"Speculative transcription failed: {e}")
+
+        if confirmed := self.speculations.resolve(segment, transcript):
+            if transcript is None:
+                self.speech_segments.put_nowait(confirmed)
+                return
+            self.logger.info(f"Speculation hit for segment '{confirmed.segment_id}'")
+            self.proxy(TRANSCRIPTION_SEGMENT_STARTED)(confirmed)
+            self.complete(confirmed, transcript)
+
+    def transcribe_speculative(self, segment: SpeechSegment) -> Transcript:
+        if (stream := self.streams.get(segment)) is None:
+            return self.transcribe(segment)
+
+        # NOTE: Reuses the words the stream already committed, only the tail is transcribed.
+        offset, window = stream.window(segment)
+        transcript = self.transcribe(
+            segment.model_copy(update={"data": window}), {"align_words": True}
+        )
+        return stream.preview(transcript, offset, len(segment.data) / SPEECH_PIPELINE_SAMPLERATE)
+
+    def transcribe(self, segment: SpeechSegment, overrides: Optional[dict] = None) -> Transcript:
+        profile, options = self.profiles.select(segment)
+        options = options.model_copy(
+            update={"language": self.languages.hint(segment), **(overrides or {})}
+        )
+        self.logger.debug(f"Segment '{segment.segment_id}' uses '{profile}' profile: {options}")
 
-            if not response.status_code == 200:
-                raise requests.exceptions.HTTPError(
-                    f"Transcription failed with status code: {response.status_code}"
-                )
+        started = time.perf_counter()
+        transcript = self.backend.transcribe(segment.data, options)
+        self.profiles.record(
+            profile,
+            len(segment.data) / SPEECH_PIPELINE_SAMPLERATE,
+            time.perf_counter() - started,
+        )
 
-            transcript = Transcript.model_validate(response.json())
-            self.proxy(TRANSCRIPTION_SEGMENT_DONE)(segment, transcript)
+        # NOTE: Only detected languages count, hinted ones would confirm themselves.
+        # Partial windows are short and would skew the streak of their utterance.
+        if options.language is None and not segment.partial:
+            self.languages.update(segment, transcript)
 
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"Failed to process transcription request: {str(e)}")
-            raise Exception("Transcription failed due to network or connection issues")
+        return transcript
@@ -0,0 +1,227 @@
+import bisect
+import random
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from assistant.components.mumble.mumble import SpeechSegment
+from assistant.config import SPEECH_PIPELINE_SAMPLERATE
+
+from .types import Transcript, TranscriptionOptions
+
+
+class ProfileMatch(BaseModel):
+    """Conditions a segment must meet, unset fields match anything."""
+
+    sources: List[str] = Field(default_factory=list)
+    min_duration: Optional[float] = None
+    max_duration: Optional[float] = None
+    max_speakers: Optional[int] = None
+
+
+class RequestProfile(BaseModel):
+    """Request options applied to segments matching the rule, unset fields keep the backend defaults."""
+
+    name: str
+    match: ProfileMatch = Field(default_factory=ProfileMatch)
+    model: Optional[str] = None
+    diarize: Optional[bool] = None
+    align_words: Optional[bool] = None
+
+
+class ProfileStats(BaseModel):
+    segments: int = 0
+    audio_seconds: float = 0.0
+    processing_seconds: float = 0.0
+    rtf: float = 0.0
+    saved_seconds: Optional[float] = None
+
+
+class LanguageHintsConfig(BaseModel):
+    min_transcripts: int = 2
+    min_probability: float = 0.8
+    # Final transcripts of a speaker between two language detections, None never detects again.
+    redetect_every: Optional[int] = 20
+
+
+class LanguageHintStats(BaseModel):
+    hinted_speakers: int = 0
+    redetections: int = 0
+    disagreements: int = 0
+
+
+# Upper edges in seconds of the segment duration buckets savings are compared in.
+DURATION_BUCKETS = (2.0, 5.0, 10.0, 30.0)
+
+
+def known_speakers(segment: SpeechSegment) -> Optional[int]:
+    # NOTE: Mumble delivers one stream per user, so a segment has a single speaker.
+    if segment.source == "mumble":
+        return 1
+    return None
+
+
+def speaker_key(segment: SpeechSegment) -> Optional[str]:
+    if user := getattr(segment.source_info, "user", None):
+        return f"{segment.source}:{user}"
+    if file := getattr(segment.source_info, "file", None):
+        return f"{segment.source}:{file}"
+    return None
+
+
+class ProfileSelector:
+    """Picks request options per segment, first matching profile wins.
+
+    A `baseline_rate` fraction of the segments matching a profile is sent with
+    the default options instead, so savings have a baseline of the same segments.
+    """
+
+    def __init__(
+        self,
+        profiles: List[RequestProfile],
+        defaults: TranscriptionOptions,
+        baseline_rate: float = 0.0,
+        buckets: Tuple[float, ...] = DURATION_BUCKETS,
+    ):
+        self.profiles = profiles
+        self.defaults = defaults
+        self.baseline_rate = baseline_rate
+        self.buckets = buckets
+        self.stats: Dict[str, ProfileStats] = {}
+        self.bucket_stats: Dict[Tuple[str, int], ProfileStats] = {}
+        self.lock = threading.Lock()
+
+    def matches(self, match: ProfileMatch, segment: SpeechSegment) -> bool:
+        duration = len(segment.data) / SPEECH_PIPELINE_SAMPLERATE
+        speakers = known_speakers(segment)
+
+        if match.sources and segment.source not in match.sources:
+            return False
+        if match.min_duration is not None and duration < match.min_duration:
+            return False
+        if match.max_duration is not None and duration > match.max_duration:
+            return False
+        if match.max_speakers is not None and (speakers is None or speakers > match.max_speakers):
+            return False
+        return True
+
+    def select(self, segment: SpeechSegment) -> Tuple[str, TranscriptionOptions]:
+        for profile in self.profiles:
+            if self.matches(profile.match, segment):
+                if random.random() < self.baseline_rate:
+                    return "default", self.defaults
+                update = profile.model_dump(
+                    include={"model", "diarize", "align_words"}, exclude_none=True
+                )
+                return profile.name, self.defaults.model_copy(update=update)
+
+        return "default", self.defaults
+
+    def record(self, profile: str, audio_seconds: float, processing_seconds: float) -> None:
+        bucket = bisect.bisect_left(self.buckets, audio_seconds)
+        with self.lock:
+            for stats in (
+                self.stats.setdefault(profile, ProfileStats()),
+                self.bucket_stats.setdefault((profile, bucket), ProfileStats()),
+            ):
+                stats.segments += 1
+                stats.audio_seconds += audio_seconds
+                stats.processing_seconds += processing_seconds
+                stats.rtf = stats.processing_seconds / stats.audio_seconds if stats.audio_seconds else 0.0
+
+    def report(self) -> Dict[str, ProfileStats]:
+        """Measured cost per profile.
+
+        Profiles are matched by duration, so RTFs over all segments compare
+        different populations. Savings are summed per duration bucket against
+        the default profile's RTF in the same bucket, which the baseline
+        samples fill. Buckets the default profile has no segments in are left out.
+        """
+        with self.lock:
+            report = {name: stats.model_copy() for name, stats in self.stats.items()}
+            buckets = {key: stats.model_copy() for key, stats in self.bucket_stats.items()}
+
+        for (name, bucket), stats in buckets.items():
+            baseline = buckets.get(("default", bucket))
+            if name == "default" or baseline is None or not baseline.audio_seconds:
+                continue
+            saved = (baseline.rtf - stats.rtf) * stats.audio_seconds
+            report[name].saved_seconds = (report[name].saved_seconds or 0.0) + saved
+        return report
+
+
+class LanguageHints:
+    """Remembers the language of each speaker to skip language detection.
+
+    A hint is given after `min_transcripts` consecutive confident transcripts
+    agreed on the language. After `redetect_every` final transcripts the
+    language is detected again, a confident detection of another language
+    drops the hint and restarts the streak.
+    """
+
+    def __init__(self, config: LanguageHintsConfig):
+        self.config = config
+        self.languages: Dict[str, Tuple[str, int]] = {}
+        self.since_detection: Dict[str, int] = {}
+        self.redetections = 0
+        self.disagreements = 0
+        self.lock = threading.Lock()
+
+    def hint(self, segment: SpeechSegment) -> Optional[str]:
+        key = speaker_key(segment)
+        with self.lock:
+            return self._hint(key)
+
+    def _hint(self, key: Optional[str]) -> Optional[str]:
+        if key is None or key not in self.languages:
+            return None
+        language, streak = self.languages[key]
+        if streak < self.config.min_transcripts:
+            return None
+        redetect = self.config.redetect_every
+        if redetect is not None and self.since_detection.get(key, 0) >= redetect:
+            return None
+        return language
+
+    def finished(self, segment: SpeechSegment) -> None:
+        """Count a final transcript of the speaker towards the next detection."""
+        if (key := speaker_key(segment)) is None:
+            return
+        with self.lock:
+            if key in self.languages:
+                self.since_detection[key] = self.since_detection.get(key, 0) + 1
+
+    def update(self, segment: SpeechSegment, transcript: Transcript) -> None:
+        """Record a detected language of the speaker."""
+        key = speaker_key(segment)
+        if key is None or not transcript.language:
+            return
+
+        probability = transcript.language_probability
+        confident = probability is None or probability >= self.config.min_probability
+
+        with self.lock:
+            language, streak = self.languages.get(key, (transcript.language, 0))
+            # NOTE: Hinted speakers only get here when their hint is due for re-detection.
+            redetected = streak >= self.config.min_transcripts
+            if redetected:
+                self.redetections += 1
+            self.since_detection[key] = 0
+            if not confident:
+                return
+
+            if language != transcript.language:
+                if redetected:
+                    self.disagreements += 1
+                language, streak = transcript.language, 0
+            self.languages[key] = (language, streak + 1)
+
+    def stats(self) -> LanguageHintStats:
+        with self.lock:
+            hinted = sum(1 for key in self.languages if self._hint(key) is not None)
+            return LanguageHintStats(
+                hinted_speakers=hinted,
+                redetections=self.redetections,
+                disagreements=self.disagreements,
+            )
@@ -0,0 +1,146 @@
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from assistant.components.mumble.mumble import SpeechSegment
+from assistant.config import SPEECH_PIPELINE_SAMPLERATE
+from assistant.utils.stats import LatencyStats, LatencySummary
+
+
+class SchedulerConfig(BaseModel):
+    """Ranking parameters for `SegmentScheduler`.
+
+    A segment's cost is `priorities[source] + duration_seconds`, lower runs first.
+    Every second spent in the queue lowers the cost by `aging`, so long batch
+    segments eventually overtake fresh live ones and cannot starve.
+    """
+
+    workers: Optional[int] = None
+    priorities: Dict[str, float] = Field(
+        default_factory=lambda: {"mumble": 0.0, "watchdog": 30.0}
+    )
+    default_priority: float = 10.0
+    aging: float = 1.0
+    live_sources: List[str] = Field(default_factory=lambda: ["mumble"])
+    live_deadline: Optional[float] = None
+
+
+class QueueStats(BaseModel):
+    pending: int
+    dropped: Dict[str, int]
+    wait: Dict[str, LatencySummary]
+
+
+class SegmentScheduler:
+    """Priority queue for speech segments with source classes, SJF and aging.
+
+    Exposes the subset of the `Queue` interface used by `consume`, `get()` blocks
+    until a segment is ready and returns `None` once the scheduler is closed.
+    """
+
+    def __init__(
+        self,
+        config: SchedulerConfig,
+        on_drop: Optional[Callable[[SpeechSegment], None]] = None,
+        duration: Optional[Callable[[SpeechSegment], float]] = None,
+    ):
+        self.logger = logging.getLogger("component.transcriber.scheduler")
+        self.config = config
+        self.on_drop = on_drop
+        self.duration = duration
+
+        self.heap: List[Tuple[float, int, float, SpeechSegment]] = []
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.closed = False
+
+        self.wait_stats: Dict[str, LatencyStats] = {}
+        self.dropped: Dict[str, int] = {}
+
+    def cost(self, segment: SpeechSegment, enqueued_at: float) -> float:
+        priority = self.config.priorities.get(
+            segment.source, self.config.default_priority
+        )
+        if self.duration is not None:
+            duration = self.duration(segment)
+        else:
+            duration = len(segment.data) / SPEECH_PIPELINE_SAMPLERATE
+        # NOTE: Aging is linear in time for every item, so it can be folded into
+        # a static key using the enqueue time instead of re-ranking on each get.
+        return priority + duration + self.config.aging * enqueued_at
+
+    def put_nowait(self, segment: Optional[SpeechSegment]) -> None:
+        if segment is None:
+            self.close()
+            return
+
+        enqueued_at = time.monotonic()
+        with self.condition:
+            heapq.heappush(
+                self.heap,
+                (self.cost(segment, enqueued_at), next(self.counter), enqueued_at, segment),
+            )
+            self.condition.notify()
+
+    put = put_nowait
+
+    def get(self) -> Optional[SpeechSegment]:
+        while True:
+            with self.condition:
+                while not self.heap and not self.closed:
+                    self.condition.wait()
+
+                if self.closed:
+                    return None
+
+                _, _, enqueued_at, segment = heapq.heappop(self.heap)
+
+            self._stats_for(segment.source).add(time.monotonic() - enqueued_at)
+
+            if self.is_stale(segment):
+                self.dropped[segment.source] = self.dropped.get(segment.source, 0) + 1
+                self.logger.warning(
+                    f"Dropped stale '{segment.source}' segment '{segment.segment_id}'"
+                )
+                if self.on_drop:
+                    self.on_drop(segment)
+                continue
+
+            return segment
+
+    def is_stale(self, segment: SpeechSegment) -> bool:
+        deadline = self.config.live_deadline
+        if deadline is None or segment.source not in self.config.live_sources:
+            return False
+
+        return (datetime.now() - segment.timestamp).total_seconds() > deadline
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def qsize(self) -> int:
+        with self.condition:
+            return len(self.heap)
+
+    def empty(self) -> bool:
+        return self.qsize() == 0
+
+    def _stats_for(self, source: str) -> LatencyStats:
+        if source not in self.wait_stats:
+            self.wait_stats[source] = LatencyStats()
+        return self.wait_stats[source]
+
+    def stats(self) -> QueueStats:
+        return QueueStats(
+            pending=self.qsize(),
+            dropped=dict(self.dropped),
+            wait={source: s.summary() for source, s in list(self.wait_stats.items())},
+        )
@@ -0,0 +1,121 @@
+import threading
+from enum import Enum
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from assistant.components.mumble.mumble import SpeechSegment
+from assistant.utils.stats import LatencySummary
+
+from .types import Transcript
+
+
+class SpeculationStats(BaseModel):
+    hits: int
+    misses: int
+    failed: int
+    hit_rate: float
+    end_of_speech_latency: LatencySummary
+
+
+class Confirmation(str, Enum):
+    NONE = "NONE"  # No speculation, transcribe the final segment as usual.
+    PENDING = "PENDING"  # Speculative result still running, it will be emitted on completion.
+    HIT = "HIT"  # Speculative result is ready and can be emitted right away.
+
+
+class Speculation:
+    def __init__(self, segment: SpeechSegment):
+        self.segment = segment
+        self.done = False
+        self.transcript: Optional[Transcript] = None
+        self.confirmed: Optional[SpeechSegment] = None
+
+
+class SpeculationTracker:
+    """Bookkeeping for speculative transcriptions started before the VAD endpoint.
+
+    A speculation is keyed by the utterance id, which is also the `segment_id` of
+    the final segment when the endpoint confirms it.
+    """
+
+    def __init__(self):
+        self.speculations: Dict[UUID, Speculation] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.failed = 0
+
+    def begin(self, segment: SpeechSegment) -> None:
+        with self.lock:
+            if segment.segment_id in self.speculations:
+                self.misses += 1
+            self.speculations[segment.segment_id] = Speculation(segment)
+
+    def cancel(self, segment_id: UUID) -> None:
+        with self.lock:
+            if self.speculations.pop(segment_id, None) is not None:
+                self.misses += 1
+
+    def is_speculating(self, segment_id: UUID) -> bool:
+        with self.lock:
+            return segment_id in self.speculations
+
+    def is_current(self, segment: SpeechSegment) -> bool:
+        """Tell whether a queued speculative segment is still worth transcribing."""
+        with self.lock:
+            speculation = self.speculations.get(segment.segment_id)
+            return speculation is not None and speculation.segment is segment
+
+    def resolve(
+        self, segment: SpeechSegment, transcript: Optional[Transcript]
+    ) -> Optional[SpeechSegment]:
+        """Store the speculative result, returns the final segment if it was already confirmed."""
+        with self.lock:
+            speculation = self.speculations.get(segment.segment_id)
+            if speculation is None or speculation.segment is not segment:
+                return None
+
+            speculation.done = True
+            speculation.transcript = transcript
+
+            if speculation.confirmed is None:
+                return None
+
+            del self.speculations[segment.segment_id]
+            self._count(transcript)
+            return speculation.confirmed
+
+    def confirm(self, segment: SpeechSegment) -> Tuple[Confirmation, Optional[Transcript]]:
+        with self.lock:
+            speculation = self.speculations.get(segment.segment_id)
+            if speculation is None:
+                return Confirmation.NONE, None
+
+            if not speculation.done:
+                speculation.confirmed = segment
+                return Confirmation.PENDING, None
+
+            del self.speculations[segment.segment_id]
+            self._count(speculation.transcript)
+            if speculation.transcript is None:
+                return Confirmation.NONE, None
+            return Confirmation.HIT, speculation.transcript
+
+    def _count(self, transcript: Optional[Transcript]) -> None:
+        if transcript is None:
+            self.failed += 1
+        else:
+            self.hits += 1
+
+    def stats(self, latency: LatencySummary) -> SpeculationStats:
+        with self.lock:
+            total = self.hits + self.misses + self.failed
+            return SpeculationStats(
+                hits=self.hits,
+                misses=self.misses,
+                failed=self.failed,
+                hit_rate=self.hits / total if total else 0.0,
+                end_of_speech_latency=latency,
+            )
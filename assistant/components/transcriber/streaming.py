@@ -0,0 +1,168 @@
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+import numpy as np
+
+from assistant.components.mumble.mumble import SpeechSegment
+from assistant.config import SPEECH_PIPELINE_SAMPLERATE
+
+from .types import Segment, Transcript, Word
+
+
+def offset_words(transcript: Transcript, offset: float) -> List[Word]:
+    """Collect word timestamps of a window transcript relative to the utterance start."""
+    return [
+        Word(word=w.word, start=w.start + offset, end=w.end + offset)
+        for segment in transcript.segments
+        for w in segment.words
+    ]
+
+
+def stitch(committed_until: float, words: List[Word]) -> List[Word]:
+    """Drop words that fall into the already committed part of the utterance."""
+    return [w for w in words if (w.start + w.end) / 2 > committed_until]
+
+
+def build_transcript(words: List[Word], language: str, duration: float) -> Transcript:
+    text = " ".join(w.word.strip() for w in words)
+    start = words[0].start if words else 0.0
+    end = words[-1].end if words else duration
+    return Transcript(
+        transcript=text,
+        language=language,
+        duration=duration,
+        segments=[Segment(text=text, start=start, end=end, words=words)] if words else [],
+    )
+
+
+class TranscriptStream:
+    """Rolling window state of one utterance transcribed while it is spoken.
+
+    Words ending more than `overlap` seconds before the window end are committed,
+    the rest stays tentative and is transcribed again by the next window.
+    """
+
+    def __init__(self, overlap: float):
+        self.overlap = overlap
+        self.committed: List[Word] = []
+        self.committed_until = 0.0
+        self.language = ""
+        self.busy = False
+        self.pending: Optional[SpeechSegment] = None
+        self.final: Optional[SpeechSegment] = None
+        self.touched = time.monotonic()
+
+    def window_seconds(self, segment: SpeechSegment) -> float:
+        """Audio the next window of the segment transcribes."""
+        _, window = self.window(segment)
+        return len(window) / SPEECH_PIPELINE_SAMPLERATE
+
+    def window(self, segment: SpeechSegment) -> Tuple[float, np.ndarray]:
+        start = max(0.0, self.committed_until - self.overlap)
+        return start, segment.data[int(start * SPEECH_PIPELINE_SAMPLERATE) :]
+
+    def update(self, transcript: Transcript, offset: float, duration: float, final: bool) -> Transcript:
+        words = stitch(self.committed_until, offset_words(transcript, offset))
+        self.language = transcript.language or self.language
+
+        if final:
+            self.committed += words
+            return build_transcript(self.committed, self.language, duration)
+
+        stable = [w for w in words if w.end <= duration - self.overlap]
+        if stable:
+            self.committed += stable
+            self.committed_until = stable[-1].end
+
+        return build_transcript(self.committed + words[len(stable) :], self.language, duration)
+
+    def preview(self, transcript: Transcript, offset: float, duration: float) -> Transcript:
+        """Stitch a window like a final one, without committing its words."""
+        committed, committed_until = list(self.committed), self.committed_until
+        words = stitch(committed_until, offset_words(transcript, offset))
+        return build_transcript(committed + words, transcript.language or self.language, duration)
+
+
+class StreamTracker:
+    """Keeps at most one window of every utterance in flight.
+
+    Partial segments arriving while a window is running replace each other, only
+    the newest one is transcribed once the running window completes. Idle
+    streams, whose final segment never came, are released after `idle_timeout`
+    seconds on the next submission.
+    """
+
+    def __init__(self, overlap: float, idle_timeout: Optional[float] = 30.0):
+        self.overlap = overlap
+        self.idle_timeout = idle_timeout
+        self.streams: Dict[UUID, TranscriptStream] = {}
+        self.lock = threading.Lock()
+
+    def expire(self) -> List[UUID]:
+        """Release streams without a window in flight that saw no segment for `idle_timeout`."""
+        if self.idle_timeout is None:
+            return []
+        now = time.monotonic()
+        with self.lock:
+            expired = [
+                segment_id
+                for segment_id, stream in self.streams.items()
+                if not stream.busy and now - stream.touched > self.idle_timeout
+            ]
+            for segment_id in expired:
+                del self.streams[segment_id]
+            return expired
+
+    def submit_partial(self, segment: SpeechSegment) -> bool:
+        self.expire()
+        with self.lock:
+            stream = self.streams.setdefault(segment.segment_id, TranscriptStream(self.overlap))
+            stream.touched = time.monotonic()
+            if stream.final is not None:
+                return False
+            if stream.busy:
+                stream.pending = segment
+                return False
+            stream.busy = True
+            return True
+
+    def submit_final(self, segment: SpeechSegment) -> Optional[bool]:
+        """Returns `None` when the utterance was not streamed, otherwise whether to enqueue now."""
+        self.expire()
+        with self.lock:
+            stream = self.streams.get(segment.segment_id)
+            if stream is None:
+                return None
+            stream.touched = time.monotonic()
+            stream.final = segment
+            stream.pending = None
+            if stream.busy:
+                return False
+            stream.busy = True
+            return True
+
+    def get(self, segment: SpeechSegment) -> Optional[TranscriptStream]:
+        with self.lock:
+            return self.streams.get(segment.segment_id)
+
+    def done(self, segment: SpeechSegment) -> Optional[SpeechSegment]:
+        """Release the utterance after a window, returns the next segment to enqueue."""
+        with self.lock:
+            stream = self.streams.get(segment.segment_id)
+            if stream is None:
+                return None
+            if not segment.partial:
+                del self.streams[segment.segment_id]
+                return None
+
+            following = stream.final or stream.pending
+            stream.pending = None
+            stream.busy = following is not None
+            stream.touched = time.monotonic()
+            return following
+
+    def discard(self, segment_id: UUID) -> None:
+        with self.lock:
+            self.streams.pop(segment_id, None)
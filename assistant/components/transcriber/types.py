@@ -40,6 +40,15 @@ class Segment(BaseModel):
     words: List[Word] = Field(default_factory=list)
 
 
+class TranscriptionOptions(BaseModel):
+    """Per-request transcription settings understood by every backend"""
+
+    model: str = "small"
+    diarize: bool = False
+    align_words: bool = False
+    language: Optional[str] = None
+
+
 class Transcript(BaseModel):
     """Complete transcript with all metadata"""
 
@@ -48,3 +57,4 @@ class Transcript(BaseModel):
     duration: float
     speakers: List[Speaker] = Field(default_factory=list)
     segments: List[Segment] = Field(default_factory=list)
+    language_probability: Optional[float] = None
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from queue import Empty, Queue
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import torch
+from pydantic import BaseModel
+
+
+class BatchingConfig(BaseModel):
+    enabled: bool = True
+    max_batch_size: int = 16
+    max_wait: float = 0.02
+    # Longest/shortest ratio allowed within one padded batch.
+    bucket_ratio: float = 1.5
+    torch_threads: Optional[int] = None
+
+
+def bucket_by_length(lengths: List[int], ratio: float) -> List[List[int]]:
+    """Group item indices so padding within a group stays below `ratio`."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    buckets: List[List[int]] = []
+    for i in order:
+        if buckets and lengths[i] <= lengths[buckets[-1][0]] * ratio:
+            buckets[-1].append(i)
+        else:
+            buckets.append([i])
+    return buckets
+
+
+def pad_batch(waveforms: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Zero-pad waveforms to equal length, returns (batch, 1, samples) audio and a (batch, samples) mask."""
+    length = max(len(w) for w in waveforms)
+    batch = np.zeros((len(waveforms), 1, length), dtype=np.float32)
+    mask = np.zeros((len(waveforms), length), dtype=np.float32)
+    for i, waveform in enumerate(waveforms):
+        batch[i, 0, : len(waveform)] = waveform
+        mask[i, : len(waveform)] = 1.0
+    return batch, mask
+
+
+class EmbeddingBatcher:
+    """Runs every embedding forward pass on one inference thread, in batches.
+
+    Callers block on `embed()` while pending segments are collected for up to
+    `max_wait` seconds, bucketed by length, padded and passed through the model
+    together. Padding is masked out of the statistics pooling via `weights`.
+    """
+
+    def __init__(self, model: Callable, device: str, config: BatchingConfig):
+        self.logger = logging.getLogger("component.voice_id.batcher")
+        self.model = model
+        self.device = device
+        self.config = config
+        self.pending: Queue = Queue()
+        self.lock = threading.Lock()
+        self.closed = False
+        self.is_running = True
+        self.thread = threading.Thread(target=self._worker, name="voice-id-inference", daemon=True)
+        self.thread.start()
+
+    def embed(self, waveform: np.ndarray) -> np.ndarray:
+        return self._submit(waveform).result()
+
+    def embed_many(self, waveforms: List[np.ndarray]) -> np.ndarray:
+        futures = [self._submit(waveform) for waveform in waveforms]
+        return np.stack([future.result() for future in futures])
+
+    def _submit(self, waveform: np.ndarray) -> Future:
+        future: Future = Future()
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("Embedding batcher is closed")
+            self.pending.put_nowait((waveform.astype(np.float32, copy=False), future))
+        return future
+
+    def close(self) -> None:
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.pending.put_nowait(None)
+        self.thread.join()
+        self._fail_pending(RuntimeError("Embedding batcher is closed"))
+
+    def _fail_pending(self, error: Exception) -> None:
+        while True:
+            try:
+                item = self.pending.get_nowait()
+            except Empty:
+                return
+            if item is not None:
+                item[1].set_exception(error)
+
+    def _collect(self) -> List[Tuple[np.ndarray, Future]]:
+        first = self.pending.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.config.max_wait
+        while len(batch) < self.config.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self.pending.get(timeout=timeout)
+            except Empty:
+                break
+            if item is None:
+                self.is_running = False
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self):
+        # NOTE: Intra-op thread count is process-wide in torch, but only this
+        # thread runs the embedding model so it does not contend with itself.
+        if self.config.torch_threads:
+            torch.set_num_threads(self.config.torch_threads)
+
+        while self.is_running:
+            batch = self._collect()
+            if not batch:
+                break
+
+            lengths = [len(waveform) for waveform, _ in batch]
+            for bucket in bucket_by_length(lengths, self.config.bucket_ratio):
+                items = [batch[i] for i in bucket]
+                try:
+                    embeddings = self._forward([waveform for waveform, _ in items])
+                except Exception as e:
+                    self.logger.exception(f"Batched embedding failed: {e}")
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+
+                for (_, future), embedding in zip(items, embeddings):
+                    future.set_result(embedding)
+
+    def _forward(self, waveforms: List[np.ndarray]) -> np.ndarray:
+        audio, mask = pad_batch(waveforms)
+        audio_t = torch.from_numpy(audio).to(self.device)
+
+        with torch.no_grad():
+            if len(waveforms) == 1:
+                embeddings = self.model(audio_t)
+            else:
+                weights = torch.from_numpy(mask).to(self.device)
+                embeddings = self.model(audio_t, weights=weights)
+
+        return embeddings.cpu().numpy().reshape(len(waveforms), -1)
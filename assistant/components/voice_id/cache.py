@@ -0,0 +1,117 @@
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+from pydantic import BaseModel
+
+from assistant.components.mumble.mumble import SpeechSegment
+
+
+class IdentityCacheConfig(BaseModel):
+    enabled: bool = True
+    # Confident matches in a row before the identity of a stream is pinned.
+    pin_after: int = 3
+    # Every k-th segment of a pinned stream is embedded again.
+    reverify_every: int = 10
+    # Minimal cosine similarity to the cached centroid to keep the pin.
+    drift_threshold: float = 0.6
+
+
+class IdentityCacheStats(BaseModel):
+    cached: int = 0
+    verified: int = 0
+    drifted: int = 0
+
+
+class SessionIdentity:
+    def __init__(self, speaker_id: str, embedding: np.ndarray):
+        self.speaker_id = speaker_id
+        self.centroid = embedding / np.linalg.norm(embedding)
+        self.matches = 1
+        self.pinned = False
+        self.since_verify = 0
+
+    def similarity(self, embedding: np.ndarray) -> float:
+        return float(np.dot(self.centroid, embedding / np.linalg.norm(embedding)))
+
+    def add(self, embedding: np.ndarray) -> None:
+        self.matches += 1
+        self.since_verify = 0
+        unit = embedding / np.linalg.norm(embedding)
+        centroid = self.centroid + (unit - self.centroid) / self.matches
+        self.centroid = centroid / np.linalg.norm(centroid)
+
+
+def stream_key(segment: SpeechSegment) -> Optional[str]:
+    """Only Mumble has one stream per user, other sources are not cached."""
+    if segment.source == "mumble" and (user := getattr(segment.source_info, "user", None)):
+        return f"{segment.source}:{user}"
+    return None
+
+
+class IdentityCache:
+    """Pins the speaker of a source stream after repeated confident matches.
+
+    Pinned streams skip embedding and lookup, except for every k-th segment that
+    is embedded to check it still sits close to the cached centroid. A drifting
+    embedding unpins the stream, so a shared account is caught on the next check.
+    """
+
+    def __init__(self, config: IdentityCacheConfig):
+        self.config = config
+        self.identities: Dict[str, SessionIdentity] = {}
+        self.stats = IdentityCacheStats()
+        self.lock = threading.Lock()
+
+    def get(self, key: Optional[str]) -> Optional[str]:
+        """Pinned speaker of the stream, `None` when the segment must be embedded."""
+        if key is None or not self.config.enabled:
+            return None
+
+        with self.lock:
+            identity = self.identities.get(key)
+            if identity is None or not identity.pinned:
+                return None
+
+            identity.since_verify += 1
+            if identity.since_verify >= self.config.reverify_every:
+                return None
+
+            self.stats.cached += 1
+            return identity.speaker_id
+
+    def verify(self, key: Optional[str], embedding: np.ndarray) -> Optional[str]:
+        """Check a fresh embedding against a pinned stream, returns the speaker if it still matches."""
+        if key is None or not self.config.enabled:
+            return None
+
+        with self.lock:
+            identity = self.identities.get(key)
+            if identity is None or not identity.pinned:
+                return None
+
+            self.stats.verified += 1
+            if identity.similarity(embedding) < self.config.drift_threshold:
+                self.stats.drifted += 1
+                del self.identities[key]
+                return None
+
+            identity.add(embedding)
+            return identity.speaker_id
+
+    def update(self, key: Optional[str], speaker_id: Optional[str], embedding: np.ndarray) -> None:
+        """Record the result of a full identification."""
+        if key is None or not self.config.enabled:
+            return
+
+        with self.lock:
+            identity = self.identities.get(key)
+            if speaker_id is None:
+                self.identities.pop(key, None)
+            elif identity is None or identity.speaker_id != speaker_id:
+                identity = self.identities[key] = SessionIdentity(speaker_id, embedding)
+            else:
+                identity.add(embedding)
+
+            if identity is not None and speaker_id is not None:
+                identity.pinned = identity.matches >= self.config.pin_after
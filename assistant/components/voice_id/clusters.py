@@ -0,0 +1,223 @@
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+from qdrant_client.models import PointStruct
+
+from .storage import VectorStore
+
+
+class ClusteringConfig(BaseModel):
+    # Minimal cosine similarity to join an existing pseudo-speaker.
+    assign_threshold: float = 0.7
+    # Pseudo-speakers with centroids closer than this are merged on compaction.
+    merge_threshold: float = 0.85
+    # Seconds since a pseudo-speaker was last heard before it is forgotten.
+    ttl: Optional[float] = 30 * 24 * 3600
+    # Raw embeddings kept per pseudo-speaker next to its centroid.
+    max_points_per_cluster: int = 20
+    # Seconds between background compactions, `None` disables them.
+    compaction_interval: Optional[float] = 600.0
+
+
+class UnknownCluster:
+    """Running mean of the embeddings of one unrecognised voice.
+
+    `members` holds the stored raw points of the cluster, kept across
+    compactions so a promoted speaker takes real embeddings along.
+    """
+
+    def __init__(
+        self,
+        centroid: np.ndarray,
+        cluster_id: Optional[str] = None,
+        count: int = 1,
+        points: int = 0,
+        first_seen: Optional[float] = None,
+        last_seen: Optional[float] = None,
+        seen: Optional[float] = None,
+    ):
+        self.cluster_id = cluster_id or str(uuid.uuid4())
+        self.centroid = normalize(centroid)
+        self.count = count
+        self.points = points
+        self.first_seen = first_seen or seen or time.time()
+        self.last_seen = last_seen or self.first_seen
+        self.members: List = []
+
+    def add(self, embedding: np.ndarray, weight: int = 1, seen: Optional[float] = None) -> None:
+        self.count += weight
+        self.centroid = normalize(self.centroid + (normalize(embedding) - self.centroid) * weight / self.count)
+        self.last_seen = max(self.last_seen, seen or time.time())
+
+    def merge(self, other: "UnknownCluster") -> None:
+        self.add(other.centroid, other.count, other.last_seen)
+        self.first_seen = min(self.first_seen, other.first_seen)
+        self.members += other.members
+
+    def point(self) -> PointStruct:
+        return PointStruct(id=self.cluster_id, vector=self.centroid.tolist(), payload=self.payload())
+
+    def member_points(self) -> List[PointStruct]:
+        """Raw points of the cluster, relabelled in case they came from a merged one."""
+        return [
+            PointStruct(
+                id=point.id,
+                vector=list(point.vector),
+                payload={**(point.payload or {}), "cluster_id": self.cluster_id, "kind": "point"},
+            )
+            for point in self.members
+        ]
+
+    def payload(self) -> dict:
+        return {
+            "cluster_id": self.cluster_id,
+            "kind": "centroid",
+            "count": self.count,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+        }
+
+    @classmethod
+    def from_payload(cls, vector: List[float], payload: dict) -> "UnknownCluster":
+        return cls(
+            np.array(vector, dtype=np.float32),
+            cluster_id=payload["cluster_id"],
+            count=payload.get("count", 1),
+            first_seen=payload.get("first_seen"),
+            last_seen=payload.get("last_seen"),
+        )
+
+
+def normalize(vector: np.ndarray) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), np.finfo(np.float32).eps)
+
+
+def seen_at(point) -> float:
+    return (point.payload or {}).get("seen") or 0.0
+
+
+def compact(clusters: List[UnknownCluster], config: ClusteringConfig, now: float) -> List[UnknownCluster]:
+    """Drop expired pseudo-speakers and merge the ones that sound alike, biggest first.
+
+    Every kept pseudo-speaker retains its newest `max_points_per_cluster` raw points.
+    """
+    if config.ttl is not None:
+        clusters = [c for c in clusters if now - c.last_seen <= config.ttl]
+
+    kept: List[UnknownCluster] = []
+    for cluster in sorted(clusters, key=lambda c: c.count, reverse=True):
+        similar = [k for k in kept if float(np.dot(k.centroid, cluster.centroid)) >= config.merge_threshold]
+        if similar:
+            max(similar, key=lambda k: float(np.dot(k.centroid, cluster.centroid))).merge(cluster)
+        else:
+            kept.append(cluster)
+
+    for cluster in kept:
+        newest = sorted(cluster.members, key=seen_at, reverse=True)[: config.max_points_per_cluster]
+        cluster.members = newest[::-1]
+        cluster.points = len(cluster.members)
+    return kept
+
+
+def clusters_from_points(points: List) -> List[UnknownCluster]:
+    """Rebuild pseudo-speakers from stored centroids, raw points and legacy unclustered points."""
+    centroids: Dict[str, UnknownCluster] = {}
+    raw: Dict[str, List] = {}
+    legacy: List[UnknownCluster] = []
+
+    for point in points:
+        payload = point.payload or {}
+        cluster_id = payload.get("cluster_id")
+        if cluster_id is None:
+            # NOTE: Points enrolled before clustering existed become singletons
+            # and are folded into their neighbours by the merge pass.
+            cluster = UnknownCluster(np.array(point.vector, dtype=np.float32), seen=payload.get("seen"))
+            cluster.members.append(point)
+            legacy.append(cluster)
+        elif payload.get("kind") == "centroid":
+            centroids[cluster_id] = UnknownCluster.from_payload(point.vector, payload)
+        else:
+            raw.setdefault(cluster_id, []).append(point)
+
+    for cluster_id, members in raw.items():
+        if cluster_id in centroids:
+            centroids[cluster_id].members = members
+            continue
+        seen = [m.payload.get("seen") or time.time() for m in members]
+        cluster = UnknownCluster(
+            np.mean([normalize(m.vector) for m in members], axis=0),
+            cluster_id=cluster_id,
+            count=len(members),
+            first_seen=min(seen),
+            last_seen=max(seen),
+        )
+        cluster.members = members
+        centroids[cluster_id] = cluster
+
+    return list(centroids.values()) + legacy
+
+
+def promote_cluster(
+    store: VectorStore, unknown_collection: str, known_collection: str, cluster_id: str, speaker_id: str
+) -> List[PointStruct]:
+    """Move the raw embeddings of a pseudo-speaker into the known collection and drop its centroid."""
+    points = store.scroll(unknown_collection, {"cluster_id": cluster_id})
+    # NOTE: The centroid is a running mean, not an enrollment, only raw points
+    # (and ones stored before points had a kind) become known embeddings.
+    raw = [point for point in points if (point.payload or {}).get("kind") != "centroid"]
+    if not raw:
+        return []
+
+    promoted = [
+        PointStruct(id=str(uuid.uuid4()), vector=list(point.vector), payload={"speaker_id": speaker_id})
+        for point in raw
+    ]
+    store.upsert(known_collection, promoted)
+    store.delete(unknown_collection, [point.id for point in points])
+    return promoted
+
+
+class UnknownClusters:
+    """Online assignment of unknown embeddings to pseudo-speakers."""
+
+    def __init__(self, config: ClusteringConfig):
+        self.config = config
+        self.clusters: Dict[str, UnknownCluster] = {}
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.clusters)
+
+    def load(self, clusters: List[UnknownCluster]) -> None:
+        with self.lock:
+            self.clusters = {c.cluster_id: c for c in clusters}
+
+    def assign(self, embedding: np.ndarray) -> Tuple[UnknownCluster, bool]:
+        """Add the embedding to the closest pseudo-speaker, returns it and whether to keep the raw point."""
+        unit = normalize(embedding)
+        with self.lock:
+            best, score = None, -1.0
+            for cluster in self.clusters.values():
+                similarity = float(np.dot(cluster.centroid, unit))
+                if similarity > score:
+                    best, score = cluster, similarity
+
+            if best is None or score < self.config.assign_threshold:
+                best = UnknownCluster(unit)
+                self.clusters[best.cluster_id] = best
+            else:
+                best.add(unit)
+
+            keep = best.points < self.config.max_points_per_cluster
+            if keep:
+                best.points += 1
+            return best, keep
+
+    def remove(self, cluster_id: str) -> Optional[UnknownCluster]:
+        with self.lock:
+            return self.clusters.pop(cluster_id, None)
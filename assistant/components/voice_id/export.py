@@ -0,0 +1,221 @@
+import copy
+import hashlib
+import logging
+import os
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Optional
+
+import numpy as np
+import torch
+from pydantic import BaseModel
+
+from assistant.config import SPEECH_PIPELINE_SAMPLERATE
+from assistant.utils.models import models
+
+logger = logging.getLogger("component.voice_id.export")
+
+PYANNOTE_EMBEDDING = "pyannote/embedding"
+
+BACKENDS = ("eager", "torchscript", "onnx")
+
+
+class InferenceConfig(BaseModel):
+    # One of "eager", "torchscript" or "onnx".
+    backend: str = "eager"
+    # Dynamic int8 quantisation of the weights.
+    quantize: bool = False
+    intra_op_threads: Optional[int] = None
+    inter_op_threads: Optional[int] = None
+    cache_dir: str = "./.cache/voice_id"
+    opset: int = 17
+
+
+class ExportedEmbedding:
+    """Callable with the signature of the eager model, `model(waveforms, weights=None)`."""
+
+    def __init__(self, run: Callable[[torch.Tensor, torch.Tensor], torch.Tensor]):
+        self.run = run
+
+    def __call__(self, waveforms: torch.Tensor, weights: Optional[torch.Tensor] = None) -> torch.Tensor:
+        if weights is None:
+            weights = torch.ones(waveforms.shape[0], waveforms.shape[-1], device=waveforms.device)
+        return self.run(waveforms, weights)
+
+
+def load_embedding_model(hf_token: Optional[str] = None) -> torch.nn.Module:
+    from pyannote.audio import Model
+
+    return Model.from_pretrained(PYANNOTE_EMBEDDING, use_auth_token=hf_token, strict=False).eval()
+
+
+def warmup_embedding_model(model: torch.nn.Module) -> None:
+    with torch.no_grad():
+        model(torch.zeros(1, 1, SPEECH_PIPELINE_SAMPLERATE, device=next(model.parameters()).device))
+
+
+models.register(PYANNOTE_EMBEDDING, load_embedding_model, warmup_embedding_model)
+
+
+def embedding_model(hf_token: Optional[str] = None) -> torch.nn.Module:
+    """The process-wide pyannote embedding model, loaded on first use."""
+    if hf_token is not None:
+        models.register(PYANNOTE_EMBEDDING, partial(load_embedding_model, hf_token), warmup_embedding_model, replace=True)
+    return models.get(PYANNOTE_EMBEDDING)
+
+
+def fingerprint(model: torch.nn.Module) -> str:
+    digest = hashlib.sha256()
+    for name, tensor in sorted(model.state_dict().items()):
+        digest.update(name.encode())
+        digest.update(tensor.detach().cpu().numpy().tobytes())
+    return digest.hexdigest()[:16]
+
+
+def artefact_path(model: torch.nn.Module, config: InferenceConfig) -> str:
+    suffix = "-int8" if config.quantize else ""
+    extension = "onnx" if config.backend == "onnx" else "pt"
+    name = f"embedding-{fingerprint(model)}-{config.backend}{suffix}.{extension}"
+    return os.path.join(os.path.expanduser(config.cache_dir), name)
+
+
+def set_torch_threads(config: InferenceConfig) -> None:
+    if config.intra_op_threads:
+        torch.set_num_threads(config.intra_op_threads)
+    if config.inter_op_threads:
+        try:
+            torch.set_num_interop_threads(config.inter_op_threads)
+        except RuntimeError as e:
+            # NOTE: Torch only accepts this before the first parallel region runs.
+            logger.warning(f"Inter-op threads left unchanged: {e}")
+
+
+@contextmanager
+def traceable(model: torch.nn.Module):
+    """Lightning modules raise from `trainer` when the tracer inspects them outside a Trainer."""
+    lightning = hasattr(type(model), "_jit_is_scripting")
+    if lightning:
+        model._jit_is_scripting = True
+    try:
+        yield model
+    finally:
+        if lightning:
+            del model._jit_is_scripting
+
+
+def example_inputs(seconds: float = 2.0, samplerate: int = 16000):
+    samples = int(seconds * samplerate)
+    return torch.randn(1, 1, samples), torch.ones(1, samples)
+
+
+def quantize_eager(model: torch.nn.Module) -> torch.nn.Module:
+    # NOTE: Dynamic quantisation covers the linear layers only, convolutions stay fp32.
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def export_torchscript(model: torch.nn.Module, path: str, config: InferenceConfig) -> None:
+    module = (quantize_eager(model) if config.quantize else model).eval()
+    # NOTE: `weights` is traced as a positional input, so one artefact serves
+    # single segments and padded batches alike.
+    with torch.no_grad(), traceable(module):
+        traced = torch.jit.trace(module, example_inputs())
+    torch.jit.save(torch.jit.freeze(traced), path)
+
+
+def export_onnx(model: torch.nn.Module, path: str, config: InferenceConfig) -> None:
+    fp32_path = path.replace("-int8.onnx", ".onnx")
+    if not os.path.exists(fp32_path):
+        with traceable(model):
+            torch.onnx.export(
+                model.eval(),
+                example_inputs(),
+                fp32_path,
+                input_names=["waveforms", "weights"],
+                output_names=["embeddings"],
+                dynamic_axes={
+                    "waveforms": {0: "batch", 2: "samples"},
+                    "weights": {0: "batch", 1: "samples"},
+                    "embeddings": {0: "batch"},
+                },
+                opset_version=config.opset,
+                dynamo=False,
+            )
+
+    if config.quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+
+
+def load_torchscript(path: str, device: str) -> ExportedEmbedding:
+    module = torch.jit.load(path, map_location=device).eval()
+
+    def run(waveforms, weights):
+        with torch.no_grad():
+            return module(waveforms, weights)
+
+    return ExportedEmbedding(run)
+
+
+def load_onnx(path: str, config: InferenceConfig) -> ExportedEmbedding:
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if config.intra_op_threads:
+        options.intra_op_num_threads = config.intra_op_threads
+    if config.inter_op_threads:
+        options.inter_op_num_threads = config.inter_op_threads
+    session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+
+    def run(waveforms, weights):
+        (embeddings,) = session.run(
+            None,
+            {
+                "waveforms": waveforms.detach().cpu().numpy().astype(np.float32),
+                "weights": weights.detach().cpu().numpy().astype(np.float32),
+            },
+        )
+        return torch.from_numpy(embeddings)
+
+    return ExportedEmbedding(run)
+
+
+def load_inference_model(model: torch.nn.Module, config: InferenceConfig, device: str) -> Callable:
+    """Wrap the eager embedding model in the configured inference backend.
+
+    Exported artefacts are cached under `cache_dir`, keyed by a fingerprint of
+    the weights, so the export only runs once per model and backend.
+    """
+    if config.backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{config.backend}', expected one of {BACKENDS}")
+
+    set_torch_threads(config)
+    model = model.eval()
+
+    if config.backend == "eager":
+        return quantize_eager(model) if config.quantize else model
+
+    if config.backend == "onnx" and device != "cpu":
+        logger.warning("ONNX inference runs on the CPU execution provider only.")
+
+    path = artefact_path(model, config)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        logger.info(f"Exporting embedding model to '{path}'")
+        # NOTE: The model may be shared through the registry, `.cpu()` would move it off its device in place.
+        model = copy.deepcopy(model).cpu()
+        if config.backend == "torchscript":
+            export_torchscript(model, path, config)
+        else:
+            export_onnx(model, path, config)
+
+    if config.backend == "torchscript":
+        return load_torchscript(path, device)
+    return load_onnx(path, config)
+
+
+def cosine(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity of two embedding batches."""
+    a = a / np.linalg.norm(a, axis=-1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=-1, keepdims=True)
+    return np.sum(a * b, axis=-1)
@@ -0,0 +1,85 @@
+import threading
+from typing import List, Sequence, Set, Tuple
+
+import numpy as np
+
+
+class SpeakerIndex:
+    """In-memory cosine index over known-speaker embeddings.
+
+    Vectors are stored L2-normalised in one float32 matrix, so a query is a single
+    matrix-vector product. Scores match Qdrant's COSINE distance. Points already
+    in the index are skipped, so adding a point the store returned again is harmless.
+    """
+
+    def __init__(self, dim: int, capacity: int = 1024):
+        self.dim = dim
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.size = 0
+        self.point_ids: List[str] = []
+        self.speaker_ids: List[str] = []
+        self.known: Set[str] = set()
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.size
+
+    @staticmethod
+    def normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, np.finfo(np.float32).eps)
+
+    def add(self, point_id: str, vector: np.ndarray, speaker_id: str) -> None:
+        self.add_many([point_id], np.asarray(vector)[np.newaxis, :], [speaker_id])
+
+    def add_many(self, point_ids: Sequence[str], vectors: np.ndarray, speaker_ids: Sequence[str]) -> None:
+        vectors = self.normalize(vectors)
+        with self.lock:
+            new = [i for i, p in enumerate(point_ids) if str(p) not in self.known]
+            required = self.size + len(new)
+            if required > len(self.vectors):
+                grown = np.zeros((max(required, 2 * len(self.vectors)), self.dim), dtype=np.float32)
+                grown[: self.size] = self.vectors[: self.size]
+                self.vectors = grown
+
+            self.vectors[self.size : required] = vectors[new]
+            self.size = required
+            self.point_ids.extend(str(point_ids[i]) for i in new)
+            self.speaker_ids.extend(speaker_ids[i] for i in new)
+            self.known.update(str(point_ids[i]) for i in new)
+
+    def replace(self, point_ids: Sequence[str], vectors: np.ndarray, speaker_ids: Sequence[str]) -> None:
+        """Swap the whole index for a fresh copy of the store."""
+        fresh = SpeakerIndex(self.dim, max(1, len(point_ids)))
+        if len(point_ids):
+            fresh.add_many(point_ids, vectors, speaker_ids)
+        with self.lock:
+            self.vectors, self.size = fresh.vectors, fresh.size
+            self.point_ids, self.speaker_ids, self.known = fresh.point_ids, fresh.speaker_ids, fresh.known
+
+    def remove_speaker(self, speaker_id: str) -> List[str]:
+        with self.lock:
+            keep = [i for i, s in enumerate(self.speaker_ids) if s != speaker_id]
+            removed = [p for p, s in zip(self.point_ids, self.speaker_ids) if s == speaker_id]
+
+            self.vectors[: len(keep)] = self.vectors[keep]
+            self.size = len(keep)
+            self.point_ids = [self.point_ids[i] for i in keep]
+            self.speaker_ids = [self.speaker_ids[i] for i in keep]
+            self.known.difference_update(removed)
+            return removed
+
+    def search(self, vector: np.ndarray, k: int = 1) -> List[Tuple[str, float]]:
+        """Return up to `k` (speaker_id, score) pairs, best first."""
+        query = self.normalize(vector).reshape(-1)
+        with self.lock:
+            if self.size == 0:
+                return []
+            scores = self.vectors[: self.size] @ query
+            speaker_ids = self.speaker_ids
+
+            k = min(k, self.size)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(speaker_ids[i], float(scores[i])) for i in top]
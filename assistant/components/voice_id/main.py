@@ -3,31 +3,34 @@ import logging
 from assistant.components.watchdog.main import WatchdogSourceInfo
 import numpy as np
 from datetime import datetime
-from numpy._core.multiarray import ndarray
 import torch
-from pyannote.audio import Model
 from queue import Queue
 import threading
+import time
 from pydantic import BaseModel, Field
 import uuid
-from qdrant_client import QdrantClient
-from qdrant_client.models import (
-    Distance,
-    VectorParams,
-    PointStruct,
-    Filter,
-    FieldCondition,
-    MatchValue,
-)
-from typing import Protocol, Union
-
+from qdrant_client.models import PointStruct
+from typing import Union
 
-from assistant.config import SPEECH_PIPELINE_SAMPLERATE
 from assistant.core.component import Component
 from assistant.core import service
 from assistant.components.mumble.mumble import SourceInfo, SpeechSegment
 from assistant.utils.utils import observe
 from .events import VOICE_ID_SPEAKER_ENROLLED, VOICE_ID_SPEAKER_IDENTIFIED
+from .batching import BatchingConfig, EmbeddingBatcher
+from .cache import IdentityCache, IdentityCacheConfig, IdentityCacheStats, stream_key
+from .clusters import (
+    ClusteringConfig,
+    UnknownClusters,
+    clusters_from_points,
+    compact,
+    promote_cluster,
+)
+from .export import InferenceConfig, embedding_model, load_inference_model
+from .index import SpeakerIndex
+from .storage import StorageConfig, VectorStore, create_store
+from .windows import WindowConfig, WindowedEmbedder, WindowedEmbedding
+from .writer import WriteBehindConfig, WriteBehindWriter, WriteStats
 
 
 class IdentifiedSpeaker(BaseModel):
@@ -61,19 +64,36 @@ class VoiceID(Component):
             "unknown_speakers_collection", "unknown_speaker_embeddings"
         )
 
-        self.qdrant_host = self.get_config("qdrant_host", "localhost")
-        self.qdrant_port = self.get_config("qdrant_port", 6334)
+        self.storage = StorageConfig.model_validate(
+            {
+                "host": self.get_config("qdrant_host", "localhost"),
+                "port": self.get_config("qdrant_port", 6334),
+                **self.get_config("storage", {}),
+            }
+        )
 
         self.speech_segments = Queue()
         self.speech_segments_observer = observe(
-            self.speech_segments, self.process_speech, threaded=True
+            self.speech_segments,
+            self.process_speech,
+            threaded=True,
+            max_workers=self.get_config("workers", 8),
         )
 
         self.recognizer = SpeakerRecognizer(
-            self.qdrant_host,
-            self.qdrant_port,
+            create_store(self.storage),
             self.known_speakers_collection,
             self.unknown_speakers_collection,
+            batching=BatchingConfig.model_validate(self.get_config("batching", {})),
+            clustering=ClusteringConfig.model_validate(self.get_config("clustering", {})),
+            writes=WriteBehindConfig.model_validate(self.get_config("write_behind", {})),
+            inference=InferenceConfig.model_validate(self.get_config("inference", {})),
+            windows=WindowConfig.model_validate(self.get_config("windows", {})),
+            refresh_interval=self.get_config("index_refresh_interval", 60),
+        )
+
+        self.identities = IdentityCache(
+            IdentityCacheConfig.model_validate(self.get_config("identity_cache", {}))
         )
 
         # Initialize model
@@ -83,18 +103,58 @@ class VoiceID(Component):
 
     def shutdown(self) -> None:
         super().shutdown()
+        self.recognizer.close()
         self.logger.info(f"Component '{self.name}' shutdown complete")
 
     def on_speech(self, segment: SpeechSegment) -> None:
         self.logger.info(f"Received segment: {segment.segment_id}")
         self.speech_segments.put_nowait(segment)
 
+    @service
+    def identity_cache_stats(self) -> IdentityCacheStats:
+        return self.identities.stats.model_copy()
+
+    @service
+    def write_stats(self) -> WriteStats:
+        return self.recognizer.writer.get_stats()
+
+    @service
+    def promote_cluster(self, cluster_id: str, speaker_id: str) -> int:
+        """Turn an unknown pseudo-speaker into a known speaker, returns the number of embeddings moved."""
+        return self.recognizer.promote_cluster(cluster_id, speaker_id)
+
     def process_speech(self, segment: SpeechSegment) -> None:
         self.logger.info(f"Processing segment: {segment.segment_id}")
-        if speaker := self.recognizer.identify_speaker(segment.data, 0.75):
+        key = stream_key(segment)
+
+        if speaker := self.identities.get(key):
+            self.logger.info(f"Recognized speaker: {speaker} (cached)")
+            return
+
+        analysis = self.recognizer.embed(segment.data)
+        if analysis is None:
+            return
+        embedding = analysis.embedding
+
+        if analysis.multi_speaker:
+            # NOTE: A blurred embedding must neither unpin a stream nor become an unknown speaker.
+            speaker = self.recognizer.identify_embedding(embedding, self.similarity_threshold)
+            self.logger.info(
+                f"Segment '{segment.segment_id}' may contain several speakers, best match: {speaker}"
+            )
+            return
+
+        if speaker := self.identities.verify(key, embedding):
+            self.logger.info(f"Recognized speaker: {speaker} (verified)")
+            return
+
+        speaker = self.recognizer.identify_embedding(embedding, self.similarity_threshold)
+        self.identities.update(key, speaker, embedding)
+
+        if speaker:
             self.logger.info(f"Recognized speaker: {speaker}")
         else:
-            self.recognizer.enroll_unknown(segment)
+            self.recognizer.enroll_unknown(segment, embedding)
 
             if isinstance(segment.source_info, WatchdogSourceInfo):
                 self.logger.info(
@@ -113,139 +173,279 @@ class VoiceID(Component):
 class SpeakerRecognizer:
     def __init__(
         self,
-        host,
-        grpc_port,
+        store: VectorStore,
         known_speakers,
         unknown_speakers,
         hf_token=None,
+        batching: Optional[BatchingConfig] = None,
+        clustering: Optional[ClusteringConfig] = None,
+        writes: Optional[WriteBehindConfig] = None,
+        inference: Optional[InferenceConfig] = None,
+        windows: Optional[WindowConfig] = None,
+        refresh_interval: Optional[float] = None,
     ):
         self.logger = logging.getLogger("component.voice_id.recognizer")
         self.logger.setLevel(logging.INFO)
-        self.client = QdrantClient(host=host, grpc_port=grpc_port, prefer_grpc=True)
+        self.store = store
         self.known_speakers = known_speakers
         self.unknown_speakers = unknown_speakers
         self.embedding_size = 512
         self._initialize_collection(self.known_speakers)
         self._initialize_collection(self.unknown_speakers)
 
+        # NOTE: Enrollment writes are buffered so the processing threads never
+        # wait on the vector store, the local index is updated immediately.
+        self.writer = WriteBehindWriter(self.store, writes or WriteBehindConfig(enabled=False))
+
+        # NOTE: The vector store stays the durable copy, identification is served
+        # from this local copy of the known speakers without a round-trip.
+        self.index = SpeakerIndex(self.embedding_size)
+        self.index_lock = threading.Lock()
+        self._load_index()
+
         device = "cuda" if torch.cuda.is_available() else "cpu"
         self.logger.info(f"Using '{device}' device for embedding computation.")
-        self.model = Model.from_pretrained(
-            "pyannote/embedding", use_auth_token=hf_token, strict=False
-        )
+        self.model = embedding_model(hf_token)
         self.model.eval()
         self.device = device
         self.model = self.model.to(device)
+        self.model = load_inference_model(self.model, inference or InferenceConfig(), device)
+
+        batching = batching or BatchingConfig(enabled=False)
+        self.batcher = (
+            EmbeddingBatcher(self.model, device, batching) if batching.enabled else None
+        )
+        self.windows = WindowedEmbedder(self._embed_batch, windows or WindowConfig(enabled=False))
+
+        # NOTE: Unknown embeddings are folded into pseudo-speakers, the collection
+        # holds one centroid per cluster plus a bounded number of raw points.
+        self.clusters = UnknownClusters(clustering or ClusteringConfig())
+        self.unknown_lock = threading.Lock()
+        self.stopped = threading.Event()
+
+        # NOTE: The first compaction also loads the pseudo-speakers, it runs in the
+        # background so a large unknown collection does not hold up startup.
+        self.compaction_thread = threading.Thread(
+            target=self._compaction_worker, name="voice-id-compaction", daemon=True
+        )
+        self.compaction_thread.start()
+
+        # NOTE: Speakers enrolled by other processes, e.g. tools/void.py, only
+        # reach the local index when it is reloaded from the store.
+        self.refresh_interval = refresh_interval
+        self.refresh_thread = None
+        if refresh_interval:
+            self.refresh_thread = threading.Thread(
+                target=self._refresh_worker, name="voice-id-index-refresh", daemon=True
+            )
+            self.refresh_thread.start()
+
+    def close(self) -> None:
+        self.stopped.set()
+        if self.compaction_thread:
+            self.compaction_thread.join()
+        if self.refresh_thread:
+            self.refresh_thread.join()
+        if self.batcher:
+            self.batcher.close()
+        self.writer.close()
+        self.store.close()
+
+    def _compaction_worker(self) -> None:
+        interval = self.clusters.config.compaction_interval
+        while True:
+            try:
+                self.compact_unknown()
+            except Exception as e:
+                self.logger.exception(f"Failed to compact unknown speakers: {e}")
+            if not interval or self.stopped.wait(interval):
+                return
+
+    def _refresh_worker(self) -> None:
+        while not self.stopped.wait(self.refresh_interval):
+            try:
+                self.refresh_index()
+            except Exception as e:
+                self.logger.exception(f"Failed to refresh known speakers: {e}")
+
+    def refresh_index(self) -> None:
+        """Reload the known speakers from the store."""
+        with self.index_lock:
+            self.writer.flush()
+            self._load_index(replace=True)
+
+    def compact_unknown(self) -> None:
+        """Rewrite the unknown collection as a centroid and the newest raw points per pseudo-speaker."""
+        with self.unknown_lock:
+            self.writer.flush()
+            points = self.store.scroll(self.unknown_speakers)
+            clusters = compact(clusters_from_points(points), self.clusters.config, time.time())
+
+            retained = [p for cluster in clusters for p in [cluster.point(), *cluster.member_points()]]
+            kept = {str(point.id) for point in retained}
+            stale = [point.id for point in points if str(point.id) not in kept]
+            if retained:
+                self.store.upsert(self.unknown_speakers, retained)
+            if stale:
+                self.store.delete(self.unknown_speakers, stale)
+
+            self.clusters.load(clusters)
+
+        self.logger.info(
+            f"Compacted {len(points)} unknown speaker points into {len(clusters)} clusters."
+        )
+
+    def promote_cluster(self, cluster_id: str, speaker_id: str) -> int:
+        with self.unknown_lock:
+            self.writer.flush()
+            points = promote_cluster(
+                self.store, self.unknown_speakers, self.known_speakers, cluster_id, speaker_id
+            )
+            self.clusters.remove(cluster_id)
+
+        for point in points:
+            self.index.add(str(point.id), np.array(point.vector), speaker_id)
+        return len(points)
 
     def _initialize_collection(self, new_collection: str) -> None:
         try:
-            collections = self.client.get_collections().collections
-            collection_names = [collection.name for collection in collections]
-
-            if new_collection not in collection_names:
-                self.client.create_collection(
-                    collection_name=new_collection,
-                    vectors_config=VectorParams(
-                        size=self.embedding_size, distance=Distance.COSINE
-                    ),
-                )
+            self.store.ensure_collection(new_collection, self.embedding_size)
         except Exception as e:
-            raise RuntimeError(f"Failed to initialize Qdrant collection: {str(e)}")
+            raise RuntimeError(f"Failed to initialize collection '{new_collection}': {str(e)}")
 
-    def _extract_embedding(self, data: np.ndarray) -> np.ndarray:
+    def _load_index(self, replace: bool = False) -> None:
+        points = self.store.scroll(self.known_speakers)
+        point_ids = [str(point.id) for point in points]
+        vectors = np.array([point.vector for point in points], dtype=np.float32).reshape(-1, self.embedding_size)
+        speaker_ids = [point.payload.get("speaker_id") for point in points]
+
+        if replace:
+            self.index.replace(point_ids, vectors, speaker_ids)
+        elif points:
+            self.index.add_many(point_ids, vectors, speaker_ids)
+
+        self.logger.info(f"Loaded {len(self.index)} known speaker embeddings.")
+
+    @staticmethod
+    def _waveform(data: np.ndarray) -> np.ndarray:
         if len(data.shape) > 1:
             data = data[:, 0]
 
         if data.dtype != np.int16:
             data = (data * 32768).astype(np.int16)
 
-        waveform = torch.tensor(data, dtype=torch.float32) / 32768.0
-        waveform = waveform.unsqueeze(0).to(self.device)
+        return data.astype(np.float32) / 32768.0
+
+    def _embed_batch(self, waveforms: np.ndarray) -> np.ndarray:
+        """Embeddings of equally long waveforms, shaped (batch, samples)."""
+        if self.batcher:
+            return self.batcher.embed_many(list(waveforms))
+
+        batch = torch.from_numpy(waveforms).unsqueeze(1).to(self.device)
 
         with torch.no_grad():
-            embedding = self.model(waveform)
+            embeddings = self.model(batch)
 
-        return embedding.cpu().numpy().flatten()
+        return embeddings.cpu().numpy().reshape(len(waveforms), -1)
+
+    def _extract_embedding(self, data: np.ndarray) -> np.ndarray:
+        return self.windows.embed(self._waveform(data)).embedding
 
     def enroll_known(self, data: np.ndarray, speaker_id: str):
-        self._enroll_speaker(self.known_speakers, data, {"speaker_id": speaker_id})
+        if point := self._enroll_speaker(self.known_speakers, data, {"speaker_id": speaker_id}):
+            self.index.add(str(point.id), np.array(point.vector), speaker_id)
 
-    def enroll_unknown(self, segment: SpeechSegment):
-        self._enroll_speaker(
-            self.unknown_speakers, segment.data, {"source": segment.source}
-        )
+    def enroll_unknown(
+        self, segment: SpeechSegment, embedding: Optional[np.ndarray] = None
+    ) -> Optional[str]:
+        try:
+            embedding_np = embedding if embedding is not None else self._extract_embedding(segment.data)
+            if np.isnan(embedding_np).any() or np.isinf(embedding_np).any():
+                return None
+
+            with self.unknown_lock:
+                cluster, keep = self.clusters.assign(embedding_np)
+                points = [cluster.point()]
+                if keep:
+                    points.append(
+                        PointStruct(
+                            id=str(uuid.uuid4()),
+                            vector=embedding_np.tolist(),
+                            payload={
+                                "source": segment.source,
+                                "cluster_id": cluster.cluster_id,
+                                "kind": "point",
+                                "seen": time.time(),
+                            },
+                        )
+                    )
+                for point in points:
+                    self.writer.put(self.unknown_speakers, point)
+            return cluster.cluster_id
+        except Exception as e:
+            self.logger.exception(f"Failed to enroll unknown speaker, due to: {e}")
+            return None
 
     def _enroll_speaker(
-        self, collection_name: str, data: np.ndarray, payload: Optional[dict] = None
-    ) -> bool:
+        self,
+        collection_name: str,
+        data: np.ndarray,
+        payload: Optional[dict] = None,
+        embedding: Optional[np.ndarray] = None,
+    ) -> Optional[PointStruct]:
         try:
-            embedding_np = self._extract_embedding(data)
+            embedding_np = embedding if embedding is not None else self._extract_embedding(data)
             if np.isnan(embedding_np).any() or np.isinf(embedding_np).any():
-                return False
-
-            point_id = str(uuid.uuid4())
-            self.client.upsert(
-                collection_name=collection_name,
-                points=[
-                    PointStruct(
-                        id=point_id,
-                        vector=embedding_np.tolist(),
-                        payload=payload,
-                    )
-                ],
+                return None
+
+            point = PointStruct(
+                id=str(uuid.uuid4()),
+                vector=embedding_np.tolist(),
+                payload=payload,
             )
-            return True
+            self.writer.put(collection_name, point)
+            return point
         except Exception as e:
             self.logger.exception(f"Failed to enroll speaker, due to: {e}")
-            return False
+            return None
 
-    def identify_speaker(self, data: np.ndarray, threshold: float) -> Union[str, None]:
+    def embed(self, data: np.ndarray) -> Optional[WindowedEmbedding]:
         try:
-            embedding_np = self._extract_embedding(data)
+            return self.windows.embed(self._waveform(data))
+        except Exception as e:
+            self.logger.exception(f"Failed to extract embedding: {e}")
+            return None
 
-            search_results = self.client.query_points(
-                collection_name=self.known_speakers,
-                query=embedding_np.tolist(),
-                with_payload=True,
-                limit=1,
-            )
-            self.logger.info(f"Points: {search_results.points}")
+    def identify_embedding(self, embedding_np: np.ndarray, threshold: float) -> Union[str, None]:
+        matches = self.index.search(embedding_np, k=1)
+        self.logger.info(f"Matches: {matches}")
 
-            if search_results.points:
-                top_result = search_results.points[0]
-                found_speaker_id = top_result.payload.get("speaker_id")
-                confidence = top_result.score
+        if matches:
+            found_speaker_id, confidence = matches[0]
 
-                if confidence >= threshold:
-                    return found_speaker_id
+            if confidence >= threshold:
+                return found_speaker_id
 
-            return None
+        return None
+
+    def identify_speaker(self, data: np.ndarray, threshold: float) -> Union[str, None]:
+        try:
+            return self.identify_embedding(self._extract_embedding(data), threshold)
         except Exception as e:
             self.logger.exception(f"Failed to identify speaker: {e}")
             return None
 
     def delete_speaker(self, speaker_id: str) -> bool:
         try:
-            filter_query = {
-                "must": [{"key": "speaker_id", "match": {"value": speaker_id}}]
-            }
-
-            points = self.client.scroll(
-                collection_name=self.known_speakers,
-                scroll_filter=filter_query,
-                with_payload=False,
-                with_vectors=False,
-                limit=100,
-            )
-
-            point_ids = [point.id for point in points[0]]
-
-            if not point_ids:
-                return False
-
-            self.client.delete(
-                collection_name=self.known_speakers, points_selector=point_ids
-            )
-            return True
+            with self.index_lock:
+                self.writer.flush()
+                points = self.store.scroll(self.known_speakers, {"speaker_id": speaker_id})
+
+                point_ids = [point.id for point in points]
+                # NOTE: The store goes first, a failed delete must not hide a speaker that is still stored.
+                if point_ids:
+                    self.store.delete(self.known_speakers, point_ids)
+                self.index.remove_speaker(speaker_id)
+                return bool(point_ids)
         except Exception:
             return False
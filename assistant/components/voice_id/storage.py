@@ -0,0 +1,336 @@
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+import numpy as np
+from pydantic import BaseModel
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    MatchValue,
+    PointStruct,
+    QueryRequest,
+    VectorParams,
+)
+
+PointId = Union[str, int]
+
+
+class StorageConfig(BaseModel):
+    # One of "qdrant", "qdrant_local" or "numpy".
+    backend: str = "qdrant"
+    host: str = "localhost"
+    port: int = 6334
+    # Directory of the embedded stores, ":memory:" keeps everything in RAM.
+    path: str = "./.storage/voice_id"
+
+
+class Match(NamedTuple):
+    id: PointId
+    payload: dict
+    score: float
+
+
+class VectorStore(ABC):
+    """Collections of embeddings with a payload, searched by cosine similarity."""
+
+    @abstractmethod
+    def ensure_collection(self, collection: str, dim: int) -> None:
+        pass
+
+    @abstractmethod
+    def upsert(self, collection: str, points: List[PointStruct]) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, collection: str, ids: List[PointId]) -> None:
+        pass
+
+    @abstractmethod
+    def scroll(self, collection: str, match: Optional[Dict[str, Any]] = None) -> List[PointStruct]:
+        """Every point of the collection whose payload has all the `match` values, with vectors."""
+        pass
+
+    @abstractmethod
+    def search(self, collection: str, vectors: np.ndarray, limit: int = 1) -> List[List[Match]]:
+        """Nearest points for each row of `vectors`."""
+        pass
+
+    @abstractmethod
+    def count(self, collection: str) -> int:
+        pass
+
+    @abstractmethod
+    def close(self) -> None:
+        pass
+
+
+class QdrantStore(VectorStore):
+    def __init__(self, client: QdrantClient):
+        self.client = client
+
+    @classmethod
+    def remote(cls, host: str, port: int) -> "QdrantStore":
+        return cls(QdrantClient(host=host, grpc_port=port, prefer_grpc=True))
+
+    @classmethod
+    def local(cls, path: str) -> "QdrantStore":
+        # NOTE: The embedded mode locks `path`, only one process may open it.
+        if path == ":memory:":
+            return cls(QdrantClient(location=":memory:"))
+        return cls(QdrantClient(path=path))
+
+    def ensure_collection(self, collection: str, dim: int) -> None:
+        if not self.client.collection_exists(collection):
+            self.client.create_collection(
+                collection_name=collection,
+                vectors_config=VectorParams(size=dim, distance=Distance.COSINE),
+            )
+
+    def upsert(self, collection: str, points: List[PointStruct]) -> None:
+        self.client.upsert(collection_name=collection, points=points)
+
+    def delete(self, collection: str, ids: List[PointId]) -> None:
+        self.client.delete(collection_name=collection, points_selector=list(ids))
+
+    def scroll(self, collection: str, match: Optional[Dict[str, Any]] = None) -> List[PointStruct]:
+        scroll_filter = None
+        if match:
+            scroll_filter = Filter(
+                must=[FieldCondition(key=key, match=MatchValue(value=value)) for key, value in match.items()]
+            )
+
+        points, offset = [], None
+        while True:
+            page, offset = self.client.scroll(
+                collection_name=collection,
+                scroll_filter=scroll_filter,
+                with_payload=True,
+                with_vectors=True,
+                limit=1000,
+                offset=offset,
+            )
+            points.extend(PointStruct(id=p.id, vector=p.vector, payload=p.payload or {}) for p in page)
+            if offset is None:
+                return points
+
+    def search(self, collection: str, vectors: np.ndarray, limit: int = 1) -> List[List[Match]]:
+        responses = self.client.query_batch_points(
+            collection_name=collection,
+            requests=[QueryRequest(query=v.tolist(), with_payload=True, limit=limit) for v in vectors],
+        )
+        return [[Match(p.id, p.payload or {}, p.score) for p in r.points] for r in responses]
+
+    def count(self, collection: str) -> int:
+        return self.client.count(collection_name=collection).count
+
+    def close(self) -> None:
+        self.client.close()
+
+
+class NumpyCollection:
+    """Vectors in a growable memory-mapped matrix, ids and payloads in an append-only log.
+
+    Deleted rows are reused, the log is rewritten as a snapshot once it holds
+    far more operations than live points. The log is opened per append, so no
+    handle is left open by a failed load or snapshot.
+    """
+
+    def __init__(self, path: Optional[str], dim: int, capacity: int = 1024):
+        self.path = path
+        self.dim = dim
+        self.rows: Dict[PointId, int] = {}
+        self.payloads: Dict[int, dict] = {}
+        self.free: List[int] = []
+        self.operations = 0
+        self.log_path = None if path is None else os.path.join(path, "points.jsonl")
+
+        if path is None:
+            self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        else:
+            os.makedirs(path, exist_ok=True)
+            vectors_path = os.path.join(path, "vectors.npy")
+            if os.path.exists(vectors_path):
+                self.vectors = np.load(vectors_path, mmap_mode="r+")
+            else:
+                self.vectors = np.lib.format.open_memmap(
+                    vectors_path, mode="w+", dtype=np.float32, shape=(capacity, dim)
+                )
+            self._replay()
+
+        used = set(self.rows.values())
+        self.free = sorted(set(range(len(self.vectors))) - used, reverse=True)
+        self.ids = {row: point_id for point_id, row in self.rows.items()}
+        self.live = np.zeros(len(self.vectors), dtype=bool)
+        self.live[list(used)] = True
+        self.norms = np.linalg.norm(self.vectors, axis=1)
+
+    def _replay(self) -> None:
+        if not os.path.exists(self.log_path):
+            return
+
+        with open(self.log_path) as f:
+            for line in f:
+                entry = json.loads(line)
+                self.operations += 1
+                if entry["op"] == "upsert":
+                    self.rows[entry["id"]] = entry["row"]
+                    self.payloads[entry["row"]] = entry["payload"]
+                elif entry["id"] in self.rows:
+                    self.payloads.pop(self.rows.pop(entry["id"]), None)
+
+    def _append(self, entries: List[dict]) -> None:
+        self.operations += len(entries)
+        if self.log_path is None:
+            return
+
+        with open(self.log_path, "a") as log:
+            log.write("".join(json.dumps(entry) + "\n" for entry in entries))
+        if self.operations > 2 * len(self.rows) + 1000:
+            self._snapshot()
+
+    def _snapshot(self) -> None:
+        with open(self.log_path + ".tmp", "w") as f:
+            for point_id, row in self.rows.items():
+                f.write(json.dumps({"op": "upsert", "id": point_id, "row": row, "payload": self.payloads[row]}) + "\n")
+        os.replace(self.log_path + ".tmp", self.log_path)
+        self.operations = len(self.rows)
+
+    def _grow(self) -> None:
+        capacity = len(self.vectors)
+        if self.path is None:
+            vectors = np.zeros((capacity * 2, self.dim), dtype=np.float32)
+        else:
+            vectors_path = os.path.join(self.path, "vectors.npy")
+            vectors = np.lib.format.open_memmap(
+                vectors_path + ".tmp", mode="w+", dtype=np.float32, shape=(capacity * 2, self.dim)
+            )
+        vectors[:capacity] = self.vectors
+        self.norms = np.concatenate([self.norms, np.zeros(capacity, dtype=self.norms.dtype)])
+        self.live = np.concatenate([self.live, np.zeros(capacity, dtype=bool)])
+        self.free = list(range(capacity * 2 - 1, capacity - 1, -1)) + self.free
+
+        if self.path is not None:
+            vectors.flush()
+            del self.vectors
+            os.replace(vectors_path + ".tmp", vectors_path)
+            vectors = np.load(vectors_path, mmap_mode="r+")
+        self.vectors = vectors
+
+    def upsert(self, points: List[PointStruct]) -> None:
+        entries = []
+        for point in points:
+            row = self.rows.get(point.id)
+            if row is None:
+                if not self.free:
+                    self._grow()
+                row = self.free.pop()
+                self.rows[point.id] = row
+                self.ids[row] = point.id
+                self.live[row] = True
+
+            self.vectors[row] = np.asarray(point.vector, dtype=np.float32)
+            self.norms[row] = np.linalg.norm(self.vectors[row])
+            self.payloads[row] = point.payload or {}
+            entries.append({"op": "upsert", "id": point.id, "row": row, "payload": self.payloads[row]})
+
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+        self._append(entries)
+
+    def delete(self, ids: List[PointId]) -> None:
+        entries = []
+        for point_id in ids:
+            row = self.rows.pop(point_id, None)
+            if row is None:
+                continue
+            self.payloads.pop(row, None)
+            self.ids.pop(row, None)
+            self.live[row] = False
+            self.free.append(row)
+            entries.append({"op": "delete", "id": point_id})
+        self._append(entries)
+
+    def scroll(self, match: Optional[Dict[str, Any]]) -> List[PointStruct]:
+        return [
+            PointStruct(id=point_id, vector=self.vectors[row].tolist(), payload=self.payloads[row])
+            for point_id, row in self.rows.items()
+            if not match or all(self.payloads[row].get(k) == v for k, v in match.items())
+        ]
+
+    def search(self, vectors: np.ndarray, limit: int) -> List[List[Match]]:
+        if not self.rows:
+            return [[] for _ in vectors]
+
+        # NOTE: Scoring every row up to the highest live one avoids gathering a
+        # copy of the live vectors, free rows are masked out afterwards.
+        end = int(np.flatnonzero(self.live)[-1]) + 1
+        queries = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        scores = (self.vectors[:end] @ queries.T).T / np.maximum(self.norms[:end], np.finfo(np.float32).eps)
+        scores[:, ~self.live[:end]] = -np.inf
+
+        k = min(limit, len(self.rows))
+        results = []
+        for row_scores in scores:
+            top = np.argpartition(-row_scores, k - 1)[:k]
+            top = top[np.argsort(-row_scores[top])]
+            results.append([Match(self.ids[row], self.payloads[row], float(row_scores[row])) for row in top])
+        return results
+
+    def close(self) -> None:
+        if isinstance(self.vectors, np.memmap):
+            self.vectors.flush()
+
+
+class NumpyStore(VectorStore):
+    """Brute-force cosine store without any service, one directory per collection."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = None if path in (None, ":memory:") else path
+        self.collections: Dict[str, NumpyCollection] = {}
+        self.lock = threading.Lock()
+
+    def ensure_collection(self, collection: str, dim: int) -> None:
+        with self.lock:
+            if collection not in self.collections:
+                path = os.path.join(self.path, collection) if self.path else None
+                self.collections[collection] = NumpyCollection(path, dim)
+
+    def upsert(self, collection: str, points: List[PointStruct]) -> None:
+        with self.lock:
+            self.collections[collection].upsert(points)
+
+    def delete(self, collection: str, ids: List[PointId]) -> None:
+        with self.lock:
+            self.collections[collection].delete(ids)
+
+    def scroll(self, collection: str, match: Optional[Dict[str, Any]] = None) -> List[PointStruct]:
+        with self.lock:
+            return self.collections[collection].scroll(match)
+
+    def search(self, collection: str, vectors: np.ndarray, limit: int = 1) -> List[List[Match]]:
+        with self.lock:
+            return self.collections[collection].search(np.atleast_2d(vectors).astype(np.float32), limit)
+
+    def count(self, collection: str) -> int:
+        with self.lock:
+            return len(self.collections[collection].rows)
+
+    def close(self) -> None:
+        with self.lock:
+            for collection in self.collections.values():
+                collection.close()
+
+
+def create_store(config: StorageConfig) -> VectorStore:
+    if config.backend == "qdrant":
+        return QdrantStore.remote(config.host, config.port)
+    if config.backend == "qdrant_local":
+        return QdrantStore.local(config.path)
+    if config.backend == "numpy":
+        return NumpyStore(config.path)
+    raise ValueError(f"Unknown storage backend '{config.backend}'")
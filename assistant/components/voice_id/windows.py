@@ -0,0 +1,96 @@
+from typing import Callable, List, Tuple
+
+import numpy as np
+from pydantic import BaseModel
+
+from assistant.config import SPEECH_PIPELINE_SAMPLERATE
+
+
+class WindowConfig(BaseModel):
+    enabled: bool = True
+    # Window length and hop in seconds.
+    window: float = 3.0
+    hop: float = 1.5
+    # Segments up to this many seconds are embedded in a single pass.
+    max_single_pass: float = 4.5
+    # Windows per forward pass, bounds the peak memory of long segments.
+    max_windows: int = 8
+    # Windows less similar than this to the aggregate mark a possible multi-speaker segment.
+    agreement_threshold: float = 0.5
+
+
+class WindowedEmbedding:
+    """Aggregated embedding of a segment with its per-window embeddings."""
+
+    def __init__(
+        self,
+        embedding: np.ndarray,
+        windows: np.ndarray,
+        weights: np.ndarray,
+        agreement: np.ndarray,
+        threshold: float,
+    ):
+        self.embedding = embedding
+        self.windows = windows
+        self.weights = weights
+        self.agreement = agreement
+        # NOTE: Near-silent windows carry no speaker information, so they do not vote.
+        self.multi_speaker = bool(np.any(agreement[weights > 0.1 / len(weights)] < threshold))
+
+
+def window_bounds(length: int, window: int, hop: int) -> List[Tuple[int, int]]:
+    """Start and end samples of windows covering `length`, the last one aligned to the end."""
+    if length <= window:
+        return [(0, length)]
+
+    starts = list(range(0, length - window + 1, hop))
+    if starts[-1] + window < length:
+        starts.append(length - window)
+    return [(start, start + window) for start in starts]
+
+
+def window_weights(waveform: np.ndarray, bounds: List[Tuple[int, int]]) -> np.ndarray:
+    """Quality weight per window, its RMS energy normalised to sum to one."""
+    energy = np.array([np.sqrt(np.mean(np.square(waveform[start:end]))) for start, end in bounds])
+    total = energy.sum()
+    return energy / total if total > 0 else np.full(len(bounds), 1.0 / len(bounds))
+
+
+def aggregate(embeddings: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Weighted mean of the unit window embeddings and the cosine of every window to it."""
+    units = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    mean = (units * weights[:, None]).sum(axis=0)
+    mean /= max(float(np.linalg.norm(mean)), np.finfo(np.float32).eps)
+    return mean, units @ mean
+
+
+class WindowedEmbedder:
+    """Embeds long segments as overlapping fixed-size windows.
+
+    Windows are views into the segment and go through the model `max_windows`
+    at a time, so cost grows linearly with length while peak memory stays that
+    of one chunk of windows.
+    """
+
+    def __init__(self, embed_batch: Callable[[np.ndarray], np.ndarray], config: WindowConfig):
+        self.embed_batch = embed_batch
+        self.config = config
+        self.window = int(config.window * SPEECH_PIPELINE_SAMPLERATE)
+        self.hop = int(config.hop * SPEECH_PIPELINE_SAMPLERATE)
+
+    def embed(self, waveform: np.ndarray) -> WindowedEmbedding:
+        single_pass = len(waveform) <= self.config.max_single_pass * SPEECH_PIPELINE_SAMPLERATE
+        if single_pass or not self.config.enabled:
+            bounds = [(0, len(waveform))]
+        else:
+            bounds = window_bounds(len(waveform), self.window, self.hop)
+
+        chunks = []
+        for i in range(0, len(bounds), self.config.max_windows):
+            batch = np.stack([waveform[start:end] for start, end in bounds[i : i + self.config.max_windows]])
+            chunks.append(self.embed_batch(batch))
+
+        embeddings = np.concatenate(chunks)
+        weights = window_weights(waveform, bounds)
+        embedding, agreement = aggregate(embeddings, weights)
+        return WindowedEmbedding(embedding, embeddings, weights, agreement, self.config.agreement_threshold)
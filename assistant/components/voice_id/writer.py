@@ -0,0 +1,161 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from pydantic import BaseModel
+from qdrant_client.models import PointStruct
+
+from .storage import VectorStore
+
+
+class WriteBehindConfig(BaseModel):
+    enabled: bool = True
+    max_batch_size: int = 256
+    # Seconds pending points may wait before a flush.
+    flush_interval: float = 1.0
+    # Oldest points are dropped once this many are waiting.
+    max_pending: int = 10000
+    retry_backoff: float = 0.5
+    max_backoff: float = 30.0
+    # Flush attempts on close before pending points are given up.
+    close_retries: int = 3
+
+
+class WriteStats(BaseModel):
+    written: int = 0
+    dropped: int = 0
+    failed_flushes: int = 0
+    pending: int = 0
+
+
+class WriteBehindWriter:
+    """Buffers vector-store upserts and writes them in bulk from a background thread.
+
+    Points are keyed by collection and id, so a point upserted again before it was
+    written (e.g. a cluster centroid) is only sent once. Failed batches are put back
+    and retried with exponential backoff, bounded by `max_pending`.
+    """
+
+    def __init__(self, store: VectorStore, config: WriteBehindConfig):
+        self.logger = logging.getLogger("component.voice_id.writer")
+        self.store = store
+        self.config = config
+        self.pending: "OrderedDict[Tuple[str, str], PointStruct]" = OrderedDict()
+        self.stats = WriteStats()
+        self.lock = threading.Condition()
+        self.write_lock = threading.RLock()
+        self.stopped = threading.Event()
+
+        self.thread = None
+        if config.enabled:
+            self.thread = threading.Thread(target=self._worker, name="voice-id-writer", daemon=True)
+            self.thread.start()
+
+    def put(self, collection: str, point: PointStruct) -> None:
+        if not self.config.enabled:
+            self.store.upsert(collection, [point])
+            with self.lock:
+                self.stats.written += 1
+            return
+
+        with self.lock:
+            key = (collection, str(point.id))
+            self.pending.pop(key, None)
+            self.pending[key] = point
+            self._trim()
+            if len(self.pending) >= self.config.max_batch_size:
+                self.lock.notify()
+
+    def flush(self) -> bool:
+        """Write everything pending now, returns `False` if a batch failed."""
+        # NOTE: Holding the write lock also waits for a batch the worker has in flight.
+        with self.write_lock:
+            while self.pending:
+                if not self._flush_once():
+                    return False
+            return True
+
+    def close(self) -> None:
+        self.stopped.set()
+        with self.lock:
+            self.lock.notify()
+        if self.thread:
+            self.thread.join()
+
+        for attempt in range(self.config.close_retries):
+            if self.flush():
+                return
+            self.stopped.wait(min(self.config.retry_backoff * 2**attempt, self.config.max_backoff))
+
+        with self.lock:
+            self.logger.error(f"Dropping {len(self.pending)} pending points on close.")
+            self.stats.dropped += len(self.pending)
+            self.pending.clear()
+
+    def get_stats(self) -> WriteStats:
+        with self.lock:
+            return self.stats.model_copy(update={"pending": len(self.pending)})
+
+    def _trim(self) -> None:
+        # Called with `self.lock` held.
+        while len(self.pending) > self.config.max_pending:
+            self.pending.popitem(last=False)
+            self.stats.dropped += 1
+
+    def _take(self) -> List[Tuple[Tuple[str, str], PointStruct]]:
+        with self.lock:
+            batch = []
+            while self.pending and len(batch) < self.config.max_batch_size:
+                batch.append(self.pending.popitem(last=False))
+            return batch
+
+    def _requeue(self, items: List[Tuple[Tuple[str, str], PointStruct]]) -> None:
+        with self.lock:
+            for key, point in reversed(items):
+                # NOTE: A newer version of the same point supersedes the failed one.
+                if key not in self.pending:
+                    self.pending[key] = point
+                    self.pending.move_to_end(key, last=False)
+            self._trim()
+
+    def _flush_once(self) -> bool:
+        with self.write_lock:
+            batch = self._take()
+            by_collection: Dict[str, List[Tuple[Tuple[str, str], PointStruct]]] = {}
+            for key, point in batch:
+                by_collection.setdefault(key[0], []).append((key, point))
+
+            failed = []
+            for collection, items in by_collection.items():
+                try:
+                    self.store.upsert(collection, [point for _, point in items])
+                    with self.lock:
+                        self.stats.written += len(items)
+                except Exception as e:
+                    self.logger.warning(f"Failed to write {len(items)} points to '{collection}': {e}")
+                    failed.extend(items)
+
+            if failed:
+                with self.lock:
+                    self.stats.failed_flushes += 1
+                self._requeue(failed)
+            return not failed
+
+    def _worker(self):
+        backoff = 0.0
+        while not self.stopped.is_set():
+            if backoff:
+                self.stopped.wait(backoff)
+            else:
+                with self.lock:
+                    if len(self.pending) < self.config.max_batch_size:
+                        self.lock.wait(self.config.flush_interval)
+
+            if self.stopped.is_set():
+                break
+
+            if self.flush():
+                backoff = 0.0
+            else:
+                backoff = min(max(backoff * 2, self.config.retry_backoff), self.config.max_backoff)
@@ -0,0 +1,239 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Iterator, List, Optional, Set
+
+import numpy as np
+import soundfile as sf
+from pydantic import BaseModel, Field
+
+from assistant.config import SPEECH_PIPELINE_BUFFER_SIZE_MILIS, SPEECH_PIPELINE_SAMPLERATE
+from assistant.utils.audio import VadFilter
+from assistant.utils.audio.reshape import StreamResampler
+
+logger = logging.getLogger(__name__)
+
+
+class IngestConfig(BaseModel):
+    # Decode, resample and VAD files in worker processes instead of the watchdog thread.
+    processes: bool = True
+    # Worker processes, one per core by default.
+    workers: int = Field(default_factory=lambda: os.cpu_count() or 1)
+    # Files submitted but not yet emitted, further files wait for a slot.
+    max_pending: int = 64
+    # Seconds of audio decoded at a time, memory stays flat however long the file is.
+    block_seconds: float = 10.0
+
+
+class IngestResult(BaseModel):
+    file: str
+    # Seconds of audio in the file.
+    seconds: float = 0.0
+    segments: int = 0
+    # Seconds spent decoding, resampling and running VAD.
+    elapsed: float = 0.0
+    error: Optional[str] = None
+
+
+def to_int16(data: np.ndarray) -> np.ndarray:
+    return (np.clip(data, -1.0, 1.0) * np.iinfo(np.int16).max).astype(np.int16)
+
+
+def stream_audio(file: str, block_seconds: float = 10.0) -> Iterator[np.ndarray]:
+    """Read a file block by block as 16-bit mono at the pipeline sample rate."""
+    with sf.SoundFile(file) as f:
+        resampler = StreamResampler(f.samplerate, SPEECH_PIPELINE_SAMPLERATE)
+        blocksize = max(1, int(f.samplerate * block_seconds))
+        for block in f.blocks(blocksize=blocksize, dtype="float64", always_2d=True):
+            resampled = resampler(block.mean(axis=1))
+            if len(resampled):
+                yield to_int16(resampled)
+        tail = resampler.flush()
+        if len(tail):
+            yield to_int16(tail)
+
+
+def decode_audio(file: str) -> np.ndarray:
+    """Read a whole file as 16-bit mono at the pipeline sample rate."""
+    return np.concatenate([np.zeros(0, dtype=np.int16), *stream_audio(file)])
+
+
+def detect_speech(file: str, on_speech: Callable[[np.ndarray], None], block_seconds: float = 10.0) -> IngestResult:
+    """Stream a file through VAD and hand out its speech segments as they end, with a VAD state of its own."""
+    started = time.perf_counter()
+    result = IngestResult(file=file)
+    chunk_samples = SPEECH_PIPELINE_SAMPLERATE * SPEECH_PIPELINE_BUFFER_SIZE_MILIS // 1000
+    try:
+
+        def callback(speech: np.ndarray):
+            result.segments += 1
+            on_speech(speech)
+
+        vad_filter = VadFilter(callback)
+        samples = 0
+        rest = np.zeros(0, dtype=np.int16)
+        for block in stream_audio(file, block_seconds):
+            samples += len(block)
+            # NOTE: VAD takes fixed chunks, the remainder is carried into the next block.
+            audio = np.concatenate([rest, block])
+            whole = len(audio) // chunk_samples * chunk_samples
+            for offset in range(0, whole, chunk_samples):
+                vad_filter(audio[offset : offset + chunk_samples])
+            rest = audio[whole:]
+        result.seconds = samples / SPEECH_PIPELINE_SAMPLERATE
+    except Exception as e:
+        result.error = str(e)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+_segments = None
+
+
+def _init_worker(segments) -> None:
+    global _segments
+    _segments = segments
+
+
+def _ingest(index: int, file: str, block_seconds: float) -> IngestResult:
+    """Runs in a worker process, segments go out on the shared queue as soon as VAD closes them."""
+    try:
+        return detect_speech(file, lambda speech: _segments.put((index, "speech", speech)), block_seconds)
+    finally:
+        # NOTE: Sent on the segment queue after the segments, a result future may complete before they are read.
+        _segments.put((index, "end", None))
+
+
+class FileIngestor:
+    """Turns audio files into speech segments on a process pool, in submission order.
+
+    Every file is decoded, resampled and run through VAD by one worker
+    process, so files are processed in parallel and each has its own VAD
+    state. Files are decoded block by block and segments are streamed back
+    while the file is still being read.
+    Segments of the oldest unfinished file are emitted at once, those of
+    later files are held back until every earlier file is done, so
+    `on_speech` sees files in the order they were submitted.
+    """
+
+    def __init__(
+        self,
+        on_speech: Callable[[str, np.ndarray], None],
+        on_done: Optional[Callable[[IngestResult], None]] = None,
+        config: Optional[IngestConfig] = None,
+    ):
+        self.on_speech = on_speech
+        self.on_done = on_done
+        self.config = config or IngestConfig()
+
+        # NOTE: Spawned, forking a process that already runs ONNX Runtime and torch threads can deadlock.
+        self.context = multiprocessing.get_context("spawn")
+        self.segments = self.context.Queue()
+        self.pool = self._create_pool()
+        self.slots = threading.Semaphore(self.config.max_pending)
+
+        self.lock = threading.Lock()
+        self.files: Dict[int, str] = {}
+        self.results: Dict[int, IngestResult] = {}
+        self.held: Dict[int, List[np.ndarray]] = {}
+        self.ended: Set[int] = set()
+        self.submitted = 0
+        self.next = 0
+        self.drained = threading.Condition(self.lock)
+
+        self.collector = threading.Thread(target=self._collect, name="ingest", daemon=True)
+        self.collector.start()
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.config.workers,
+            mp_context=self.context,
+            initializer=_init_worker,
+            initargs=(self.segments,),
+        )
+
+    def submit(self, file: str) -> Future:
+        """Queue a file, blocks while `max_pending` files are still being emitted."""
+        self.slots.acquire()
+        with self.lock:
+            index = self.submitted
+            self.submitted += 1
+            self.files[index] = file
+            try:
+                future = self.pool.submit(_ingest, index, file, self.config.block_seconds)
+            except BrokenProcessPool:
+                # NOTE: A worker that died takes the pool down with it, the files it had are reported as failed.
+                logger.warning("Process pool broken, starting a new one")
+                self.pool.shutdown(wait=False)
+                self.pool = self._create_pool()
+                future = self.pool.submit(_ingest, index, file, self.config.block_seconds)
+        future.add_done_callback(lambda f: self._finished(index, f))
+        return future
+
+    def _finished(self, index: int, future: Future) -> None:
+        if future.exception() is None:
+            self.segments.put((index, "result", future.result()))
+            return
+        # The worker died, its end marker may never come.
+        with self.lock:
+            file = self.files[index]
+        self.segments.put((index, "result", IngestResult(file=file, error=str(future.exception()))))
+        self.segments.put((index, "end", None))
+
+    def _collect(self) -> None:
+        while True:
+            item = self.segments.get()
+            if item is None:
+                return
+            try:
+                self._receive(*item)
+            except Exception as e:
+                logger.exception(f"Failed to emit segments of file {item[0]}: {e}")
+
+    def _receive(self, index: int, kind: str, payload) -> None:
+        # Only ever called on the collector thread.
+        if kind == "speech":
+            if index == self.next:
+                self.on_speech(self.files[index], payload)
+            else:
+                self.held.setdefault(index, []).append(payload)
+            return
+
+        # NOTE: A file is done once both its end marker and its result arrived, in either order.
+        if kind == "end":
+            self.ended.add(index)
+        else:
+            self.results[index] = payload
+
+        while self.next in self.ended and self.next in self.results:
+            done = self.next
+            self.ended.discard(done)
+            result = self.results.pop(done)
+            if result.error is not None:
+                logger.warning(f"Failed to ingest '{result.file}': {result.error}")
+            if self.on_done is not None:
+                self.on_done(result)
+
+            with self.lock:
+                self.files.pop(done)
+                self.next += 1
+                self.drained.notify_all()
+            self.slots.release()
+
+            for speech in self.held.pop(self.next, []):
+                self.on_speech(self.files[self.next], speech)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every submitted file is emitted."""
+        with self.drained:
+            return self.drained.wait_for(lambda: self.next == self.submitted, timeout)
+
+    def close(self) -> None:
+        self.wait()
+        self.pool.shutdown()
+        self.segments.put(None)
+        self.collector.join()
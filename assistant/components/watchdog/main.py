@@ -3,17 +3,10 @@ from functools import partial
 from typing import Callable, List
 import os
 import numpy as np
-import resampy
-import soundfile as sf
 from queue import Queue
 from pydantic import BaseModel, Field
 
-from assistant.config import (
-    SPEECH_PIPELINE_BUFFER_SIZE_MILIS,
-    SPEECH_PIPELINE_SAMPLERATE,
-)
 from assistant.core.component import Component
-from assistant.utils.audio import VadFilter, chop_audio
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler, EVENT_TYPE_CREATED
 
@@ -21,6 +14,7 @@ from assistant.utils.utils import observe
 
 
 from . import events
+from .ingest import FileIngestor, IngestConfig, IngestResult, detect_speech
 from assistant.components.mumble.mumble import SpeechSegment
 
 
@@ -77,16 +71,28 @@ class Watchdog(Component):
                 self.logger.warning(f"Directory '{item.path}' not found.")
 
         observer.start()
+        self.observer = observer
+
+        # NOTE: With processes, files are decoded and run through VAD in parallel,
+        # segments are still emitted file by file in the order the files appeared.
+        self.ingest_config = IngestConfig.model_validate(self.get_config("ingest", {}))
+        self.ingestor = None
+        if self.ingest_config.processes:
+            self.ingestor = FileIngestor(self.on_speech, self.on_ingested, self.ingest_config)
+
         self.file_events = Queue()
         self.file_events_observer = observe(
             self.file_events, lambda item: self.categorize_files(*item)
         )
-        self.vad_filter = VadFilter(self.on_speech)
 
         self.logger.info(f"Plugin '{self.name}' initialized and ready")
 
     def shutdown(self) -> None:
         super().shutdown()
+        self.observer.stop()
+        self.file_events.put_nowait(None)
+        if self.ingestor is not None:
+            self.ingestor.close()
         self.logger.info(f"Plugin '{self.name}' disconnection from server.")
 
     def on_file(self, event: str, file: str | bytes):
@@ -104,24 +110,25 @@ class Watchdog(Component):
 
     def process_audio(self, file: str | bytes):
         self.logger.info(f"Starting processing of '{file}' audio file")
-        sound, samplerate = sf.read(file)
+        if self.ingestor is not None:
+            self.ingestor.submit(str(file))
+            return
 
-        resampled_float = resampy.resample(
-            sound, samplerate, SPEECH_PIPELINE_SAMPLERATE
+        self.on_ingested(
+            detect_speech(str(file), partial(self.on_speech, str(file)), self.ingest_config.block_seconds)
         )
-        resampled = (resampled_float * np.iinfo(np.int16).max).astype(np.int16)
 
-        self.vad_filter = VadFilter(partial(self.on_speech, str(file)))
-        for segment in chop_audio(
-            resampled, SPEECH_PIPELINE_SAMPLERATE, SPEECH_PIPELINE_BUFFER_SIZE_MILIS
-        ):
-            self.vad_filter(segment)  # TODO: Logging
+    def on_ingested(self, result: IngestResult):
+        if result.error is not None:
+            self.logger.error(f"Processing of '{result.file}' audio file failed: {result.error}")
+            return
 
-        self.logger.info(f"Processing of '{file}' audio file done")
-
-    def on_speech(self, file: str, speech: bytes):
-        self.logger.info(f"{type(speech)}")
+        self.logger.info(
+            f"Processing of '{result.file}' audio file done, {result.segments} segments in "
+            f"{result.seconds:.1f}s of audio ({result.seconds / max(result.elapsed, 1e-9):.1f}x real time)"
+        )
 
+    def on_speech(self, file: str, speech: np.ndarray):
         data = np.frombuffer(speech, dtype=np.int16)
 
         info = WatchdogSourceInfo(file=file)
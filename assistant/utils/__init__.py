@@ -1,2 +1,6 @@
 from .audio import audio_length, chop_audio, enrich_with_silence, create_empty_audio
-from .utils import ensure_model_exists, event_context, observe
+from .models import ModelRegistry, ModelStats, models
+from .provisioning import ModelProvisioner, ProvisionStatus, PullProgress, RetryConfig, provisioner
+from .stats import LatencyStats, LatencySummary
+from .utils import consume, drain, ensure_model_exists, event_context, observe
+from .shards import ShardConfig, ShardPool, ShardStats, conversation_key
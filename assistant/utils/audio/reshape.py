@@ -1,3 +1,4 @@
+from fractions import Fraction
 from typing import Callable
 import numpy as np
 import resampy
@@ -57,3 +58,70 @@ class FixedLengthAudioChunker:
 
         self.audio_buffer = self.audio_buffer[target_samples:]
 
+
+
+class StreamResampler:
+    """Resamples a signal that arrives in blocks, matching `resampy.resample` on the whole of it.
+
+    Blocks are cut where input and output samples line up, each one is
+    resampled with enough neighbouring input on both sides to cover the
+    filter, and only its own output is kept. Output lags the input by the
+    filter half-width, `flush()` returns the rest once the input ended.
+    """
+
+    def __init__(self, source_samplerate: int, target_samplerate: int, filter: str = "kaiser_best"):
+        self.source_samplerate = source_samplerate
+        self.target_samplerate = target_samplerate
+        self.filter = filter
+
+        ratio = Fraction(target_samplerate, source_samplerate)
+        # Input samples per aligned step, and the output samples they become.
+        self.step = ratio.denominator
+        self.step_out = ratio.numerator
+        self.ratio = ratio
+
+        # NOTE: Kept in float64, resampy's float32 kernel is about a third slower.
+        window, precision, _ = resampy.filters.get_filter(filter)
+        half_width = (len(window) / precision) / min(1.0, float(ratio))
+        self.pad = int(np.ceil((half_width + 1) / self.step)) * self.step
+
+        self.history = np.zeros(self.pad, dtype=np.float64)
+        self.pending = np.zeros(0, dtype=np.float64)
+        self.consumed = 0
+        self.produced = 0
+
+    def __call__(self, block: np.ndarray) -> np.ndarray:
+        if self.source_samplerate == self.target_samplerate:
+            return np.asarray(block, dtype=np.float64)
+
+        self.pending = np.concatenate([self.pending, np.asarray(block, dtype=np.float64)])
+        length = (len(self.pending) - self.pad) // self.step * self.step
+        if length <= 0:
+            return np.zeros(0, dtype=np.float64)
+        return self._resample(length, self.pending[: length + self.pad])
+
+    def flush(self) -> np.ndarray:
+        if self.source_samplerate == self.target_samplerate or not len(self.pending):
+            return np.zeros(0, dtype=np.float64)
+
+        # NOTE: Zeros past the end are what `resampy` assumes for the whole signal too.
+        length = -(-len(self.pending) // self.step) * self.step
+        tail = np.zeros(length + self.pad - len(self.pending), dtype=np.float64)
+        total = int((self.consumed + len(self.pending)) * self.ratio)
+        output = self._resample(length, np.concatenate([self.pending, tail]))
+        output = output[: total - (self.produced - len(output))]
+        self.produced = total
+        self.pending = np.zeros(0, dtype=np.float64)
+        return output
+
+    def _resample(self, length: int, ahead: np.ndarray) -> np.ndarray:
+        extended = np.concatenate([self.history, ahead])
+        resampled = resampy.resample(extended, self.source_samplerate, self.target_samplerate, filter=self.filter)
+        start = self.pad // self.step * self.step_out
+        output = resampled[start : start + length // self.step * self.step_out]
+
+        self.history = extended[length : length + self.pad]
+        self.pending = self.pending[length:]
+        self.consumed += length
+        self.produced += len(output)
+        return output
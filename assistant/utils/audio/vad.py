@@ -1,8 +1,57 @@
-from typing import Callable
-from pysilero_vad import SileroVoiceActivityDetector
+from typing import Callable, Optional
+from pysilero_vad import InvalidChunkSizeError, SileroVoiceActivityDetector
 import numpy as np
 from collections import deque
 
+from ..models import models
+
+SILERO_VAD = "silero-vad"
+
+
+def load_silero_session():
+    return SileroVoiceActivityDetector().session
+
+
+def warmup_silero(session) -> None:
+    SileroStream(session)(bytes(SileroVoiceActivityDetector.chunk_bytes()))
+
+
+models.register(SILERO_VAD, load_silero_session, warmup_silero)
+
+
+class SileroStream:
+    """Silero VAD state of one audio stream over the process-wide ONNX session.
+
+    The session is stateless and safe to run from several threads, only the
+    recurrent state and context are kept per stream. Runs the Silero v5 model
+    itself, `SileroVoiceActivityDetector` is only used to build the session.
+    """
+
+    SAMPLE_RATE = 16000
+    CONTEXT_SAMPLES = 64
+    MAX_WAV = 32767
+
+    def __init__(self, session=None):
+        self.session = session or models.get(SILERO_VAD)
+        self.sr = np.array(self.SAMPLE_RATE, dtype=np.int64)
+        self.reset()
+
+    def reset(self) -> None:
+        self.context = np.zeros((1, self.CONTEXT_SAMPLES), dtype=np.float32)
+        self.state = np.zeros((2, 1, 128), dtype=np.float32)
+
+    def __call__(self, audio: bytes) -> float:
+        """Probability of speech in one chunk of 512 samples of 16 kHz 16-bit mono PCM."""
+        if len(audio) != SileroVoiceActivityDetector.chunk_bytes():
+            raise InvalidChunkSizeError
+
+        samples = np.frombuffer(audio, dtype=np.int16).astype(np.float32) / self.MAX_WAV
+        window = np.concatenate((self.context, samples[np.newaxis, :]), axis=1)
+        self.context = window[:, -self.CONTEXT_SAMPLES :]
+
+        out, self.state = self.session.run(None, {"input": window, "state": self.state, "sr": self.sr})
+        return float(out.squeeze())
+
 
 class VadFilter:
     def __init__(
@@ -12,11 +61,29 @@ class VadFilter:
         silence_end: int = 10,
         speech_threshold: float = 0.5,
         preroll_size: int = 16,
+        speculate_after: Optional[int] = None,
+        on_speculate: Optional[Callable] = None,
+        on_speculation_cancel: Optional[Callable] = None,
+        progress_every: Optional[int] = None,
+        on_progress: Optional[Callable] = None,
     ):
-        self.vad = SileroVoiceActivityDetector()
+        self.vad = SileroStream()
 
         self.callback = callback
 
+        # NOTE: Speculation hands out the speech so far after `speculate_after`
+        # silent chunks, before the endpoint at `silence_end` is confirmed.
+        self.speculate_after = speculate_after
+        self.on_speculate = on_speculate
+        self.on_speculation_cancel = on_speculation_cancel
+        self.speculating = False
+
+        # NOTE: Progress hands out the speech so far every `progress_every` chunks
+        # while the speaker keeps talking, used for streaming transcription.
+        self.progress_every = progress_every
+        self.on_progress = on_progress
+        self.speech_chunks = 0
+
         self.min_speech = min_speech
         self.silence_end = silence_end
         self.speech_threshold = speech_threshold
@@ -40,6 +107,7 @@ class VadFilter:
 
             if self.speech_count == self.min_speech:
                 self.speaking = True
+                self.speech_chunks = 0
                 self.current_speech = np.array([], dtype=np.int16)
 
                 for preroll_chunk in self.preroll_buffer:
@@ -47,19 +115,45 @@ class VadFilter:
 
             elif self.speaking:
                 self.current_speech = np.concatenate([self.current_speech, chunk])
+                self._progress()
+
+                if self.speculating:
+                    self.speculating = False
+                    if self.on_speculation_cancel and callable(self.on_speculation_cancel):
+                        self.on_speculation_cancel()
         else:
             self.silence_count += 1
 
             if self.speaking:
                 self.current_speech = np.concatenate([self.current_speech, chunk])
+                self._progress()
+
+                if (
+                    self.speculate_after is not None
+                    and self.silence_count == self.speculate_after
+                    and self.silence_count < self.silence_end
+                ):
+                    self.speculating = True
+                    if self.on_speculate and callable(self.on_speculate):
+                        self.on_speculate(self.current_speech.copy())
 
                 if self.silence_count >= self.silence_end:
                     if self.callback and callable(self.callback):
                         self.callback(self.current_speech.copy())
 
                     self.speaking = False
+                    self.speculating = False
                     self.speech_count = 0
                     self.silence_count = 0
                     self.current_speech = np.array([], dtype=np.int16)
 
         return is_speech
+
+    def _progress(self):
+        if self.progress_every is None:
+            return
+
+        self.speech_chunks += 1
+        if self.speech_chunks % self.progress_every == 0:
+            if self.on_progress and callable(self.on_progress):
+                self.on_progress(self.current_speech.copy())
@@ -0,0 +1,125 @@
+import logging
+import os
+import resource
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class ModelStats(BaseModel):
+    name: str
+    loaded: bool = False
+    load_seconds: Optional[float] = None
+    warmup_seconds: Optional[float] = None
+    # Growth of the process RSS while loading, approximate if loads overlap.
+    rss_bytes: Optional[int] = None
+    users: int = 0
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ModelEntry:
+    def __init__(self, name: str, loader: Callable[[], Any], warmup: Optional[Callable[[Any], None]]):
+        self.loader = loader
+        self.warmup = warmup
+        self.model = None
+        self.warm = False
+        self.lock = threading.Lock()
+        self.stats = ModelStats(name=name)
+
+
+class ModelRegistry:
+    """Process-wide models, each loaded once on first use and shared by every caller.
+
+    Owners register a loader under a name at import time, callers `get()` the
+    model by that name. Loading is guarded per model, so concurrent first users
+    wait for the same load instead of loading twice.
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, ModelEntry] = {}
+        self.lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        loader: Callable[[], Any],
+        warmup: Optional[Callable[[Any], None]] = None,
+        replace: bool = False,
+    ) -> None:
+        """Register a loader, the first registration of a name wins unless `replace` is set before it loaded."""
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None or (replace and entry.model is None):
+                self.entries[name] = ModelEntry(name, loader, warmup)
+
+    def get(self, name: str) -> Any:
+        entry = self._entry(name)
+        with entry.lock:
+            entry.stats.users += 1
+            if entry.model is None:
+                rss = rss_bytes()
+                started = time.perf_counter()
+                entry.model = entry.loader()
+                entry.stats.load_seconds = time.perf_counter() - started
+                entry.stats.rss_bytes = rss_bytes() - rss
+                entry.stats.loaded = True
+                logger.info(
+                    f"Loaded model '{name}' in {entry.stats.load_seconds:.2f}s "
+                    f"(+{entry.stats.rss_bytes / 2**20:.1f} MiB RSS)"
+                )
+            return entry.model
+
+    def warmup(self, names: Optional[Iterable[str]] = None, background: bool = True) -> Optional[threading.Thread]:
+        """Load and warm up models ahead of their first use, in a background thread by default."""
+        names = list(names) if names is not None else list(self.entries)
+
+        def run():
+            for name in names:
+                try:
+                    self._warmup(name)
+                except Exception as e:
+                    logger.exception(f"Failed to warm up model '{name}': {e}")
+
+        if not background:
+            run()
+            return None
+
+        thread = threading.Thread(target=run, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> List[ModelStats]:
+        with self.lock:
+            return [entry.stats.model_copy() for entry in self.entries.values()]
+
+    def _entry(self, name: str) -> ModelEntry:
+        with self.lock:
+            if name not in self.entries:
+                raise KeyError(f"Model '{name}' is not registered")
+            return self.entries[name]
+
+    def _warmup(self, name: str) -> None:
+        model = self.get(name)
+        entry = self._entry(name)
+        with entry.lock:
+            entry.stats.users -= 1
+            if entry.warm or entry.warmup is None:
+                return
+            started = time.perf_counter()
+            entry.warmup(model)
+            entry.stats.warmup_seconds = time.perf_counter() - started
+            entry.warm = True
+
+
+models = ModelRegistry()
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional, Set, Tuple
+
+from ollama import Client
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class PullProgress(BaseModel):
+    model: str
+    status: str
+    completed: Optional[int] = None
+    total: Optional[int] = None
+
+    @property
+    def fraction(self) -> Optional[float]:
+        if not self.total:
+            return None
+        return (self.completed or 0) / self.total
+
+
+class ProvisionStatus(BaseModel):
+    model: str
+    ready: bool = False
+    progress: Optional[PullProgress] = None
+    error: Optional[str] = None
+    # Seconds from the request until the model was available, None while pending.
+    time_to_ready: Optional[float] = None
+
+
+class RetryConfig(BaseModel):
+    # Seconds before the first retry of a failed provisioning, doubled on every failure.
+    backoff: float = 5.0
+    max_backoff: float = 300.0
+
+    def delay(self, failures: int) -> float:
+        return min(self.backoff * 2 ** max(0, failures - 1), self.max_backoff)
+
+
+def canonical_name(model: str) -> str:
+    """Ollama lists untagged models with the implicit `latest` tag."""
+    return model if ":" in model else f"{model}:latest"
+
+
+class ModelProvisioner:
+    """Makes sure Ollama models exist without blocking the caller.
+
+    The model list of every server is cached for `ttl` seconds, so components
+    starting together ask the server once. A missing model is pulled on a
+    background thread, one pull per model however many callers want it, and
+    the callers get a `Future` that resolves to its status once it is
+    available. Pull progress is reported roughly every `progress_step`.
+    """
+
+    def __init__(self, ttl: float = 60.0, progress_step: float = 0.01):
+        self.ttl = ttl
+        self.progress_step = progress_step
+        self.cache: Dict[str, Tuple[float, Set[str]]] = {}
+        self.pulls: Dict[Tuple[str, str], Future] = {}
+        self.listeners: Dict[Tuple[str, str], list] = {}
+        self.lock = threading.Lock()
+
+    def create_client(self, base_url: str) -> Client:
+        return Client(base_url)
+
+    def available(self, base_url: str, refresh: bool = False) -> Set[str]:
+        """Names of the models on the server, from the cache unless it expired."""
+        with self.lock:
+            cached = self.cache.get(base_url)
+        if cached is not None and not refresh and time.monotonic() - cached[0] < self.ttl:
+            return cached[1]
+
+        names = {canonical_name(item["model"]) for item in self.create_client(base_url).list().get("models")}
+        with self.lock:
+            self.cache[base_url] = (time.monotonic(), names)
+        return names
+
+    def invalidate(self, base_url: Optional[str] = None) -> None:
+        with self.lock:
+            if base_url is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(base_url, None)
+
+    def ensure(
+        self,
+        base_url: str,
+        model: str,
+        on_progress: Optional[Callable[[PullProgress], None]] = None,
+    ) -> "Future[ProvisionStatus]":
+        """Resolves once the model is on the server, pulling it in the background if needed.
+
+        The future fails with the error of the list or pull request, a later
+        call tries again.
+        """
+        key = (base_url, canonical_name(model))
+        started = time.perf_counter()
+        with self.lock:
+            if on_progress is not None:
+                self.listeners.setdefault(key, []).append(on_progress)
+            future = self.pulls.get(key)
+            if future is None:
+                future = self.pulls[key] = Future()
+                threading.Thread(
+                    target=self._provision, args=(key, model, future, started), name=f"pull-{model}", daemon=True
+                ).start()
+        return future
+
+    def _provision(self, key: Tuple[str, str], model: str, future: Future, started: float) -> None:
+        base_url, name = key
+        try:
+            if name not in self.available(base_url):
+                self._pull(key, model)
+                self.invalidate(base_url)
+            status = ProvisionStatus(model=model, ready=True, time_to_ready=time.perf_counter() - started)
+            logger.info(f"Model '{model}' ready after {status.time_to_ready:.2f}s")
+        except Exception as e:
+            logger.error(f"Failed to provision model '{model}': {e}")
+            with self.lock:
+                self.pulls.pop(key, None)
+                self.listeners.pop(key, None)
+            future.set_exception(e)
+            return
+
+        with self.lock:
+            # NOTE: Successful pulls stay cached, later callers resolve at once.
+            self.listeners.pop(key, None)
+        future.set_result(status)
+
+    def _pull(self, key: Tuple[str, str], model: str) -> None:
+        logger.warning(f"Model '{model}' does not exist. Downloading.")
+        reported: Optional[PullProgress] = None
+        for chunk in self.create_client(key[0]).pull(model, stream=True):
+            progress = PullProgress(model=model, status=chunk["status"], completed=chunk["completed"], total=chunk["total"])
+            if (
+                reported is not None
+                and progress.status == reported.status
+                and (progress.fraction or 0) - (reported.fraction or 0) < self.progress_step
+            ):
+                continue
+            reported = progress
+            with self.lock:
+                listeners = list(self.listeners.get(key, []))
+            for listener in listeners:
+                try:
+                    listener(progress)
+                except Exception as e:
+                    logger.exception(f"Progress listener failed: {e}")
+
+
+provisioner = ModelProvisioner()
@@ -0,0 +1,192 @@
+import logging
+import threading
+import time
+from collections import deque
+from queue import Queue
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+
+class ShardConfig(BaseModel):
+    # Threads shared by all shards, one shard runs on at most one of them at a time.
+    workers: int = 4
+    # Shards without work for this many seconds are evicted with their state.
+    idle_timeout: float = 600.0
+
+
+class ShardStats(BaseModel):
+    shards: int = 0
+    queued: int = 0
+    processed: int = 0
+    evicted: int = 0
+
+
+def conversation_key(segment: Any, mumble_by: str = "channel") -> str:
+    """Conversation a segment belongs to, a Mumble channel or user, a watched file, or else its source."""
+    info = segment.source_info
+    if segment.source == "mumble":
+        channel = getattr(info, "channel", None)
+        if mumble_by == "channel" and channel:
+            return f"mumble:#{channel}"
+        if user := getattr(info, "user", None):
+            return f"mumble:{user}"
+    if file := getattr(info, "file", None):
+        return f"{segment.source}:{file}"
+    return segment.source
+
+
+class Shard:
+    def __init__(self, state: Any):
+        self.state = state
+        self.items: Deque = deque()
+        self.scheduled = False
+        self.last_active = time.monotonic()
+
+
+class ShardPool:
+    """Processes items per key in arrival order, different keys in parallel.
+
+    Each key is a shard with its own queue and state. A shard with work is
+    scheduled once on a shared ready queue, a worker takes up to `max_batch`
+    of its items and puts the shard back at the end if more arrived, so busy
+    shards take turns instead of starving quiet ones. Idle shards are evicted
+    and `evict` is called with their state.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[Hashable, Any, List], None],
+        config: Optional[ShardConfig] = None,
+        create: Optional[Callable[[Hashable], Any]] = None,
+        evict: Optional[Callable[[Hashable, Any], None]] = None,
+        max_batch: int = 1,
+        name: str = "shard",
+    ):
+        self.fn = fn
+        self.config = config or ShardConfig()
+        self.create = create or (lambda key: None)
+        self.evict = evict
+        self.max_batch = max(1, max_batch)
+        self.shards: Dict[Hashable, Shard] = {}
+        self.ready: Queue = Queue()
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.stats = ShardStats()
+
+        self.stopped = threading.Event()
+        self.threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True) for i in range(self.config.workers)
+        ]
+        self.evictor = threading.Thread(target=self._evictor, name=f"{name}-evictor", daemon=True)
+        for thread in self.threads + [self.evictor]:
+            thread.start()
+
+    def _shard(self, key: Hashable) -> Shard:
+        # Called with the lock held.
+        shard = self.shards.get(key)
+        if shard is None:
+            shard = self.shards[key] = Shard(self.create(key))
+        return shard
+
+    def state(self, key: Hashable) -> Any:
+        with self.lock:
+            shard = self._shard(key)
+            shard.last_active = time.monotonic()
+            return shard.state
+
+    def states(self) -> Dict[Hashable, Any]:
+        with self.lock:
+            return {key: shard.state for key, shard in self.shards.items()}
+
+    def submit(self, key: Hashable, item: Any) -> Any:
+        """Queue an item for its shard, returns the shard state."""
+        with self.lock:
+            shard = self._shard(key)
+            shard.items.append(item)
+            shard.last_active = time.monotonic()
+            if not shard.scheduled:
+                shard.scheduled = True
+                self.ready.put_nowait(key)
+            return shard.state
+
+    def push_front(self, key: Hashable, items: List) -> None:
+        """Put items back at the head of their shard, to be processed again before anything newer."""
+        with self.lock:
+            shard = self._shard(key)
+            shard.items.extendleft(reversed(items))
+            if not shard.scheduled:
+                shard.scheduled = True
+                self.ready.put_nowait(key)
+
+    def _worker(self) -> None:
+        while True:
+            key = self.ready.get()
+            if key is None:
+                return
+
+            with self.lock:
+                shard = self.shards[key]
+                items = [shard.items.popleft() for _ in range(min(self.max_batch, len(shard.items)))]
+
+            try:
+                if items:
+                    self.fn(key, shard.state, items)
+            except Exception as e:
+                logger.exception(f"Failed to process {len(items)} items of shard '{key}': {e}")
+
+            with self.lock:
+                self.stats.processed += len(items)
+                shard.last_active = time.monotonic()
+                if shard.items:
+                    self.ready.put_nowait(key)
+                else:
+                    shard.scheduled = False
+                    self.idle.notify_all()
+
+    def _evictor(self) -> None:
+        interval = min(30.0, self.config.idle_timeout / 2)
+        while not self.stopped.wait(interval):
+            self.evict_idle()
+
+    def evict_idle(self, now: Optional[float] = None) -> List[Hashable]:
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            idle = [
+                key
+                for key, shard in self.shards.items()
+                if not shard.scheduled and now - shard.last_active > self.config.idle_timeout
+            ]
+            evicted = [(key, self.shards.pop(key).state) for key in idle]
+            self.stats.evicted += len(evicted)
+
+        for key, state in evicted:
+            logger.debug(f"Evicted idle shard '{key}'")
+            if self.evict is not None:
+                self.evict(key, state)
+        return idle
+
+    def get_stats(self) -> ShardStats:
+        with self.lock:
+            return self.stats.model_copy(
+                update={"shards": len(self.shards), "queued": sum(len(s.items) for s in self.shards.values())}
+            )
+
+    def close(self) -> None:
+        """Finish the queued work, then stop the workers and evict every shard."""
+        self.stopped.set()
+        with self.idle:
+            self.idle.wait_for(lambda: not any(shard.scheduled for shard in self.shards.values()))
+        for _ in self.threads:
+            self.ready.put_nowait(None)
+        for thread in self.threads:
+            thread.join()
+        self.evictor.join()
+
+        with self.lock:
+            shards, self.shards = self.shards, {}
+        for key, shard in shards.items():
+            if self.evict is not None:
+                self.evict(key, shard.state)
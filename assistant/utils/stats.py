@@ -0,0 +1,42 @@
+import threading
+from collections import deque
+from typing import Deque
+
+import numpy as np
+from pydantic import BaseModel
+
+
+class LatencySummary(BaseModel):
+    count: int = 0
+    mean: float = 0.0
+    p50: float = 0.0
+    p95: float = 0.0
+    max: float = 0.0
+
+
+class LatencyStats:
+    """Thread-safe rolling window of latency samples (in seconds)."""
+
+    def __init__(self, window: int = 1000):
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.total = 0
+        self.lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self.lock:
+            self.samples.append(seconds)
+            self.total += 1
+
+    def summary(self) -> LatencySummary:
+        with self.lock:
+            if not self.samples:
+                return LatencySummary(count=self.total)
+            values = np.fromiter(self.samples, dtype=np.float64)
+
+        return LatencySummary(
+            count=self.total,
+            mean=float(values.mean()),
+            p50=float(np.percentile(values, 50)),
+            p95=float(np.percentile(values, 95)),
+            max=float(values.max()),
+        )
@@ -1,15 +1,15 @@
 import logging
 import threading
 from contextlib import contextmanager
-from queue import Queue
-from typing import Callable, Optional
+from queue import Empty, Queue
+from typing import Callable, List, Optional
 
-from ollama import Client
 from reactivex.subject import Subject
 from concurrent.futures import ThreadPoolExecutor
-from tqdm import tqdm
 import re
 
+from .provisioning import provisioner
+
 logger = logging.getLogger(__name__)
 
 
@@ -39,6 +39,55 @@ def observe(q: Queue, fn: Callable, threaded: bool = False, max_workers: Optiona
     return subject
 
 
+class Consumer:
+    """Pool of worker threads that pull items from a queue on their own.
+
+    Unlike `observe`, items are taken from the queue only when a worker is free,
+    so the queue decides which item is processed next.
+    """
+
+    def __init__(self, q: Queue, fn: Callable, workers: int = 1, name: str = "consumer"):
+        self.q = q
+        self.fn = fn
+        self.is_disposed = False
+        self.threads = [
+            threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def _worker(self):
+        while not self.is_disposed:
+            item = self.q.get()
+            if item is None:
+                break
+            try:
+                self.fn(item)
+            except Exception as e:
+                logger.exception(f"Consumer failed to process item: {e}")
+
+    def dispose(self):
+        self.is_disposed = True
+        for _ in self.threads:
+            self.q.put_nowait(None)
+
+
+def consume(q: Queue, fn: Callable, workers: int = 1, name: str = "consumer") -> Consumer:
+    return Consumer(q, fn, workers, name)
+
+
+def drain(q: Queue, limit: int, timeout: Optional[float] = None) -> List:
+    """Block for one item, then take whatever else is already queued, up to `limit` items."""
+    items = [q.get(timeout=timeout)]
+    while len(items) < limit and items[-1] is not None:
+        try:
+            items.append(q.get_nowait())
+        except Empty:
+            break
+    return items
+
+
 @contextmanager
 def event_context(e: threading.Event):
     try:
@@ -49,14 +98,12 @@ def event_context(e: threading.Event):
 
 
 def ensure_model_exists(base_url: str, model: str):
-    o_client = Client(base_url)
-    models = o_client.list().get("models")
-
-    if model not in map(lambda item: item["model"], models):
-        logger.warning(f"Model '{model}' does not exists. Downloading.")
-
-        for _ in tqdm(o_client.pull(model, stream=True)):
-            pass
+    """Blocking variant of `provisioner.ensure`, pulls the model if the server does not have it."""
+    provisioner.ensure(
+        base_url,
+        model,
+        on_progress=lambda p: logger.info(f"Pulling '{p.model}': {p.status} {p.fraction or 0:.0%}"),
+    ).result()
 
 
 def title_to_snake(s: str) -> str:
@@ -1,4 +1,4 @@
-from time import sleep
+from time import perf_counter, sleep
 from assistant.components.mumble import MumbleInterface
 from assistant.core import EventBus
 
@@ -10,12 +10,20 @@ from assistant.components.system.main import SystemIII
 from assistant.components.watchdog.main import Watchdog
 from assistant.components.watchdog import events as ww
 from assistant.components.shadow.main import Shadow
+from assistant.components.shadow import events as sh
+from assistant.components.memory.main import Memory
+from assistant.components.memory import events as me
 from assistant.components.voice_id.main import VoiceID
 from assistant.components.voice_id import events as vv
 import logging
 
 from rich.logging import RichHandler
 from assistant.core.config_manager import ConfigManager
+from assistant.utils.models import models
+from assistant.utils.audio.vad import SILERO_VAD
+from assistant.components.voice_id.export import PYANNOTE_EMBEDDING
+
+logger = logging.getLogger("pipeline")
 
 logging.basicConfig(
     level=logging.WARNING,
@@ -25,6 +33,7 @@ logging.basicConfig(
 
 
 def main():
+    started = perf_counter()
     event_bus = EventBus()
     config = ConfigManager()
 
@@ -35,6 +44,13 @@ def main():
     system = SystemIII(config=config)
     shadow = Shadow(config=config)
     void = VoiceID(config=config)
+    memory = Memory(config=config)
+
+    # NOTE: Shared models load in the background while the components start,
+    # the first component that needs one waits for the same load.
+    models.warmup(
+        [SILERO_VAD] + ([PYANNOTE_EMBEDDING] if config.is_plugin_enabled("voice_id") else [])
+    )
 
     event_bus.register(mumble)
     event_bus.register(watchdog)
@@ -42,15 +58,36 @@ def main():
     event_bus.register(system)
     event_bus.register(shadow)
     event_bus.register(void)
+    event_bus.register(memory)
 
     # mumble.on(mm.MUMBLE_CLIENT_CONNECTED, lambda: print("-> connect"))
     # mumble.on(mm.MUMBLE_CLIENT_DISCONNECTED, lambda: print("-> disconnect"))
     mumble.on(mm.MUMBLE_AUDIO_SPEECH, recorder.on_speech)
     mumble.on(mm.MUMBLE_AUDIO_SPEECH, transcriber.on_speech)
+    mumble.on(mm.MUMBLE_AUDIO_SPEECH_SPECULATIVE, transcriber.on_speculative_speech)
+    mumble.on(mm.MUMBLE_AUDIO_SPEECH_SPECULATION_CANCELLED, transcriber.on_speculation_cancelled)
+    mumble.on(mm.MUMBLE_AUDIO_SPEECH_PARTIAL, transcriber.on_partial_speech)
     mumble.on(mm.MUMBLE_AUDIO_SPEECH, void.on_speech)
     watchdog.on(ww.WATCHDOG_AUDIO_SPEECH_DETECTED, void.on_speech)
     transcriber.on(tt.TRANSCRIPTION_SEGMENT_DONE, system.on_transcript)
     # transcriber.on(tt.TRANSCRIPTION_SEGMENT_DONE, shadow.on_transcript)
+    mumble.on(mm.MUMBLE_PLAYBACK_INTERRUPT, shadow.on_interrupt)
+    shadow.on(sh.SHADOW_MEMORY_SUMMARY, memory.on_summary)
+
+    # NOTE: Ollama models are provisioned in the background, these components start degraded.
+    def on_ready(name: str):
+        return lambda status: logger.warning(
+            f"'{name}' ready {perf_counter() - started:.2f}s after start ({status.time_to_ready:.2f}s after its initialization)"
+        )
+
+    def on_progress(progress):
+        if progress.fraction is None or round(progress.fraction * 100) % 10 == 0:
+            logger.warning(f"Pulling '{progress.model}': {progress.status} {progress.fraction or 0:.0%}")
+
+    shadow.on(sh.SHADOW_READY, on_ready("shadow"))
+    shadow.on(sh.SHADOW_MODEL_PROGRESS, on_progress)
+    memory.on(me.MEMORY_READY, on_ready("memory"))
+    memory.on(me.MEMORY_MODEL_PROGRESS, on_progress)
 
     mumble.initialize()
     recorder.initialize()
@@ -59,6 +96,8 @@ def main():
     watchdog.initialize()
     shadow.initialize()
     void.initialize()
+    memory.initialize()
+    logger.warning(f"Pipeline initialized in {perf_counter() - started:.2f}s")
 
     while True:
         try:
@@ -74,6 +113,7 @@ def main():
     watchdog.shutdown()
     shadow.shutdown()
     void.shutdown()
+    memory.shutdown()
 
 
 if "__main__" == __name__:
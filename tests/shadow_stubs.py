@@ -0,0 +1,42 @@
+"""
+Shared stand-ins for testing Shadow without an Ollama server.
+"""
+
+from concurrent.futures import Future
+from typing import Tuple
+
+import numpy as np
+
+from assistant.components.mumble.mumble import SpeechSegment
+from assistant.components.shadow.main import Shadow
+from assistant.components.transcriber.types import Transcript
+from assistant.utils.provisioning import ProvisionStatus
+
+
+def ready(model: str) -> Future:
+    future = Future()
+    future.set_result(ProvisionStatus(model=model, ready=True))
+    return future
+
+
+def transcript(text: str) -> Tuple[SpeechSegment, Transcript]:
+    segment = SpeechSegment(source="test", source_info=None, data=np.zeros(1, dtype=np.int16))
+    return segment, Transcript(transcript=text, language="en", duration=1.0)
+
+
+class StubShadow(Shadow):
+    """Shadow on a stand-in LLM whose model is provisioned already.
+
+    Warm-up and the prefilter are off unless a test turns them on.
+    """
+
+    def __init__(self, llm, **config):
+        super().__init__()
+        self.config = {"warmup": False, "prefilter": {"enabled": False}, **config}
+        self.stub = llm
+
+    def create_llm(self, model: str):
+        return self.stub
+
+    def provision_model(self):
+        return ready(self.model)
@@ -0,0 +1,104 @@
+"""
+Tests for batched speaker embedding extraction.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pytest
+import torch
+
+from assistant.components.voice_id.batching import (
+    BatchingConfig,
+    EmbeddingBatcher,
+    bucket_by_length,
+    pad_batch,
+)
+
+
+class FailingModel:
+    """Toy embedding model whose forward pass always raises."""
+
+    def __call__(self, waveforms: torch.Tensor, weights: torch.Tensor = None) -> torch.Tensor:
+        raise ValueError("forward failed")
+
+
+class MeanModel:
+    """Toy embedding model that pools samples with optional weights, like StatsPool."""
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def __call__(self, waveforms: torch.Tensor, weights: torch.Tensor = None) -> torch.Tensor:
+        self.batch_sizes.append(waveforms.shape[0])
+        samples = waveforms[:, 0, :]
+        if weights is None:
+            weights = torch.ones_like(samples)
+        mean = (samples * weights).sum(dim=1) / weights.sum(dim=1)
+        return torch.stack([mean, weights.sum(dim=1)], dim=1)
+
+
+class TestBatchHelpers:
+    """Test bucketing and padding of pending segments."""
+
+    def test_bucket_by_length(self):
+        """Test that lengths are grouped within the allowed padding ratio."""
+        assert bucket_by_length([100, 400, 110, 420, 1000], ratio=1.5) == [[0, 2], [1, 3], [4]]
+
+    def test_pad_batch(self):
+        """Test that padding is zeroed and excluded by the mask."""
+        audio, mask = pad_batch([np.ones(2, dtype=np.float32), np.ones(4, dtype=np.float32)])
+        assert audio.shape == (2, 1, 4)
+        assert audio[0, 0].tolist() == [1, 1, 0, 0]
+        assert mask.tolist() == [[1, 1, 0, 0], [1, 1, 1, 1]]
+
+
+class TestEmbeddingBatcher:
+    """Test the batching inference worker."""
+
+    @pytest.fixture
+    def model(self):
+        return MeanModel()
+
+    def test_single_segment(self, model):
+        """Test that a lone segment is embedded without waiting for more."""
+        batcher = EmbeddingBatcher(model, "cpu", BatchingConfig(max_wait=0.01))
+        embedding = batcher.embed(np.full(8, 0.5, dtype=np.float32))
+        batcher.close()
+
+        assert embedding.tolist() == pytest.approx([0.5, 8.0])
+
+    def test_concurrent_segments_batched(self, model):
+        """Test that concurrent callers share forward passes and get their own results."""
+        batcher = EmbeddingBatcher(model, "cpu", BatchingConfig(max_batch_size=8, max_wait=0.2, bucket_ratio=2.0))
+        waveforms = [np.full(100 + i, float(i), dtype=np.float32) for i in range(8)]
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            embeddings = list(executor.map(batcher.embed, waveforms))
+        batcher.close()
+
+        for i, embedding in enumerate(embeddings):
+            assert embedding.tolist() == pytest.approx([float(i), 100.0 + i])
+        assert len(model.batch_sizes) < len(waveforms)
+
+    def test_failed_forward_raises(self):
+        """Test that callers of a failed forward pass get its error instead of blocking."""
+        batcher = EmbeddingBatcher(FailingModel(), "cpu", BatchingConfig(max_wait=0.01))
+
+        with pytest.raises(ValueError, match="forward failed"):
+            batcher.embed(np.ones(8, dtype=np.float32))
+        batcher.close()
+
+    def test_closed_rejects(self, model):
+        """Test that a closed batcher refuses work and fails what it never ran."""
+        batcher = EmbeddingBatcher(model, "cpu", BatchingConfig(max_wait=0.01))
+        batcher.close()
+
+        with pytest.raises(RuntimeError):
+            batcher.embed(np.ones(8, dtype=np.float32))
+
+        stranded = Future()
+        batcher.pending.put_nowait((np.ones(8, dtype=np.float32), stranded))
+        batcher._fail_pending(RuntimeError("Embedding batcher is closed"))
+        with pytest.raises(RuntimeError):
+            stranded.result(timeout=1)
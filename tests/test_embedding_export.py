@@ -0,0 +1,103 @@
+"""
+Tests for the exported speaker embedding inference path.
+"""
+
+import os
+
+import numpy as np
+import pytest
+import torch
+
+from assistant.components.voice_id.export import InferenceConfig, artefact_path, cosine, load_inference_model
+
+
+class TinyEmbedding(torch.nn.Module):
+    """Stand-in with the call signature of the pyannote embedding model."""
+
+    def __init__(self):
+        super().__init__()
+        torch.manual_seed(0)
+        self.conv = torch.nn.Conv1d(1, 8, kernel_size=400, stride=160)
+        self.embedding = torch.nn.Linear(16, 4)
+
+    def forward(self, waveforms, weights=None):
+        frames = torch.relu(self.conv(waveforms))
+        if weights is None:
+            mean, std = frames.mean(dim=2), frames.std(dim=2)
+        else:
+            w = torch.nn.functional.interpolate(weights.unsqueeze(1), size=frames.shape[2]).squeeze(1)
+            w = w.unsqueeze(1) / w.sum(dim=1).view(-1, 1, 1)
+            mean = (frames * w).sum(dim=2)
+            std = ((frames - mean.unsqueeze(2)) ** 2 * w).sum(dim=2).sqrt()
+        return self.embedding(torch.cat([mean, std], dim=1))
+
+
+@pytest.fixture
+def waveforms():
+    return torch.from_numpy(np.random.default_rng(0).standard_normal((2, 1, 16000)).astype(np.float32))
+
+
+def embed(model, waveforms, weights=None) -> np.ndarray:
+    with torch.no_grad():
+        return model(waveforms, weights=weights).numpy()
+
+
+class TestEmbeddingExport:
+    """Test that exported models match the eager model and are cached."""
+
+    @pytest.mark.parametrize("backend", ["torchscript", "onnx"])
+    def test_equivalence(self, backend, waveforms, tmp_path):
+        """Test that exported embeddings match the eager ones."""
+        if backend == "onnx":
+            pytest.importorskip("onnx")
+        model = TinyEmbedding().eval()
+        exported = load_inference_model(model, InferenceConfig(backend=backend, cache_dir=str(tmp_path)), "cpu")
+
+        weights = torch.ones(2, 16000)
+        weights[1, 8000:] = 0.0
+
+        assert cosine(embed(model, waveforms, weights), embed(exported, waveforms, weights)).min() > 0.9999
+        assert embed(exported, waveforms[:1, :, :12000]).shape == (1, 4)
+
+    def test_cached(self, tmp_path):
+        """Test that the artefact is exported once and keyed by the weights."""
+        model = TinyEmbedding().eval()
+        config = InferenceConfig(backend="torchscript", cache_dir=str(tmp_path))
+
+        load_inference_model(model, config, "cpu")
+        path = artefact_path(model, config)
+        modified = os.path.getmtime(path)
+        load_inference_model(model, config, "cpu")
+
+        assert os.path.getmtime(path) == modified
+        with torch.no_grad():
+            model.embedding.bias.add_(1.0)
+        assert artefact_path(model, config) != path
+
+    def test_source_model_untouched(self, tmp_path):
+        """Test that exporting works on a copy, a shared model is not moved off its device."""
+        moved = []
+
+        class TrackedEmbedding(TinyEmbedding):
+            def cpu(self):
+                moved.append(self)
+                return super().cpu()
+
+        model = TrackedEmbedding().eval()
+        load_inference_model(model, InferenceConfig(backend="torchscript", cache_dir=str(tmp_path)), "cpu")
+
+        assert moved and all(m is not model for m in moved)
+
+    def test_quantized(self, waveforms, tmp_path):
+        """Test that dynamic quantisation stays close to the eager model."""
+        model = TinyEmbedding().eval()
+        quantized = load_inference_model(
+            model, InferenceConfig(backend="torchscript", quantize=True, cache_dir=str(tmp_path)), "cpu"
+        )
+
+        assert cosine(embed(model, waveforms), embed(quantized, waveforms)).min() > 0.99
+
+    def test_unknown_backend(self):
+        """Test that a misspelled backend fails loudly."""
+        with pytest.raises(ValueError):
+            load_inference_model(TinyEmbedding(), InferenceConfig(backend="tensorrt"), "cpu")
@@ -0,0 +1,66 @@
+"""
+Tests for the session-sticky speaker identity cache.
+"""
+
+import numpy as np
+import pytest
+
+from assistant.components.mumble.mumble import SourceInfo, SpeechSegment
+from assistant.components.voice_id.cache import IdentityCache, IdentityCacheConfig, stream_key
+
+ALICE = np.array([1.0, 0.0, 0.0])
+MALLORY = np.array([0.0, 1.0, 0.0])
+KEY = "mumble:alice"
+
+
+@pytest.fixture
+def cache():
+    return IdentityCache(IdentityCacheConfig(pin_after=2, reverify_every=3, drift_threshold=0.8))
+
+
+def pin(cache: IdentityCache):
+    cache.update(KEY, "alice", ALICE)
+    cache.update(KEY, "alice", ALICE)
+
+
+class TestIdentityCache:
+    """Test pinning, re-verification and drift detection."""
+
+    def test_stream_key(self):
+        """Test that only per-user Mumble streams are cached."""
+        mumble = SpeechSegment(source="mumble", source_info=SourceInfo(user="alice", sequence_id=0), data=np.zeros(1))
+        other = SpeechSegment(source="watchdog", source_info=None, data=np.zeros(1))
+        assert stream_key(mumble) == KEY
+        assert stream_key(other) is None
+
+    def test_not_pinned_before_enough_matches(self, cache):
+        """Test that a single match does not pin the identity."""
+        cache.update(KEY, "alice", ALICE)
+        assert cache.get(KEY) is None
+
+    def test_pinned_skips_embedding(self, cache):
+        """Test that pinned streams are answered until re-verification is due."""
+        pin(cache)
+        assert cache.get(KEY) == "alice"
+        assert cache.get(KEY) == "alice"
+        assert cache.get(KEY) is None  # every 3rd segment is verified
+        assert cache.stats.cached == 2
+
+    def test_verify_keeps_pin(self, cache):
+        """Test that a close embedding keeps the identity pinned."""
+        pin(cache)
+        assert cache.verify(KEY, ALICE + 0.05) == "alice"
+        assert cache.get(KEY) == "alice"
+
+    def test_drift_unpins(self, cache):
+        """Test that a different voice on the same stream drops the pin."""
+        pin(cache)
+        assert cache.verify(KEY, MALLORY) is None
+        assert cache.get(KEY) is None
+        assert cache.stats.drifted == 1
+
+    def test_other_speaker_restarts(self, cache):
+        """Test that identifying someone else restarts the streak."""
+        pin(cache)
+        cache.update(KEY, "mallory", MALLORY)
+        assert cache.get(KEY) is None
@@ -0,0 +1,119 @@
+"""
+Tests for the persistent memory index.
+"""
+
+import numpy as np
+import pytest
+
+from assistant.components.memory.index import MemoryIndex, MemoryIndexConfig, MemoryRecord, normalize
+
+DIM = 32
+
+
+def records(count: int, start: int = 0):
+    return [
+        MemoryRecord(
+            id=str(i),
+            summary=f"memory {i}",
+            entities=[f"Person{i % 7}"],
+            topics=[f"topic{i % 3}"],
+        )
+        for i in range(start, start + count)
+    ]
+
+
+def clustered(rng: np.random.Generator, count: int) -> np.ndarray:
+    centers = rng.standard_normal((20, DIM))
+    return (centers[rng.integers(0, 20, count)] + 0.3 * rng.standard_normal((count, DIM))).astype(np.float32)
+
+
+class TestMemoryIndex:
+    """Test search, filters, persistence and the IVF index."""
+
+    def test_exact_search(self):
+        """Test that a small index returns the nearest memories in order."""
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((50, DIM)).astype(np.float32)
+        index = MemoryIndex(None)
+        index.add_many(vectors, records(50))
+
+        hits = index.search(vectors[7], k=3)
+
+        assert hits[0].memory.id == "7"
+        assert hits[0].score == pytest.approx(1.0, abs=1e-5)
+        assert [h.score for h in hits] == sorted((h.score for h in hits), reverse=True)
+
+    def test_filters(self):
+        """Test that entity and topic filters are case-insensitive and combine."""
+        rng = np.random.default_rng(0)
+        index = MemoryIndex(None)
+        index.add_many(rng.standard_normal((60, DIM)), records(60))
+
+        hits = index.search(rng.standard_normal(DIM), k=100, entities=["person3"], topics=["TOPIC1"])
+
+        assert hits
+        assert all(h.memory.entities == ["Person3"] and h.memory.topics == ["topic1"] for h in hits)
+        assert len(hits) == len([i for i in range(60) if i % 7 == 3 and i % 3 == 1])
+        assert index.search(rng.standard_normal(DIM), entities=["nobody"]) == []
+
+    def test_persistence(self, tmp_path):
+        """Test that memories survive a reopen, growing past the initial capacity."""
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((40, DIM)).astype(np.float32)
+        index = MemoryIndex(str(tmp_path), capacity=16)
+        index.add_many(vectors[:25], records(25))
+        index.add_many(vectors[25:], records(15, start=25))
+        index.close()
+
+        reopened = MemoryIndex(str(tmp_path))
+
+        assert len(reopened) == 40
+        assert reopened.search(vectors[31], k=1)[0].memory.id == "31"
+        assert reopened.search(vectors[31], k=1, topics=["topic1"])[0].memory.id == "31"
+
+    def test_dimension_mismatch(self):
+        """Test that embeddings of another model are rejected."""
+        index = MemoryIndex(None)
+        index.add(np.ones(DIM), records(1)[0])
+
+        with pytest.raises(ValueError):
+            index.add(np.ones(DIM + 1), records(1, start=1)[0])
+
+    def test_ivf_recall(self, tmp_path):
+        """Test that the IVF index finds most of the exact top-k and is reloaded from disk."""
+        rng = np.random.default_rng(0)
+        vectors = clustered(rng, 4000)
+        config = MemoryIndexConfig(flat_threshold=1000, nprobe=8)
+        index = MemoryIndex(str(tmp_path), config)
+        for start in range(0, 4000, 500):
+            index.add_many(vectors[start : start + 500], records(500, start=start))
+        assert index.centroids is not None
+
+        queries = clustered(rng, 20)
+        units = normalize(vectors)
+
+        def recall(index):
+            found = 0
+            for query in queries:
+                exact = set(np.argsort(-(units @ normalize(query)))[:10].tolist())
+                found += len(exact & {int(h.memory.id) for h in index.search(query, k=10)})
+            return found / (10 * len(queries))
+
+        assert recall(index) >= 0.9
+        index.close()
+
+        reopened = MemoryIndex(str(tmp_path), config)
+        assert reopened.centroids is not None
+        assert recall(reopened) >= 0.9
+
+    def test_ivf_with_broad_filter(self):
+        """Test that a filter matching more than the flat threshold is applied to the probed lists."""
+        rng = np.random.default_rng(0)
+        vectors = clustered(rng, 3000)
+        index = MemoryIndex(None, MemoryIndexConfig(flat_threshold=500))
+        index.add_many(vectors, records(3000))
+
+        hits = index.search(vectors[4], k=5, topics=["topic1"])
+
+        assert hits and all(h.memory.topics == ["topic1"] for h in hits)
+        assert hits[0].memory.id == "4"
@@ -0,0 +1,228 @@
+"""
+Tests for background model provisioning and Shadow's degraded start.
+"""
+
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+import pytest
+
+from assistant.components.memory import main as memory_main
+from assistant.components.memory.main import Memory
+from assistant.components.shadow import events
+from assistant.components.shadow.main import ActionDecision, MemorySummary, TranscriptionAction
+from assistant.utils.provisioning import ModelProvisioner, ProvisionStatus, PullProgress, RetryConfig, canonical_name
+
+from shadow_stubs import StubShadow, transcript
+
+
+class FakeOllama:
+    """Stand-in for the Ollama client with a fixed model list and a gated pull."""
+
+    def __init__(self, models: List[str], fail: bool = False):
+        self.models = list(models)
+        self.fail = fail
+        self.lists = 0
+        self.pulls = 0
+        self.gate = threading.Event()
+
+    def list(self):
+        self.lists += 1
+        return {"models": [{"model": name} for name in self.models]}
+
+    def pull(self, model: str, stream: bool = False):
+        self.pulls += 1
+        self.gate.wait(5)
+        if self.fail:
+            raise ConnectionError("registry unreachable")
+        yield {"status": "pulling manifest", "completed": None, "total": None}
+        for completed in range(0, 1001, 1):
+            yield {"status": "pulling layer", "completed": completed, "total": 1000}
+        self.models.append(canonical_name(model))
+        yield {"status": "success", "completed": None, "total": None}
+
+
+class FakeProvisioner(ModelProvisioner):
+    def __init__(self, client: FakeOllama, **kwargs):
+        super().__init__(**kwargs)
+        self.client = client
+
+    def create_client(self, base_url: str):
+        return self.client
+
+
+class TestModelProvisioner:
+    """Test the cached model list and background pulls."""
+
+    def test_list_cached(self):
+        """Test that the model list is fetched once within the TTL and again after it."""
+        client = FakeOllama(["llama3.2:3b", "nomic-embed-text:latest"])
+        provisioner = FakeProvisioner(client, ttl=60.0)
+
+        assert provisioner.ensure("url", "llama3.2:3b").result(5).ready
+        assert provisioner.ensure("url", "nomic-embed-text").result(5).ready
+        assert client.lists == 1 and client.pulls == 0
+
+        provisioner.ttl = 0.0
+        provisioner.available("url")
+        assert client.lists == 2
+
+    def test_pull_in_background(self):
+        """Test that a missing model is pulled once for every caller, with throttled progress."""
+        client = FakeOllama([])
+        provisioner = FakeProvisioner(client)
+        progress: List[PullProgress] = []
+
+        first = provisioner.ensure("url", "llama3.2:3b", on_progress=progress.append)
+        second = provisioner.ensure("url", "llama3.2:3b")
+        time.sleep(0.05)
+        assert not first.done()
+
+        client.gate.set()
+        status = first.result(5)
+        assert status.ready and status.time_to_ready is not None
+        assert second.result(5) == status
+        assert client.pulls == 1
+
+        # Every status change, and the layer roughly once per percent.
+        assert [p.status for p in progress].count("pulling layer") <= 101
+        assert progress[0].status == "pulling manifest" and progress[-1].status == "success"
+        assert "llama3.2:3b" in provisioner.available("url")
+
+    def test_failure_retried(self):
+        """Test that a failed pull fails its callers and a later call pulls again."""
+        client = FakeOllama([], fail=True)
+        client.gate.set()
+        provisioner = FakeProvisioner(client)
+
+        with pytest.raises(ConnectionError):
+            provisioner.ensure("url", "llama3.2:3b").result(5)
+
+        client.fail = False
+        assert provisioner.ensure("url", "llama3.2:3b").result(5).ready
+        assert client.pulls == 2
+
+
+class TestRetryConfig:
+    """Test the backoff between provisioning attempts."""
+
+    def test_exponential_backoff(self):
+        """Test that the delay doubles per failure up to the cap."""
+        retry = RetryConfig(backoff=2.0, max_backoff=10.0)
+        assert [retry.delay(n) for n in range(1, 6)] == [2.0, 4.0, 8.0, 10.0, 10.0]
+
+
+class OneShotLLM:
+    """Stand-in for ChatOllama that always decides DISCARD and counts calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def bind(self, format: dict):
+        llm = self
+
+        class Runnable:
+            async def astream(self, messages):
+                llm.calls += 1
+                decision = ActionDecision(action=TranscriptionAction.DISCARD, reason="")
+                yield SimpleNamespace(content=decision.model_dump_json(), response_metadata={})
+
+        return Runnable()
+
+
+class PendingShadow(StubShadow):
+    def __init__(self):
+        super().__init__(OneShotLLM(), provision_retry={"backoff": 0.01})
+        self.attempts: List[Future] = []
+
+    @property
+    def provisioning(self) -> Future:
+        return self.attempts[-1]
+
+    def provision_model(self):
+        self.attempts.append(Future())
+        return self.provisioning
+
+
+class TestShadowDegraded:
+    """Test that Shadow starts before its model is available."""
+
+    def test_degraded_until_ready(self):
+        """Test that chunks are kept in context without the LLM until the model arrives."""
+        shadow = PendingShadow()
+        ready = []
+        shadow.on(events.SHADOW_READY, ready.append)
+        shadow.initialize()
+
+        decision = shadow.process_transcript(*transcript("before"))
+        assert decision.action == TranscriptionAction.ADD_TO_CONTEXT
+        assert shadow.stub.calls == 0 and not shadow.model_status().ready
+
+        shadow.provisioning.set_result(ProvisionStatus(model=shadow.model, ready=True))
+        assert shadow.model_status().ready and shadow.model_status().time_to_ready is not None
+        assert len(ready) == 1
+
+        assert shadow.process_transcript(*transcript("after")).action == TranscriptionAction.DISCARD
+        assert shadow.stub.calls == 1
+        assert shadow.conversation("test").context.turns() == ["before"]
+        shadow.shutdown()
+
+    def test_retried_after_failure(self):
+        """Test that a failed pull is reported, Shadow keeps running degraded and provisions again."""
+        shadow = PendingShadow()
+        shadow.initialize()
+        shadow.provisioning.set_exception(ConnectionError("registry unreachable"))
+
+        status = shadow.model_status()
+        assert not status.ready and "registry unreachable" in status.error
+        assert shadow.process_transcript(*transcript("still here")).action == TranscriptionAction.ADD_TO_CONTEXT
+
+        deadline = time.monotonic() + 5
+        while len(shadow.attempts) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(shadow.attempts) == 2
+
+        shadow.provisioning.set_result(ProvisionStatus(model=shadow.model, ready=True))
+        assert shadow.model_status().ready and shadow.model_status().error is None
+        shadow.shutdown()
+
+
+class EmbeddingMemory(Memory):
+    def __init__(self, path: str):
+        super().__init__()
+        self.config = {"path": path, "max_pending": 2, "provision_retry": {"backoff": 0.01}}
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return np.ones((len(texts), 8), dtype=np.float32)
+
+
+class TestMemoryDegraded:
+    """Test that Memory holds a bounded backlog until its model arrives."""
+
+    def test_backlog_bounded_and_stored(self, tmp_path, monkeypatch):
+        """Test that summaries beyond the backlog are dropped and the rest stored after a retried pull."""
+        client = FakeOllama([], fail=True)
+        client.gate.set()
+        monkeypatch.setattr(memory_main, "provisioner", FakeProvisioner(client))
+
+        memory = EmbeddingMemory(str(tmp_path))
+        memory.initialize()
+        for i in range(3):
+            memory.on_summary(MemorySummary(summary=f"summary {i}", entities=[], topics=[]))
+
+        stats = memory.memory_stats()
+        assert (stats.pending, stats.dropped, stats.memories) == (2, 1, 0)
+
+        deadline = time.monotonic() + 5
+        while memory.model_status().error is None and time.monotonic() < deadline:
+            time.sleep(0.001)
+        client.fail = False
+        while len(memory.index) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert memory.model_status().ready and client.pulls >= 2
+        assert sorted(hit.memory.summary for hit in memory.recall("summary", k=5)) == ["summary 1", "summary 2"]
+        memory.shutdown()
@@ -0,0 +1,113 @@
+"""
+Tests for the process-wide model registry.
+"""
+
+import threading
+import time
+
+import numpy as np
+import pytest
+from pysilero_vad import SileroVoiceActivityDetector
+
+from assistant.utils.audio.vad import SileroStream, VadFilter
+from assistant.utils.models import ModelRegistry
+
+
+@pytest.fixture
+def registry():
+    return ModelRegistry()
+
+
+class TestModelRegistry:
+    """Test lazy loading, sharing, warm-up and stats."""
+
+    def test_loads_once(self, registry):
+        """Test that concurrent first users share a single load."""
+        loads = []
+
+        def loader():
+            loads.append(1)
+            time.sleep(0.05)
+            return object()
+
+        registry.register("model", loader)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(registry.get("model"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(loads) == 1
+        assert all(result is results[0] for result in results)
+        (stats,) = registry.stats()
+        assert stats.loaded and stats.users == 8
+        assert stats.load_seconds >= 0.05
+
+    def test_lazy(self, registry):
+        """Test that registering does not load."""
+        registry.register("model", lambda: pytest.fail("loaded eagerly"))
+
+        assert not registry.stats()[0].loaded
+
+    def test_warmup(self, registry):
+        """Test that warm-up loads in the background and runs once."""
+        warmed = []
+        registry.register("model", lambda: "weights", warmed.append)
+
+        registry.warmup().join()
+        registry.warmup(background=False)
+
+        assert warmed == ["weights"]
+        assert registry.stats()[0].warmup_seconds is not None
+
+    def test_first_registration_wins(self, registry):
+        """Test that later registrations keep the original loader unless replaced before loading."""
+        registry.register("model", lambda: "first")
+        registry.register("model", lambda: "second")
+        registry.register("model", lambda: "third", replace=True)
+        assert registry.get("model") == "third"
+
+        registry.register("model", lambda: "fourth", replace=True)
+        assert registry.get("model") == "third"
+
+    def test_unknown(self, registry):
+        """Test that an unregistered model fails loudly."""
+        with pytest.raises(KeyError):
+            registry.get("missing")
+
+
+class TestSharedVad:
+    """Test that VAD streams share one session but keep their own state."""
+
+    def test_shared_session(self):
+        """Test that every filter runs on the same ONNX session."""
+        first, second = VadFilter(lambda _: None), VadFilter(lambda _: None)
+
+        assert first.vad.session is second.vad.session
+        assert first.vad.state is not second.vad.state
+
+    def test_independent_state(self):
+        """Test that interleaved streams score like separate detectors."""
+        rng = np.random.default_rng(0)
+        chunks = (rng.standard_normal((20, 512)) * 3000).astype(np.int16)
+        reference = SileroStream()
+        expected = [reference(chunk.tobytes()) for chunk in chunks]
+
+        a, b = SileroStream(), SileroStream()
+        scores = []
+        for chunk in chunks:
+            scores.append(a(chunk.tobytes()))
+            b(np.zeros(512, dtype=np.int16).tobytes())
+
+        assert np.allclose(scores, expected, atol=1e-6)
+
+    def test_matches_library_detector(self):
+        """Test that a stream scores like pysilero-vad's own detector on its own session."""
+        rng = np.random.default_rng(1)
+        chunks = (rng.standard_normal((20, 512)) * 3000).astype(np.int16)
+        detector, stream = SileroVoiceActivityDetector(), SileroStream()
+
+        expected = [float(detector(chunk.tobytes())) for chunk in chunks]
+
+        assert np.allclose([stream(chunk.tobytes()) for chunk in chunks], expected, atol=1e-6)
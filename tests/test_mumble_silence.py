@@ -0,0 +1,62 @@
+"""
+Tests for the fake silence fed to the VAD once a Mumble user stops talking.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from assistant.components.mumble.mumble import SILENCE_CHUNKS, MumbleInterface
+
+
+def interface(speculate_after):
+    mumble = MumbleInterface()
+    mumble.speculate_after = speculate_after
+    mumble.fake_silence_timers = {}
+    mumble.last_packet_at = {}
+    mumble.silence_lock = threading.RLock()
+    mumble.chunks = []
+    mumble.fixed_chunker_for_source = {"alice": lambda chunk: mumble.chunks.append(len(chunk))}
+    return mumble
+
+
+def silent_chunks(mumble):
+    return len(mumble.chunks) - 1
+
+
+class TestFakeSilence:
+    """Test how trailing silence reaches the VAD."""
+
+    def test_burst_without_speculation(self):
+        """Test that the endpoint silence arrives at once when nothing is speculated."""
+        mumble = interface(None)
+        mumble.on_sound_from_source({"name": "alice"}, SimpleNamespace(pcm=np.zeros(960, dtype=np.int16)))
+        time.sleep(0.2)
+        assert silent_chunks(mumble) == SILENCE_CHUNKS
+
+    def test_paced_with_speculation(self):
+        """Test that silence keeps pace with the clock so speculation runs before the endpoint."""
+        mumble = interface(4)
+        mumble.on_sound_from_source({"name": "alice"}, SimpleNamespace(pcm=np.zeros(960, dtype=np.int16)))
+        stopped = mumble.last_packet_at["alice"]
+
+        time.sleep(0.2)
+        assert 3 <= silent_chunks(mumble) < SILENCE_CHUNKS
+        time.sleep(0.6)
+        assert silent_chunks(mumble) == SILENCE_CHUNKS
+        assert mumble.speech_end("alice") == stopped
+
+    def test_packet_stops_silence(self):
+        """Test that speech resuming cancels the silence still to come."""
+        mumble = interface(4)
+        chunk = SimpleNamespace(pcm=np.zeros(960, dtype=np.int16))
+        mumble.on_sound_from_source({"name": "alice"}, chunk)
+        time.sleep(0.15)
+        mumble.on_sound_from_source({"name": "alice"}, chunk)
+        fed = len(mumble.chunks)
+        time.sleep(0.05)
+        assert len(mumble.chunks) == fed
+        for timer in mumble.fake_silence_timers.values():
+            timer.cancel()
@@ -0,0 +1,104 @@
+"""
+Tests for the token-budgeted rolling context used by Shadow.
+"""
+
+import threading
+
+import pytest
+
+from assistant.components.shadow.context import ContextConfig, RollingContext
+
+
+def turn(i: int) -> str:
+    return f"turn {i:03d} " + "x" * 30
+
+
+@pytest.fixture
+def config():
+    return ContextConfig(max_tokens=100, recent_tokens=40, summary_tokens=20, chars_per_token=4.0)
+
+
+class TestRollingContext:
+    """Test budgeting, folding and resets."""
+
+    def test_prompt_stays_within_budget(self, config):
+        """Test that the rendered context stays bounded however long the conversation gets."""
+        context = RollingContext(lambda summary, turns: summary + " " + " ".join(t[:8] for t in turns), config)
+        for i in range(200):
+            context.append(turn(i))
+            assert context.tokens(context.render()) <= config.max_tokens + 1
+        context.wait(5)
+
+        assert context.summary
+        assert turn(199) in context.render()
+        context.close()
+
+    def test_recent_turns_verbatim(self, config):
+        """Test that turns within the recent budget are not summarised."""
+        calls = []
+        context = RollingContext(lambda summary, turns: calls.append(turns) or "", config)
+        context.append(turn(0))
+        context.append(turn(1))
+        context.wait(5)
+
+        assert calls == []
+        assert context.render("new") == f"{turn(0)} {turn(1)} new"
+        context.close()
+
+    def test_folds_incrementally(self, config):
+        """Test that the summary is built from the previous summary and only the evicted turns."""
+        calls = []
+
+        def summarize(summary, turns):
+            calls.append((summary, turns))
+            return summary + "".join(t[5:8] for t in turns)
+
+        context = RollingContext(summarize, config)
+        for i in range(6):
+            context.append(turn(i))
+            context.wait(5)
+
+        assert [turns for _, turns in calls] == [[turn(i)] for i in range(len(calls))]
+        assert context.summary == "".join(f"{i:03d}" for i in range(len(calls)))
+        context.close()
+
+    def test_pending_turns_rendered_until_folded(self, config):
+        """Test that evicted turns stay visible while a slow fold runs."""
+        release = threading.Event()
+        context = RollingContext(lambda summary, turns: release.wait(5) and "summary", config)
+        for i in range(5):
+            context.append(turn(i))
+
+        assert context.render().startswith(turn(0))
+        release.set()
+        context.wait(5)
+        assert context.render().startswith("Summary of the earlier conversation: summary")
+        context.close()
+
+    def test_clear_drops_inflight_fold(self, config):
+        """Test that a fold finishing after clear() does not resurrect the old summary."""
+        release = threading.Event()
+        context = RollingContext(lambda summary, turns: release.wait(5) and "stale", config)
+        for i in range(5):
+            context.append(turn(i))
+        context.clear()
+        release.set()
+        context.wait(5)
+
+        assert context.summary == ""
+        assert len(context) == 0
+        context.close()
+
+    def test_failed_fold_keeps_turns(self, config):
+        """Test that turns are kept when the summariser fails."""
+
+        def summarize(summary, turns):
+            raise RuntimeError("model unavailable")
+
+        context = RollingContext(summarize, config)
+        for i in range(5):
+            context.append(turn(i))
+
+        assert not context.wait(0.2)
+        assert context.turns() == [turn(i) for i in range(5)]
+        context.close()
@@ -0,0 +1,143 @@
+"""
+Tests for batched Shadow decisions on queued transcripts.
+"""
+
+import asyncio
+import threading
+from queue import Queue
+from types import SimpleNamespace
+from typing import List
+
+from assistant.components.shadow.main import (
+    ActionDecision,
+    BatchDecision,
+    ChunkDecision,
+    MemorySummary,
+    TranscriptionAction,
+)
+from assistant.utils import drain
+
+from shadow_stubs import StubShadow, transcript
+
+
+class ScriptedLLM:
+    """Stand-in for ChatOllama that streams structured answers from a script."""
+
+    SCHEMAS = {schema.__name__: schema for schema in (ActionDecision, BatchDecision, MemorySummary)}
+
+    def __init__(self, decide, release: threading.Event = None):
+        self.decide = decide
+        self.release = release
+        self.prompts: List[tuple] = []
+        self.entered = threading.Event()
+
+    def bind(self, format: dict):
+        llm = self
+        schema = self.SCHEMAS[format["title"]]
+
+        class Runnable:
+            async def astream(self, messages):
+                llm.entered.set()
+                if llm.release is not None:
+                    await asyncio.get_running_loop().run_in_executor(None, llm.release.wait, 5)
+                llm.prompts.append((schema, messages[-1].content))
+                parsed = llm.decide(schema, messages[-1].content)
+                yield SimpleNamespace(content=parsed.model_dump_json() if parsed else "", response_metadata={})
+
+        return Runnable()
+
+
+def decide_all(action: TranscriptionAction):
+    def decide(schema, prompt):
+        if schema is BatchDecision:
+            count = prompt.count('\r\n[') + 1
+            return BatchDecision(decisions=[ChunkDecision(chunk_id=i, action=action, reason="") for i in range(count)])
+        return ActionDecision(action=action, reason="")
+
+    return decide
+
+
+class TestDrain:
+    """Test taking queued items in bounded batches."""
+
+    def test_takes_queued_up_to_limit(self):
+        """Test that drain returns what is queued without waiting for more."""
+        q = Queue()
+        for i in range(5):
+            q.put(i)
+
+        assert drain(q, 3) == [0, 1, 2]
+        assert drain(q, 3) == [3, 4]
+
+    def test_stops_at_sentinel(self):
+        """Test that nothing after a shutdown sentinel is taken."""
+        q = Queue()
+        for item in [1, None, 2]:
+            q.put(item)
+
+        assert drain(q, 10) == [1, None]
+
+
+class TestShadowBatching:
+    """Test that a backlog of transcripts is decided in one prompt."""
+
+    def run(self, shadow: StubShadow, texts: List[str], release: threading.Event):
+        shadow.initialize()
+        conversation = shadow.conversation("test")
+        shadow.on_transcript(*transcript(texts[0]))
+        # The first transcript keeps the LLM busy while the rest queue up.
+        assert shadow.stub.entered.wait(5)
+        for text in texts[1:]:
+            shadow.on_transcript(*transcript(text))
+        release.set()
+        shadow.shutdown()
+        return conversation
+
+    def test_backlog_batched(self):
+        """Test that transcripts queued behind a busy LLM share one prompt, within the batch size."""
+        release = threading.Event()
+        llm = ScriptedLLM(decide_all(TranscriptionAction.ADD_TO_CONTEXT), release)
+        shadow = StubShadow(llm, supersede=False, max_batch_size=4)
+        conversation = self.run(shadow, [f"chunk {i}" for i in range(6)], release)
+
+        assert [schema for schema, _ in llm.prompts] == [ActionDecision, BatchDecision, ActionDecision]
+        assert conversation.context.turns() == [f"chunk {i}" for i in range(6)]
+
+    def test_applied_in_order(self):
+        """Test that decisions are applied per chunk id, so a memory dump only sees earlier chunks."""
+        release = threading.Event()
+
+        def decide(schema, prompt):
+            if schema is BatchDecision:
+                actions = ["ADD_TO_CONTEXT", "STORE_IN_MEMORY", "ADD_TO_CONTEXT"]
+                # Out of order on purpose, the chunk id decides where a decision applies.
+                return BatchDecision(
+                    decisions=[ChunkDecision(chunk_id=i, action=actions[i], reason="") for i in (2, 0, 1)]
+                )
+            if schema is ActionDecision:
+                return ActionDecision(action="DISCARD", reason="")
+            return None
+
+        llm = ScriptedLLM(decide, release)
+        shadow = StubShadow(llm, supersede=False)
+        conversation = self.run(shadow, ["noise", "a", "b", "c"], release)
+
+        memory = [prompt for schema, prompt in llm.prompts if schema.__name__ == "MemorySummary"]
+        assert len(memory) == 1 and "a" in memory[0] and "c" not in memory[0]
+        assert conversation.context.turns() == ["c"]
+
+    def test_missing_decision_falls_back(self):
+        """Test that chunks the batch answer skipped are decided on their own."""
+        release = threading.Event()
+
+        def decide(schema, prompt):
+            if schema is BatchDecision:
+                return BatchDecision(decisions=[ChunkDecision(chunk_id=0, action="ADD_TO_CONTEXT", reason="")])
+            return ActionDecision(action="ADD_TO_CONTEXT", reason="")
+
+        llm = ScriptedLLM(decide, release)
+        shadow = StubShadow(llm, supersede=False)
+        conversation = self.run(shadow, ["first", "a", "b"], release)
+
+        assert [schema for schema, _ in llm.prompts] == [ActionDecision, BatchDecision, ActionDecision]
+        assert conversation.context.turns() == ["first", "a", "b"]
@@ -0,0 +1,159 @@
+"""
+Tests for the local pre-classifier that skips the LLM for obvious noise.
+"""
+
+import sys
+import types
+from types import SimpleNamespace
+from typing import Optional
+
+import numpy as np
+import pytest
+
+from assistant.components.mumble.mumble import SpeechSegment
+from assistant.components.shadow.main import ActionDecision, TranscriptionAction
+from assistant.components.shadow.prefilter import Prefilter, PrefilterConfig
+from assistant.components.transcriber.types import Transcript
+
+from shadow_stubs import StubShadow
+
+
+def transcript(text: str, probability: Optional[float] = None) -> Transcript:
+    return Transcript(transcript=text, language="en", duration=1.0, language_probability=probability)
+
+
+class TestPrefilter:
+    """Test the discard rules and their stats."""
+
+    @pytest.mark.parametrize(
+        "text, reason",
+        [
+            ("", "empty"),
+            (" ... ", "empty"),
+            ("[Music]", "annotation"),
+            ("(applause)", "annotation"),
+            ("Thanks for watching!", "noise phrase"),
+            ("Subtitles by the Amara.org community", "noise phrase"),
+            ("Uh, um.", "filler"),
+            ("Yeah, okay.", "filler"),
+            ("Mm-hmm", "filler"),
+        ],
+    )
+    def test_discards_noise(self, text, reason):
+        """Test that obvious noise is discarded with its reason."""
+        assert Prefilter().classify(transcript(text)) == reason
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "Stop",
+            "Yeah, call Anna tomorrow",
+            "uh so the build server is down again",
+            "okay okay okay okay okay",
+            "Thank you.",
+            "You",
+        ],
+    )
+    def test_passes_content(self, text):
+        """Test that anything with content goes to the LLM."""
+        assert Prefilter().classify(transcript(text)) is None
+
+    def test_low_language_confidence(self):
+        """Test that only short chunks are discarded on a low language probability."""
+        prefilter = Prefilter()
+
+        assert prefilter.classify(transcript("la ma ga", 0.2)) == "low language confidence"
+        assert prefilter.classify(transcript("la ma ga", 0.9)) is None
+        assert prefilter.classify(transcript("this is a long enough sentence to keep", 0.2)) is None
+
+    def test_classifier(self, monkeypatch):
+        """Test that a configured classifier is loaded by path and thresholded."""
+        module = types.ModuleType("tiny_classifier")
+        module.score = lambda text: 0.95 if "beep" in text else 0.1
+        monkeypatch.setitem(sys.modules, "tiny_classifier", module)
+        prefilter = Prefilter(PrefilterConfig(classifier="tiny_classifier:score"))
+
+        assert prefilter.classify(transcript("beep beep boop")) == "classifier"
+        assert prefilter.classify(transcript("turn the lights off")) is None
+
+    def test_disabled(self):
+        """Test that a disabled prefilter sends everything on."""
+        assert Prefilter(PrefilterConfig(enabled=False)).classify(transcript("uh")) is None
+
+    def test_stats(self):
+        """Test bypass rate and sampled agreement."""
+        prefilter = Prefilter()
+        for text in ["uh", "um", "hello there", "[Music]"]:
+            prefilter.classify(transcript(text))
+        prefilter.record_sample(True)
+        prefilter.record_sample(False)
+
+        stats = prefilter.get_stats()
+        assert stats.bypass_rate == 0.75
+        assert stats.reasons == {"filler": 2, "annotation": 1}
+        assert stats.agreement == 0.5
+        assert stats.model_dump()["bypass_rate"] == 0.75
+
+
+class CountingLLM:
+    """Stand-in for ChatOllama that always decides ADD_TO_CONTEXT and counts calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def bind(self, format: dict):
+        llm = self
+
+        class Runnable:
+            async def astream(self, messages):
+                llm.calls += 1
+                decision = ActionDecision(action=TranscriptionAction.ADD_TO_CONTEXT, reason="")
+                yield SimpleNamespace(content=decision.model_dump_json(), response_metadata={})
+
+        return Runnable()
+
+
+def segment() -> SpeechSegment:
+    return SpeechSegment(source="test", source_info=None, data=np.zeros(1, dtype=np.int16))
+
+
+class TestShadowPrefilter:
+    """Test that Shadow skips the LLM for prefiltered chunks."""
+
+    def test_bypass(self):
+        """Test that filler is discarded without an LLM call and content still reaches it."""
+        shadow = StubShadow(CountingLLM(), prefilter={"sample_rate": 0.0})
+        shadow.initialize()
+
+        assert shadow.process_transcript(segment(), transcript("uh")).action == TranscriptionAction.DISCARD
+        assert shadow.stub.calls == 0
+        shadow.process_transcript(segment(), transcript("remind me to call Anna"))
+        assert shadow.stub.calls == 1
+        assert shadow.prefilter_stats().bypass_rate == 0.5
+        shadow.shutdown()
+
+    def test_sampled_agreement(self):
+        """Test that sampled chunks are scored by the LLM but keep the prefilter decision."""
+        shadow = StubShadow(CountingLLM(), prefilter={"sample_rate": 1.0})
+        shadow.initialize()
+
+        decision = shadow.process_transcript(segment(), transcript("um"))
+
+        assert decision.action == TranscriptionAction.DISCARD
+        assert shadow.conversation("test").context.turns() == []
+        stats = shadow.prefilter_stats()
+        assert (stats.sampled, stats.agreement) == (1, 0.0)
+        shadow.shutdown()
+
+    def test_classified_once(self):
+        """Test that a queued chunk is not classified again when it is decided."""
+        shadow = StubShadow(CountingLLM(), prefilter={"sample_rate": 0.0})
+        shadow.initialize()
+
+        shadow.on_transcript(segment(), transcript("uh"))
+        shadow.on_transcript(segment(), transcript("remind me to call Anna"))
+        shadow.shutdown()
+
+        stats = shadow.prefilter_stats()
+        assert (stats.total, stats.bypassed) == (2, 1)
+        assert shadow.stub.calls == 1
@@ -0,0 +1,182 @@
+"""
+Tests for the async streaming LLM client and decision cancellation in Shadow.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import CancelledError
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from assistant.components.shadow.main import ActionDecision, BatchDecision, ChunkDecision
+from assistant.components.shadow.streaming import AsyncLLMClient
+
+from shadow_stubs import StubShadow, transcript
+
+
+class TokenStream:
+    """Runnable that streams tokens with a delay and tracks concurrency and cancellation."""
+
+    def __init__(self, tokens: List[str], delay: float = 0.01):
+        self.tokens = tokens
+        self.delay = delay
+        self.running = 0
+        self.peak = 0
+        self.cancelled = threading.Event()
+
+    async def astream(self, messages):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            for token in self.tokens:
+                await asyncio.sleep(self.delay)
+                yield SimpleNamespace(content=token, response_metadata={})
+            yield SimpleNamespace(content="", response_metadata={"eval_count": len(self.tokens)})
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        finally:
+            self.running -= 1
+
+
+@pytest.fixture
+def client():
+    client = AsyncLLMClient(max_concurrency=2)
+    yield client
+    client.close()
+
+
+class TestAsyncLLMClient:
+    """Test streaming, per-model concurrency and cancellation."""
+
+    def test_stream(self, client):
+        """Test that content is assembled and TTFT and tokens/s are recorded."""
+        tokens = []
+        result = client.run(client.stream("model", TokenStream(["a", "b", "c"]), [], tokens.append))
+
+        assert result.content == "abc" and tokens == ["a", "b", "c"]
+        assert result.tokens == 3
+        assert 0 < result.ttft < result.elapsed
+        assert result.tokens_per_second > 0
+        stats = client.get_stats()
+        assert (stats.ttft.count, stats.tokens_per_second.count, stats.completed) == (1, 1, 1)
+
+    def test_concurrency_per_model(self, client):
+        """Test that at most `max_concurrency` streams run per model, models do not share slots."""
+        first, second = TokenStream(["x"] * 5), TokenStream(["y"] * 5)
+        futures = [client.submit(client.stream("first", first, [])) for _ in range(5)]
+        futures += [client.submit(client.stream("second", second, [])) for _ in range(2)]
+        for future in futures:
+            future.result(5)
+
+        assert first.peak == 2
+        assert second.peak == 2
+
+    def test_cancel(self, client):
+        """Test that cancelling the future stops the stream."""
+        stream = TokenStream(["x"] * 100, delay=0.05)
+        future = client.submit(client.stream("model", stream, []))
+        time.sleep(0.1)
+        future.cancel()
+
+        assert stream.cancelled.wait(5)
+        with pytest.raises(CancelledError):
+            future.result()
+        assert client.get_stats().cancelled == 1
+
+
+class GatedLLM:
+    """Stand-in for ChatOllama whose decisions wait for a gate, answering ADD_TO_CONTEXT."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.finished: List[str] = []
+        self.cancelled: List[str] = []
+
+    def bind(self, format: dict):
+        llm = self
+
+        class Runnable:
+            async def astream(self, messages):
+                prompt = messages[-1].content
+                llm.started.set()
+                try:
+                    while not llm.gate.is_set():
+                        await asyncio.sleep(0.01)
+                except asyncio.CancelledError:
+                    llm.cancelled.append(prompt)
+                    raise
+                if format["title"] == "BatchDecision":
+                    count = prompt.count("\r\n[")
+                    parsed = BatchDecision(
+                        decisions=[ChunkDecision(chunk_id=i, action="ADD_TO_CONTEXT", reason="") for i in range(count)]
+                    )
+                else:
+                    parsed = ActionDecision(action="ADD_TO_CONTEXT", reason="")
+                llm.finished.append(prompt)
+                yield SimpleNamespace(content=parsed.model_dump_json(), response_metadata={})
+
+        return Runnable()
+
+
+class TestShadowCancellation:
+    """Test that stale decisions are abandoned."""
+
+    def test_superseded(self):
+        """Test that a newer transcript cancels the decision in flight and both are decided together."""
+        shadow = StubShadow(GatedLLM())
+        shadow.initialize()
+        conversation = shadow.conversation("test")
+        shadow.on_transcript(*transcript("first"))
+        assert shadow.stub.started.wait(5)
+
+        shadow.on_transcript(*transcript("second"))
+        deadline = time.monotonic() + 5
+        while not shadow.stub.cancelled and time.monotonic() < deadline:
+            time.sleep(0.01)
+        shadow.stub.gate.set()
+        shadow.shutdown()
+
+        assert len(shadow.stub.cancelled) == 1 and "first" in shadow.stub.cancelled[0]
+        assert len(shadow.stub.finished) == 1 and "[1]" in shadow.stub.finished[0]
+        assert conversation.context.turns() == ["first", "second"]
+        assert shadow.stream_stats().cancelled == 1
+
+    def test_prefiltered_not_superseding(self):
+        """Test that a chunk the prefilter discards leaves the decision in flight running."""
+        shadow = StubShadow(GatedLLM(), prefilter={"sample_rate": 0.0})
+        shadow.initialize()
+        conversation = shadow.conversation("test")
+        shadow.on_transcript(*transcript("first"))
+        assert shadow.stub.started.wait(5)
+
+        shadow.on_transcript(*transcript("uh"))
+        time.sleep(0.1)
+        shadow.stub.gate.set()
+        shadow.shutdown()
+
+        assert shadow.stub.cancelled == []
+        assert conversation.context.turns() == ["first"]
+        assert shadow.prefilter_stats().bypassed == 1
+
+    def test_interrupt(self):
+        """Test that an interrupt drops the transcripts of the decision in flight."""
+        shadow = StubShadow(GatedLLM())
+        shadow.initialize()
+        conversation = shadow.conversation("test")
+        shadow.on_transcript(*transcript("stale"))
+        assert shadow.stub.started.wait(5)
+
+        assert shadow.interrupt()
+        deadline = time.monotonic() + 5
+        while not shadow.stub.cancelled and time.monotonic() < deadline:
+            time.sleep(0.01)
+        shadow.stub.gate.set()
+        shadow.on_transcript(*transcript("fresh"))
+        shadow.shutdown()
+
+        assert conversation.context.turns() == ["fresh"]
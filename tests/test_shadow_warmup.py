@@ -0,0 +1,79 @@
+"""
+Tests for Shadow runnable reuse, warm-up and cold/warm latency stats.
+"""
+
+import threading
+from types import SimpleNamespace
+
+from assistant.components.shadow.main import DECISION_SYSTEM_PROMPT, ActionDecision, BatchDecision
+
+from shadow_stubs import StubShadow, transcript
+
+
+class OllamaLike:
+    """Stand-in for ChatOllama that reports a model load on its first call only."""
+
+    def __init__(self):
+        self.built = []
+        self.system_prompts = []
+        self.loaded = False
+        self.called = threading.Event()
+
+    def bind(self, format: dict):
+        llm = self
+        self.built.append(format["title"])
+
+        class Runnable:
+            async def astream(self, messages):
+                llm.system_prompts.append(messages[0].content)
+                load_duration = 0 if llm.loaded else 3_000_000_000
+                llm.loaded = True
+                if format["title"] == "BatchDecision":
+                    parsed = BatchDecision()
+                else:
+                    parsed = ActionDecision(action="DISCARD", reason="")
+                yield SimpleNamespace(content=parsed.model_dump_json(), response_metadata={})
+                yield SimpleNamespace(content="", response_metadata={"load_duration": load_duration})
+                llm.called.set()
+
+        return Runnable()
+
+
+class TestShadowWarmup:
+    """Test that Shadow warms the model up and keeps a stable prompt prefix."""
+
+    def test_warmup_is_the_cold_start(self):
+        """Test that the warm-up absorbs the model load and later decisions are warm."""
+        shadow = StubShadow(OllamaLike(), warmup=True)
+        shadow.initialize()
+        assert shadow.stub.called.wait(5)
+
+        for text in ["first chunk", "second chunk"]:
+            shadow.process_transcript(*transcript(text))
+        shadow.shutdown()
+
+        latency = shadow.llm_latency()
+        assert (latency["cold"].count, latency["warm"].count) == (1, 2)
+
+    def test_runnables_built_once(self):
+        """Test that structured runnables are not rebuilt per transcript."""
+        shadow = StubShadow(OllamaLike())
+        shadow.initialize()
+        built = len(shadow.stub.built)
+
+        for text in ["first chunk", "second chunk", "third chunk"]:
+            shadow.process_transcript(*transcript(text))
+        shadow.shutdown()
+
+        assert len(shadow.stub.built) == built
+
+    def test_stable_system_prefix(self):
+        """Test that single and batched decisions share the same system prompt."""
+        shadow = StubShadow(OllamaLike())
+        shadow.initialize()
+
+        shadow.process_transcript(*transcript("one chunk"))
+        shadow.process_batch([transcript("two"), transcript("chunks")])
+        shadow.shutdown()
+
+        assert set(shadow.stub.system_prompts) == {DECISION_SYSTEM_PROMPT}
@@ -0,0 +1,181 @@
+"""
+Tests for the sharded worker pool and conversation keys.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from assistant.utils.shards import ShardConfig, ShardPool, conversation_key
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class TestShardPool:
+    """Test per-key ordering, parallelism and eviction."""
+
+    def test_ordered_per_key(self):
+        """Test that items of one key are processed in arrival order, never two batches at once."""
+        seen = {}
+        running = set()
+        overlaps = []
+
+        def process(key, state, items):
+            if key in running:
+                overlaps.append(key)
+            running.add(key)
+            time.sleep(0.001)
+            seen.setdefault(key, []).extend(items)
+            running.discard(key)
+
+        pool = ShardPool(process, ShardConfig(workers=4), max_batch=3)
+        for i in range(50):
+            for key in "abc":
+                pool.submit(key, i)
+        pool.close()
+
+        assert seen == {key: list(range(50)) for key in "abc"}
+        assert not overlaps
+
+    def test_keys_in_parallel(self):
+        """Test that a blocked key does not hold up the others, within the worker count."""
+        gate = threading.Event()
+        done = []
+
+        def process(key, state, items):
+            if key == "slow":
+                gate.wait(5)
+            done.append(key)
+
+        pool = ShardPool(process, ShardConfig(workers=2))
+        pool.submit("slow", 0)
+        pool.submit("fast", 0)
+
+        assert wait_until(lambda: done == ["fast"])
+        gate.set()
+        pool.close()
+        assert done == ["fast", "slow"]
+
+    def test_bounded_workers(self):
+        """Test that no more shards run at once than there are workers."""
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def process(key, state, items):
+            with lock:
+                active.append(key)
+                peak.append(len(active))
+            time.sleep(0.02)
+            with lock:
+                active.remove(key)
+
+        pool = ShardPool(process, ShardConfig(workers=3))
+        for key in range(12):
+            pool.submit(key, key)
+        pool.close()
+
+        assert max(peak) == 3
+
+    def test_state_per_key(self):
+        """Test that each key gets its own state, created once."""
+        created = []
+
+        def create(key):
+            created.append(key)
+            return []
+
+        pool = ShardPool(lambda key, state, items: state.extend(items), create=create)
+        for i in range(3):
+            pool.submit("a", i)
+            pool.submit("b", -i)
+        states = pool.states()
+        pool.close()
+
+        assert sorted(created) == ["a", "b"]
+        assert states == {"a": [0, 1, 2], "b": [0, -1, -2]}
+
+    def test_push_front(self):
+        """Test that pushed back items are processed again before newer ones."""
+        seen = []
+        retried = threading.Event()
+
+        def process(key, state, items):
+            seen.append(items)
+            if not retried.is_set():
+                retried.set()
+                pool.submit(key, "newer")
+                pool.push_front(key, items)
+
+        pool = ShardPool(process, max_batch=4)
+        pool.submit("a", "first")
+        pool.close()
+
+        assert seen == [["first"], ["first", "newer"]]
+
+    def test_idle_eviction(self):
+        """Test that idle shards are evicted with their state and busy ones are kept."""
+        evicted = []
+        pool = ShardPool(
+            lambda key, state, items: None,
+            ShardConfig(idle_timeout=60),
+            create=lambda key: f"state {key}",
+            evict=lambda key, state: evicted.append((key, state)),
+        )
+        pool.submit("idle", 0)
+        assert wait_until(lambda: pool.get_stats().queued == 0)
+        pool.state("active")
+
+        assert pool.evict_idle(time.monotonic() + 30) == []
+        pool.shards["active"].last_active += 60
+        assert pool.evict_idle(time.monotonic() + 61) == ["idle"]
+        assert evicted == [("idle", "state idle")]
+
+        stats = pool.get_stats()
+        assert stats.shards == 1 and stats.evicted == 1 and stats.processed == 1
+        pool.close()
+        assert evicted[-1] == ("active", "state active")
+
+    def test_failure_does_not_stop_shard(self):
+        """Test that a failing batch is logged and later items of the key still run."""
+        seen = []
+
+        def process(key, state, items):
+            if items == [0]:
+                raise RuntimeError("boom")
+            seen.extend(items)
+
+        pool = ShardPool(process)
+        pool.submit("a", 0)
+        pool.submit("a", 1)
+        pool.close()
+
+        assert seen == [1]
+
+
+class TestConversationKey:
+    """Test which conversation a segment belongs to."""
+
+    @pytest.mark.parametrize(
+        "source, info, mumble_by, key",
+        [
+            ("mumble", SimpleNamespace(user="alice", channel="Lobby"), "channel", "mumble:#Lobby"),
+            ("mumble", SimpleNamespace(user="alice", channel="Lobby"), "user", "mumble:alice"),
+            ("mumble", SimpleNamespace(user="alice", channel=None), "channel", "mumble:alice"),
+            ("watchdog", SimpleNamespace(file="/tmp/a.wav"), "channel", "watchdog:/tmp/a.wav"),
+            ("test", None, "channel", "test"),
+        ],
+    )
+    def test_key(self, source, info, mumble_by, key):
+        """Test keys for Mumble channels and users, watched files and other sources."""
+        segment = SimpleNamespace(source=source, source_info=info)
+        assert conversation_key(segment, mumble_by) == key
@@ -0,0 +1,87 @@
+"""
+Tests for sliding-window speaker embeddings of long segments.
+"""
+
+import numpy as np
+import pytest
+
+from assistant.components.voice_id.windows import WindowConfig, WindowedEmbedder, window_bounds, window_weights
+
+SR = 16000
+
+
+class FakeModel:
+    """Embeds a window by the sign of its mean, so DC offset stands in for a voice."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        self.batches.append(batch.shape)
+        means = batch.mean(axis=1)
+        return np.stack([means, np.full(len(means), 0.1)], axis=1)
+
+
+def voice(seconds: float, offset: float) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return (offset + 0.05 * rng.standard_normal(int(seconds * SR))).astype(np.float32)
+
+
+@pytest.fixture
+def model():
+    return FakeModel()
+
+
+@pytest.fixture
+def embedder(model):
+    return WindowedEmbedder(model, WindowConfig(window=2.0, hop=1.0, max_single_pass=3.0, max_windows=4))
+
+
+class TestWindowedEmbedder:
+    """Test windowing, aggregation and multi-speaker detection."""
+
+    def test_bounds(self):
+        """Test that windows cover the segment and the last one ends with it."""
+        bounds = window_bounds(10, 4, 3)
+
+        assert bounds == [(0, 4), (3, 7), (6, 10)]
+        assert window_bounds(3, 4, 3) == [(0, 3)]
+
+    def test_single_pass(self, embedder, model):
+        """Test that short segments go through the model in one piece."""
+        result = embedder.embed(voice(2.5, 0.5))
+
+        assert model.batches == [(1, int(2.5 * SR))]
+        assert len(result.windows) == 1
+        assert not result.multi_speaker
+
+    def test_bounded_batches(self, embedder, model):
+        """Test that long segments are embedded a bounded number of windows at a time."""
+        result = embedder.embed(voice(20.0, 0.5))
+
+        assert len(result.windows) == 19
+        assert all(batch[0] <= 4 and batch[1] == 2 * SR for batch in model.batches)
+        assert np.isclose(np.linalg.norm(result.embedding), 1.0)
+
+    def test_multi_speaker(self, embedder):
+        """Test that windows of two different voices flag the segment."""
+        result = embedder.embed(np.concatenate([voice(6.0, 0.5), voice(6.0, -0.5)]))
+
+        assert result.multi_speaker
+        assert result.agreement.min() < 0.5
+
+    def test_one_speaker(self, embedder):
+        """Test that windows of one voice agree."""
+        result = embedder.embed(voice(12.0, 0.5))
+
+        assert not result.multi_speaker
+        assert result.agreement.min() > 0.99
+
+    def test_quality_weights(self):
+        """Test that quiet windows weigh less than loud ones."""
+        waveform = np.concatenate([np.full(SR, 0.01), np.full(SR, 0.5)])
+
+        weights = window_weights(waveform, [(0, SR), (SR, 2 * SR)])
+
+        assert weights[0] < weights[1]
+        assert np.isclose(weights.sum(), 1.0)
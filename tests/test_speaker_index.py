@@ -0,0 +1,67 @@
+"""
+Tests for the local speaker embedding index.
+"""
+
+import numpy as np
+import pytest
+
+from assistant.components.voice_id.index import SpeakerIndex
+
+
+@pytest.fixture
+def index():
+    """Create an index with two speakers on orthogonal axes."""
+    index = SpeakerIndex(dim=4, capacity=1)
+    index.add("p1", np.array([1.0, 0.0, 0.0, 0.0]), "alice")
+    index.add("p2", np.array([0.0, 2.0, 0.0, 0.0]), "bob")
+    index.add("p3", np.array([0.9, 0.1, 0.0, 0.0]), "alice")
+    return index
+
+
+class TestSpeakerIndex:
+    """Test cosine search over known speakers."""
+
+    def test_empty_index(self):
+        """Test that searching an empty index returns no matches."""
+        assert SpeakerIndex(dim=4).search(np.ones(4)) == []
+
+    def test_top1_cosine(self, index):
+        """Test that the best match and its cosine score are returned."""
+        [(speaker, score)] = index.search(np.array([0.0, 5.0, 0.0, 0.0]))
+        assert speaker == "bob"
+        assert score == pytest.approx(1.0)
+
+    def test_topk_sorted(self, index):
+        """Test that top-k results are ordered by score."""
+        matches = index.search(np.array([1.0, 0.05, 0.0, 0.0]), k=3)
+        assert [speaker for speaker, _ in matches] == ["alice", "alice", "bob"]
+        assert matches[0][1] >= matches[1][1] >= matches[2][1]
+
+    def test_grows_beyond_capacity(self, index):
+        """Test that adding past the initial capacity keeps all vectors."""
+        assert len(index) == 3
+
+    def test_remove_speaker(self, index):
+        """Test that removing a speaker drops all of their vectors."""
+        assert sorted(index.remove_speaker("alice")) == ["p1", "p3"]
+        assert len(index) == 1
+        assert index.search(np.array([1.0, 0.0, 0.0, 0.0]), k=5)[0][0] == "bob"
+
+    def test_known_points_skipped(self, index):
+        """Test that a point added again, e.g. after a reload, is not duplicated."""
+        index.add("p2", np.array([0.0, 2.0, 0.0, 0.0]), "bob")
+        assert len(index) == 3
+
+        index.remove_speaker("bob")
+        index.add("p2", np.array([0.0, 2.0, 0.0, 0.0]), "bob")
+        assert len(index) == 3
+
+    def test_replace(self, index):
+        """Test that a reload from the store swaps in speakers enrolled elsewhere."""
+        index.replace(["p1", "p4"], np.array([[1.0, 0.0, 0.0, 0.0], [0.0, 0.0, 1.0, 0.0]]), ["alice", "carol"])
+        assert len(index) == 2
+        assert index.search(np.array([0.0, 0.0, 3.0, 0.0]))[0][0] == "carol"
+        assert index.search(np.array([0.0, 1.0, 0.0, 0.0]))[0][0] != "bob"
+
+        index.replace([], np.zeros((0, 4)), [])
+        assert index.search(np.ones(4)) == []
@@ -0,0 +1,115 @@
+"""
+Tests for speculative transcription before the VAD endpoint.
+"""
+
+from typing import List
+
+import numpy as np
+import pytest
+
+from assistant.components.mumble.mumble import SpeechSegment
+from assistant.components.transcriber.speculation import Confirmation, SpeculationTracker
+from assistant.components.transcriber.types import Transcript
+from assistant.utils.audio import VadFilter
+from assistant.utils.stats import LatencySummary
+
+CHUNK = np.ones(512, dtype=np.int16)
+
+
+class ScriptedVad:
+    """Stand-in for Silero that replays a fixed sequence of speech scores."""
+
+    def __init__(self, scores: List[float]):
+        self.scores = iter(scores)
+
+    def __call__(self, _: bytes) -> float:
+        return next(self.scores)
+
+
+def run_filter(pattern: str, **kwargs):
+    """Feed a pattern of speech ('s') and silence ('.') chunks through a VadFilter."""
+    calls = []
+    vad_filter = VadFilter(
+        callback=lambda speech: calls.append(("final", len(speech))),
+        min_speech=2,
+        silence_end=4,
+        preroll_size=2,
+        on_speculate=lambda speech: calls.append(("speculate", len(speech))),
+        on_speculation_cancel=lambda: calls.append(("cancel", 0)),
+        **kwargs,
+    )
+    vad_filter.vad = ScriptedVad([1.0 if c == "s" else 0.0 for c in pattern])
+    for _ in pattern:
+        vad_filter(CHUNK)
+    return [name for name, _ in calls]
+
+
+def make_transcript(text: str) -> Transcript:
+    return Transcript(transcript=text, language="en", duration=1.0)
+
+
+def make_segment(**kwargs) -> SpeechSegment:
+    return SpeechSegment(source="mumble", source_info=None, data=CHUNK, **kwargs)
+
+
+class TestVadSpeculation:
+    """Test speculation hooks in the VAD filter."""
+
+    def test_disabled_by_default(self):
+        """Test that no speculation happens without speculate_after."""
+        assert run_filter("ssss....") == ["final"]
+
+    def test_speculate_then_confirm(self):
+        """Test that speculation fires at silence onset before the endpoint."""
+        assert run_filter("ssss....", speculate_after=1) == ["speculate", "final"]
+
+    def test_speculate_then_resume(self):
+        """Test that resumed speech cancels the speculation."""
+        assert run_filter("sss.ss....", speculate_after=1) == [
+            "speculate",
+            "cancel",
+            "speculate",
+            "final",
+        ]
+
+
+class TestSpeculationTracker:
+    """Test matching of speculative results with final segments."""
+
+    @pytest.fixture
+    def tracker(self):
+        return SpeculationTracker()
+
+    def test_final_without_speculation(self, tracker):
+        """Test that unknown final segments go through the normal path."""
+        assert tracker.confirm(make_segment()) == (Confirmation.NONE, None)
+
+    def test_hit_after_result(self, tracker):
+        """Test that a finished speculation is reused by the final segment."""
+        speculative = make_segment(speculative=True)
+        tracker.begin(speculative)
+        transcript = make_transcript("hello")
+        assert tracker.resolve(speculative, transcript) is None
+
+        final = make_segment(segment_id=speculative.segment_id)
+        assert tracker.confirm(final) == (Confirmation.HIT, transcript)
+        assert tracker.hits == 1
+
+    def test_hit_before_result(self, tracker):
+        """Test that the final segment waits for a running speculation."""
+        speculative = make_segment(speculative=True)
+        tracker.begin(speculative)
+
+        final = make_segment(segment_id=speculative.segment_id)
+        assert tracker.confirm(final) == (Confirmation.PENDING, None)
+        assert tracker.resolve(speculative, make_transcript("hello")) is final
+
+    def test_cancelled_speculation_discarded(self, tracker):
+        """Test that results of cancelled speculations are ignored."""
+        speculative = make_segment(speculative=True)
+        tracker.begin(speculative)
+        tracker.cancel(speculative.segment_id)
+
+        assert not tracker.is_current(speculative)
+        assert tracker.resolve(speculative, make_transcript("hel")) is None
+        assert tracker.stats(LatencySummary()).misses == 1
@@ -0,0 +1,89 @@
+"""
+Tests for block-wise resampling and streaming file decode.
+"""
+
+import numpy as np
+import pytest
+import resampy
+import soundfile as sf
+
+from assistant.components.watchdog import ingest
+from assistant.utils.audio.reshape import StreamResampler
+
+
+class TestStreamResampler:
+    """Test that resampling in blocks matches resampling the whole signal."""
+
+    @pytest.mark.parametrize("samplerate", [8000, 22050, 44100, 48000, 16000])
+    def test_matches_full(self, samplerate):
+        """Test random block sizes against one `resampy.resample` call."""
+        rng = np.random.default_rng(0)
+        signal = (0.1 * rng.standard_normal(samplerate * 3 + 123)).astype(np.float32)
+        resampler = StreamResampler(samplerate, 16000)
+
+        blocks, offset = [], 0
+        while offset < len(signal):
+            size = int(rng.integers(1, 20000))
+            blocks.append(resampler(signal[offset : offset + size]))
+            offset += size
+        blocks.append(resampler.flush())
+        streamed = np.concatenate(blocks)
+
+        full = resampy.resample(signal, samplerate, 16000)
+        assert len(streamed) == len(full)
+        np.testing.assert_allclose(streamed, full, atol=1e-6)
+
+    def test_output_while_streaming(self):
+        """Test that output lags the input by the filter width only."""
+        resampler = StreamResampler(48000, 16000)
+        out = resampler(np.zeros(48000, dtype=np.float32))
+
+        assert 16000 - len(out) <= resampler.pad // 3 + resampler.step_out
+
+
+class TestStreamingDecode:
+    """Test decoding and VAD of a file block by block."""
+
+    def test_decode_matches_full_read(self, tmp_path):
+        """Test that the streamed decode equals the whole-file downmix and resample."""
+        path = str(tmp_path / "stereo.wav")
+        rng = np.random.default_rng(1)
+        stereo = (0.2 * rng.standard_normal((44100 * 3, 2))).astype(np.float32)
+        sf.write(path, stereo, 44100, subtype="FLOAT")
+
+        blocks = list(ingest.stream_audio(path, block_seconds=0.5))
+        full = ingest.to_int16(resampy.resample(stereo.mean(axis=1), 44100, 16000))
+
+        assert len(blocks) > 1
+        streamed = np.concatenate(blocks)
+        assert len(streamed) == len(full)
+        assert np.abs(streamed.astype(np.int32) - full).max() <= 1
+
+    def test_segments_before_end_of_file(self, tmp_path, monkeypatch):
+        """Test that speech is handed out while later blocks are still unread."""
+        path = str(tmp_path / "long.wav")
+        sf.write(path, np.zeros(16000 * 10, dtype=np.float32), 16000)
+
+        read = []
+        stream_audio = ingest.stream_audio
+
+        def counting(file, block_seconds):
+            for block in stream_audio(file, block_seconds):
+                read.append(len(block))
+                yield block
+
+        class EveryChunkVad:
+            def __init__(self, callback):
+                self.callback = callback
+
+            def __call__(self, chunk):
+                self.callback(chunk)
+
+        monkeypatch.setattr(ingest, "stream_audio", counting)
+        monkeypatch.setattr(ingest, "VadFilter", EveryChunkVad)
+        seen_at = []
+        result = ingest.detect_speech(path, lambda speech: seen_at.append(len(read)), block_seconds=1.0)
+
+        assert result.seconds == 10.0 and result.error is None
+        assert seen_at[0] == 1 and len(read) == 10
+        assert result.segments == 16000 * 10 // 512
@@ -0,0 +1,214 @@
+"""
+Tests for streaming transcription of long utterances.
+"""
+
+import numpy as np
+import pytest
+
+from assistant.components.mumble.mumble import SpeechSegment
+from assistant.components.transcriber.events import TRANSCRIPTION_SEGMENT_DONE, TRANSCRIPTION_SEGMENT_DROPPED
+from assistant.components.transcriber.main import TranscriberService
+from assistant.components.transcriber.profiles import LanguageHints, LanguageHintsConfig, ProfileSelector
+from assistant.components.transcriber.scheduler import SchedulerConfig, SegmentScheduler
+from assistant.components.transcriber.speculation import SpeculationTracker
+from assistant.components.transcriber.streaming import StreamTracker, TranscriptStream, stitch
+from assistant.components.transcriber.types import Segment, Transcript, TranscriptionOptions, Word
+from assistant.utils.stats import LatencyStats
+from assistant.config import SPEECH_PIPELINE_SAMPLERATE
+
+
+def window_transcript(*words) -> Transcript:
+    """Build a window transcript from (word, start, end) tuples relative to the window."""
+    items = [Word(word=w, start=s, end=e) for w, s, e in words]
+    text = " ".join(w.word for w in items)
+    return Transcript(
+        transcript=text,
+        language="en",
+        duration=items[-1].end if items else 0.0,
+        segments=[Segment(text=text, start=0.0, end=items[-1].end, words=items)],
+    )
+
+
+def make_segment(seconds: float, **kwargs) -> SpeechSegment:
+    data = np.zeros(int(seconds * SPEECH_PIPELINE_SAMPLERATE), dtype=np.int16)
+    return SpeechSegment(source="mumble", source_info=None, data=data, **kwargs)
+
+
+class TestStitching:
+    """Test deduplication of overlapping windows."""
+
+    def test_stitch_drops_committed_words(self):
+        """Test that words inside the committed span are dropped."""
+        words = [Word(word="a", start=0.0, end=0.4), Word(word="b", start=0.5, end=0.9)]
+        assert [w.word for w in stitch(0.45, words)] == ["b"]
+
+    def test_rolling_windows(self):
+        """Test that overlapping windows produce each word exactly once."""
+        stream = TranscriptStream(overlap=1.0)
+
+        interim = stream.update(
+            window_transcript(("one", 0.1, 0.5), ("two", 0.8, 1.3), ("three", 2.2, 2.7)),
+            offset=0.0,
+            duration=3.0,
+            final=False,
+        )
+        assert interim.transcript == "one two three"
+        assert stream.committed_until == pytest.approx(1.3)
+
+        offset, window = stream.window(make_segment(5.0))
+        assert offset == pytest.approx(0.3)
+        assert len(window) == int(4.7 * SPEECH_PIPELINE_SAMPLERATE)
+
+        final = stream.update(
+            window_transcript(("two", 0.5, 1.0), ("three", 1.9, 2.4), ("four", 3.0, 3.5)),
+            offset=offset,
+            duration=5.0,
+            final=True,
+        )
+        assert final.transcript == "one two three four"
+        assert final.segments[0].words[-1].end == pytest.approx(3.8)
+
+
+class TestStreamTracker:
+    """Test scheduling of windows per utterance."""
+
+    def test_one_window_in_flight(self):
+        """Test that partials arriving during a running window are coalesced."""
+        tracker = StreamTracker(overlap=1.0)
+        first = make_segment(2.5, partial=True)
+        second = make_segment(5.0, partial=True, segment_id=first.segment_id)
+        third = make_segment(7.5, partial=True, segment_id=first.segment_id)
+
+        assert tracker.submit_partial(first)
+        assert not tracker.submit_partial(second)
+        assert not tracker.submit_partial(third)
+        assert tracker.done(first) is third
+
+    def test_final_waits_for_window(self):
+        """Test that the final segment is enqueued after the running window."""
+        tracker = StreamTracker(overlap=1.0)
+        partial = make_segment(2.5, partial=True)
+        final = make_segment(4.0, segment_id=partial.segment_id)
+
+        assert tracker.submit_partial(partial)
+        assert tracker.submit_final(final) is False
+        assert tracker.done(partial) is final
+        assert tracker.done(final) is None
+        assert tracker.get(final) is None
+
+    def test_final_without_stream(self):
+        """Test that utterances without partials are not tracked."""
+        tracker = StreamTracker(overlap=1.0)
+        assert tracker.submit_final(make_segment(1.0)) is None
+
+    def test_idle_stream_released(self):
+        """Test that a stream whose final segment never came is released once idle."""
+        tracker = StreamTracker(overlap=1.0, idle_timeout=5.0)
+        abandoned = make_segment(2.5, partial=True)
+        assert tracker.submit_partial(abandoned)
+        tracker.done(abandoned)
+        tracker.get(abandoned).touched -= 10.0
+
+        assert tracker.submit_partial(make_segment(2.5, partial=True))
+        assert tracker.get(abandoned) is None
+
+
+class WindowBackend:
+    """Stand-in backend that returns a fixed window transcript and records window lengths."""
+
+    def __init__(self, transcript: Transcript):
+        self.transcript = transcript
+        self.windows = []
+
+    def transcribe(self, data, options: TranscriptionOptions) -> Transcript:
+        self.windows.append(len(data) / SPEECH_PIPELINE_SAMPLERATE)
+        return self.transcript
+
+
+@pytest.fixture
+def transcriber():
+    service = TranscriberService()
+    service.streams = StreamTracker(overlap=1.0)
+    service.speculations = SpeculationTracker()
+    service.speech_segments = SegmentScheduler(
+        SchedulerConfig(), on_drop=service.on_dropped, duration=service.queued_seconds
+    )
+    service.profiles = ProfileSelector([], TranscriptionOptions())
+    service.languages = LanguageHints(LanguageHintsConfig())
+    service.end_of_speech_latency = LatencyStats()
+    service.emitted = {TRANSCRIPTION_SEGMENT_DONE: [], TRANSCRIPTION_SEGMENT_DROPPED: []}
+    for event, emitted in service.emitted.items():
+        service.on(event, lambda *args, emitted=emitted: emitted.append(args))
+    return service
+
+
+class TestTranscriberStreams:
+    """Test the transcriber's handling of streamed utterances."""
+
+    def test_dropped_window_releases_stream(self, transcriber):
+        """Test that a stale window enqueues the final segment waiting behind it."""
+        partial = make_segment(2.5, partial=True)
+        final = make_segment(4.0, segment_id=partial.segment_id)
+
+        transcriber.on_partial_speech(partial)
+        assert transcriber.speech_segments.get() is partial
+        transcriber.on_speech(final)
+        assert transcriber.speech_segments.empty()
+
+        transcriber.on_dropped(partial)
+        assert transcriber.speech_segments.get() is final
+        assert transcriber.emitted[TRANSCRIPTION_SEGMENT_DROPPED] == []
+
+        transcriber.on_dropped(final)
+        assert transcriber.streams.get(final) is None
+        assert len(transcriber.emitted[TRANSCRIPTION_SEGMENT_DROPPED]) == 1
+
+    def test_speculation_reuses_stream(self, transcriber):
+        """Test that a speculation transcribes only the uncommitted tail and pauses windows."""
+        partial = make_segment(2.5, partial=True)
+        transcriber.on_partial_speech(partial)
+        transcriber.speech_segments.get()
+        transcriber.streams.get(partial).update(
+            window_transcript(("one", 0.1, 0.5), ("two", 0.8, 1.3)), offset=0.0, duration=2.5, final=False
+        )
+        transcriber.streams.done(partial)
+
+        speculative = make_segment(4.0, speculative=True, segment_id=partial.segment_id)
+        transcriber.on_speculative_speech(speculative)
+        transcriber.on_partial_speech(make_segment(3.0, partial=True, segment_id=partial.segment_id))
+        assert transcriber.speech_segments.get() is speculative
+        assert transcriber.speech_segments.empty()
+
+        transcriber.backend = WindowBackend(window_transcript(("two", 0.5, 1.0), ("three", 1.9, 2.4)))
+        transcriber.transcribe_speculation(speculative)
+        assert transcriber.backend.windows == [pytest.approx(3.7)]
+
+        transcriber.on_speech(make_segment(4.0, segment_id=partial.segment_id))
+        [(segment, transcript)] = transcriber.emitted[TRANSCRIPTION_SEGMENT_DONE]
+        assert transcript.transcript == "one two three"
+        assert transcriber.streams.get(segment) is None
+
+    def test_window_cost(self, transcriber):
+        """Test that a queued window costs the audio it transcribes, not the whole utterance."""
+        partial = make_segment(2.5, partial=True)
+        transcriber.on_partial_speech(partial)
+        transcriber.speech_segments.get()
+        transcriber.streams.get(partial).update(
+            window_transcript(("one", 0.1, 0.5), ("two", 0.8, 1.3)), offset=0.0, duration=2.5, final=False
+        )
+
+        assert transcriber.queued_seconds(make_segment(10.0, partial=True, segment_id=partial.segment_id)) == (
+            pytest.approx(10.0 - 0.3)
+        )
+        assert transcriber.queued_seconds(make_segment(10.0)) == pytest.approx(10.0)
+
+    def test_partial_without_subscriber(self, transcriber, caplog):
+        """Test that partial transcripts nobody subscribed to are not emitted or warned about."""
+        partial = make_segment(2.5, partial=True)
+        transcriber.on_partial_speech(partial)
+        transcriber.speech_segments.get()
+        transcriber.backend = WindowBackend(window_transcript(("one", 0.1, 0.5)))
+
+        transcriber.transcribe_window(partial)
+
+        assert "No event handler" not in caplog.text
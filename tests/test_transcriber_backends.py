@@ -0,0 +1,117 @@
+"""
+Tests for the transcription backends and their selection.
+"""
+
+from types import SimpleNamespace
+
+import faster_whisper
+import numpy as np
+import pytest
+import requests
+
+from assistant.components.transcriber.backends import (
+    FasterWhisperBackend,
+    TranscriptionError,
+    WhisperxHttpBackend,
+    create_backend,
+)
+from assistant.components.transcriber.types import TranscriptionOptions
+
+
+class FakeWhisperModel:
+    """Stand-in for `faster_whisper.WhisperModel` returning a scripted result."""
+
+    instances = []
+
+    def __init__(self, name: str, **kwargs):
+        self.name = name
+        self.kwargs = kwargs
+        self.calls = []
+        FakeWhisperModel.instances.append(self)
+
+    def transcribe(self, audio, **kwargs):
+        self.calls.append((audio, kwargs))
+        words = [
+            SimpleNamespace(word=" hello", start=0.0, end=0.4),
+            SimpleNamespace(word=" world", start=0.5, end=0.9),
+        ]
+        segments = iter(
+            [
+                SimpleNamespace(text=" hello world ", start=0.0, end=0.9, words=words),
+                SimpleNamespace(text=" again", start=1.0, end=1.4, words=None),
+            ]
+        )
+        return segments, SimpleNamespace(language="en", language_probability=0.97, duration=1.5)
+
+
+@pytest.fixture
+def whisper_model(monkeypatch):
+    FakeWhisperModel.instances = []
+    monkeypatch.setattr(faster_whisper, "WhisperModel", FakeWhisperModel)
+    return FakeWhisperModel
+
+
+class TestFasterWhisperBackend:
+    """Test mapping faster-whisper results into transcripts."""
+
+    def test_transcribe(self, whisper_model):
+        """Test that segments, words, language and probability end up in the transcript."""
+        backend = FasterWhisperBackend({"model": "tiny", "cpu_threads": 1, "workers": 1})
+        data = np.full(16000, 16384, dtype=np.int16)
+
+        transcript = backend.transcribe(data, TranscriptionOptions(model="tiny", align_words=True))
+
+        assert transcript.transcript == "hello world again"
+        assert transcript.language == "en"
+        assert transcript.language_probability == pytest.approx(0.97)
+        assert transcript.duration == pytest.approx(1.5)
+        assert [s.text for s in transcript.segments] == ["hello world", "again"]
+        assert [w.word for w in transcript.segments[0].words] == ["hello", "world"]
+        assert transcript.segments[1].words == []
+
+        (model,) = whisper_model.instances
+        audio, kwargs = model.calls[0]
+        assert audio.dtype == np.float32 and audio[0] == pytest.approx(0.5)
+        assert kwargs["word_timestamps"] is True and kwargs["language"] is None
+
+    def test_models_loaded_once(self, whisper_model):
+        """Test that each model is created once with the configured CPU settings."""
+        backend = FasterWhisperBackend({"model": "tiny", "cpu_threads": 2, "workers": 3})
+        backend.load()
+        backend.transcribe(np.zeros(160, dtype=np.int16), TranscriptionOptions(model="tiny"))
+        backend.transcribe(np.zeros(160, dtype=np.int16), TranscriptionOptions(model="base"))
+
+        assert [m.name for m in whisper_model.instances] == ["tiny", "base"]
+        assert whisper_model.instances[0].kwargs["cpu_threads"] == 2
+        assert whisper_model.instances[0].kwargs["num_workers"] == 3
+
+
+class TestWhisperxHttpBackend:
+    """Test the HTTP backend's error reporting."""
+
+    def test_connection_error_chained(self, monkeypatch):
+        """Test that a failed request raises TranscriptionError with the original error as its cause."""
+
+        def refuse(*args, **kwargs):
+            raise requests.exceptions.ConnectionError("refused")
+
+        monkeypatch.setattr(requests, "post", refuse)
+        backend = WhisperxHttpBackend({})
+
+        with pytest.raises(TranscriptionError) as error:
+            backend.transcribe(np.zeros(1600, dtype=np.int16), TranscriptionOptions())
+        assert isinstance(error.value.__cause__, requests.exceptions.ConnectionError)
+
+
+class TestCreateBackend:
+    """Test picking a backend by name."""
+
+    def test_known_backends(self):
+        """Test that each configured name builds its backend."""
+        assert isinstance(create_backend("whisperx", {}), WhisperxHttpBackend)
+        assert isinstance(create_backend("faster_whisper", {}), FasterWhisperBackend)
+
+    def test_unknown_backend(self):
+        """Test that an unknown name is rejected."""
+        with pytest.raises(ValueError, match="Unknown transcription backend"):
+            create_backend("vosk", {})
@@ -0,0 +1,168 @@
+"""
+Tests for per-segment transcription request profiles.
+"""
+
+import numpy as np
+import pytest
+
+from assistant.components.mumble.mumble import SourceInfo, SpeechSegment
+from assistant.components.transcriber.profiles import (
+    LanguageHints,
+    LanguageHintsConfig,
+    ProfileMatch,
+    ProfileSelector,
+    RequestProfile,
+)
+from assistant.components.transcriber.types import Transcript, TranscriptionOptions
+from assistant.config import SPEECH_PIPELINE_SAMPLERATE
+
+
+def make_segment(source: str, seconds: float, user: str = "alice") -> SpeechSegment:
+    data = np.zeros(int(seconds * SPEECH_PIPELINE_SAMPLERATE), dtype=np.int16)
+    info = SourceInfo(user=user, sequence_id=0) if source == "mumble" else None
+    return SpeechSegment(source=source, source_info=info, data=data)
+
+
+@pytest.fixture
+def selector():
+    defaults = TranscriptionOptions(model="small", diarize=True, align_words=True)
+    profiles = [
+        RequestProfile(
+            name="live-short",
+            match=ProfileMatch(sources=["mumble"], max_duration=3.0, max_speakers=1),
+            model="base",
+            diarize=False,
+            align_words=False,
+        ),
+        RequestProfile(name="single", match=ProfileMatch(max_speakers=1), diarize=False),
+    ]
+    return ProfileSelector(profiles, defaults)
+
+
+class TestProfileSelection:
+    """Test rule matching of request profiles."""
+
+    def test_short_live_segment(self, selector):
+        """Test that short Mumble utterances skip diarization and alignment."""
+        name, options = selector.select(make_segment("mumble", 0.8))
+        assert name == "live-short"
+        assert options == TranscriptionOptions(model="base", diarize=False, align_words=False)
+
+    def test_long_live_segment(self, selector):
+        """Test that unset profile fields keep the defaults."""
+        name, options = selector.select(make_segment("mumble", 10.0))
+        assert name == "single"
+        assert options == TranscriptionOptions(model="small", diarize=False, align_words=True)
+
+    def test_unknown_speaker_count(self, selector):
+        """Test that segments with unknown speaker count fall back to the defaults."""
+        name, options = selector.select(make_segment("watchdog", 1.0))
+        assert name == "default"
+        assert options.diarize
+
+    def test_savings_report(self, selector):
+        """Test that savings are computed against the default profile's RTF."""
+        selector.record("default", audio_seconds=10.0, processing_seconds=2.0)
+        selector.record("live-short", audio_seconds=10.0, processing_seconds=1.0)
+
+        report = selector.report()
+        assert report["default"].saved_seconds is None
+        assert report["live-short"].saved_seconds == pytest.approx(1.0)
+
+    def test_baseline_samples(self, selector):
+        """Test that baseline samples of matching segments get the default options."""
+        selector.baseline_rate = 1.0
+        name, options = selector.select(make_segment("mumble", 0.8))
+        assert name == "default"
+        assert options == selector.defaults
+
+    def test_savings_per_duration(self, selector):
+        """Test that savings only compare segments of similar duration."""
+        selector.record("default", audio_seconds=20.0, processing_seconds=2.0)
+        selector.record("live-short", audio_seconds=1.0, processing_seconds=0.5)
+        assert selector.report()["live-short"].saved_seconds is None
+
+        selector.record("default", audio_seconds=1.5, processing_seconds=1.5)
+        report = selector.report()
+        assert report["live-short"].rtf == pytest.approx(0.5)
+        assert report["live-short"].saved_seconds == pytest.approx(0.5)
+
+
+class TestLanguageHints:
+    """Test per-speaker language hints."""
+
+    def test_hint_after_consistent_transcripts(self):
+        """Test that a hint is given only after enough agreeing transcripts."""
+        hints = LanguageHints(LanguageHintsConfig(min_transcripts=2))
+        segment = make_segment("mumble", 1.0)
+        transcript = Transcript(transcript="hi", language="en", duration=1.0)
+
+        hints.update(segment, transcript)
+        assert hints.hint(segment) is None
+        hints.update(segment, transcript)
+        assert hints.hint(segment) == "en"
+        assert hints.hint(make_segment("mumble", 1.0, user="bob")) is None
+
+    def test_language_change_resets(self):
+        """Test that a different language restarts the streak."""
+        hints = LanguageHints(LanguageHintsConfig(min_transcripts=1))
+        segment = make_segment("mumble", 1.0)
+        hints.update(segment, Transcript(transcript="hi", language="en", duration=1.0))
+        hints.update(segment, Transcript(transcript="hallo", language="de", duration=1.0))
+        assert hints.hint(segment) == "de"
+
+    def test_low_confidence_ignored(self):
+        """Test that uncertain language detections do not count."""
+        hints = LanguageHints(LanguageHintsConfig(min_transcripts=1, min_probability=0.8))
+        segment = make_segment("mumble", 1.0)
+        hints.update(
+            segment,
+            Transcript(transcript="hm", language="en", duration=1.0, language_probability=0.3),
+        )
+        assert hints.hint(segment) is None
+
+    def test_redetected_periodically(self):
+        """Test that the language is detected again after N final transcripts."""
+        hints = LanguageHints(LanguageHintsConfig(min_transcripts=1, redetect_every=3))
+        segment = make_segment("mumble", 1.0)
+        hints.update(segment, Transcript(transcript="hi", language="en", duration=1.0))
+
+        hinted = []
+        for _ in range(3):
+            # Partial windows read the hint without counting towards a re-detection.
+            hints.hint(segment)
+            hinted.append(hints.hint(segment))
+            hints.finished(segment)
+        assert hinted == ["en", "en", "en"]
+        assert hints.hint(segment) is None
+
+        hints.update(segment, Transcript(transcript="hi", language="en", duration=1.0))
+        assert hints.hint(segment) == "en"
+        assert hints.stats().redetections == 1
+
+    def test_disagreeing_redetection(self):
+        """Test that a re-detection of another language drops the hint and is counted."""
+        hints = LanguageHints(LanguageHintsConfig(min_transcripts=2, redetect_every=1))
+        segment = make_segment("mumble", 1.0)
+        for _ in range(2):
+            hints.update(segment, Transcript(transcript="hi", language="en", duration=1.0))
+        hints.finished(segment)
+        assert hints.hint(segment) is None
+
+        hints.update(
+            segment,
+            Transcript(transcript="hallo", language="de", duration=1.0, language_probability=0.95),
+        )
+        assert hints.hint(segment) is None
+        assert hints.stats().disagreements == 1
+
+    def test_uncertain_redetection(self):
+        """Test that an uncertain re-detection keeps the hint without counting a disagreement."""
+        hints = LanguageHints(LanguageHintsConfig(min_transcripts=1, min_probability=0.8, redetect_every=1))
+        segment = make_segment("mumble", 1.0)
+        hints.update(segment, Transcript(transcript="hi", language="en", duration=1.0))
+        hints.finished(segment)
+
+        hints.update(segment, Transcript(transcript="hm", language="de", duration=1.0, language_probability=0.3))
+        assert hints.hint(segment) == "en"
+        assert hints.stats().disagreements == 0
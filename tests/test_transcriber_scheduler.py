@@ -0,0 +1,116 @@
+"""
+Tests for the transcription segment scheduler.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from assistant.components.mumble.mumble import SpeechSegment
+from assistant.components.transcriber.scheduler import SchedulerConfig, SegmentScheduler
+from assistant.config import SPEECH_PIPELINE_SAMPLERATE
+
+
+def make_segment(source: str, seconds: float, **kwargs) -> SpeechSegment:
+    data = np.zeros(int(seconds * SPEECH_PIPELINE_SAMPLERATE), dtype=np.int16)
+    return SpeechSegment(source=source, source_info=None, data=data, **kwargs)
+
+
+@pytest.fixture
+def scheduler():
+    """Create a scheduler without aging so ranking is deterministic."""
+    return SegmentScheduler(SchedulerConfig(aging=0.0))
+
+
+class TestRanking:
+    """Test the order in which segments are handed out."""
+
+    def test_live_before_batch(self, scheduler):
+        """Test that live segments overtake a batch backlog."""
+        batch = [make_segment("watchdog", 5.0) for _ in range(3)]
+        for segment in batch:
+            scheduler.put_nowait(segment)
+        live = make_segment("mumble", 2.0)
+        scheduler.put_nowait(live)
+
+        assert scheduler.get() is live
+
+    def test_shortest_first_within_class(self, scheduler):
+        """Test that shorter segments of the same class run first."""
+        long = make_segment("mumble", 4.0)
+        short = make_segment("mumble", 0.5)
+        scheduler.put_nowait(long)
+        scheduler.put_nowait(short)
+
+        assert scheduler.get() is short
+        assert scheduler.get() is long
+
+    def test_aging_prevents_starvation(self):
+        """Test that an old batch segment wins against a fresh live one."""
+        scheduler = SegmentScheduler(SchedulerConfig(aging=1.0))
+        batch = make_segment("watchdog", 1.0)
+        scheduler.put_nowait(batch)
+
+        # Pretend the batch segment has been waiting for a minute.
+        cost, counter, enqueued_at, segment = scheduler.heap[0]
+        scheduler.heap[0] = (cost - 60.0, counter, enqueued_at, segment)
+
+        scheduler.put_nowait(make_segment("mumble", 1.0))
+        assert scheduler.get() is batch
+
+
+class TestDeadline:
+    """Test dropping of stale live segments."""
+
+    def test_stale_live_segment_dropped(self):
+        """Test that live segments past the deadline are skipped and reported."""
+        dropped = []
+        scheduler = SegmentScheduler(
+            SchedulerConfig(aging=0.0, live_deadline=1.0), on_drop=dropped.append
+        )
+        stale = make_segment("mumble", 0.5, timestamp=datetime.now() - timedelta(seconds=5))
+        fresh = make_segment("mumble", 1.0)
+        scheduler.put_nowait(stale)
+        scheduler.put_nowait(fresh)
+
+        assert scheduler.get() is fresh
+        assert dropped == [stale]
+        assert scheduler.stats().dropped == {"mumble": 1}
+
+    def test_batch_segments_never_dropped(self):
+        """Test that the deadline only applies to live sources."""
+        scheduler = SegmentScheduler(SchedulerConfig(live_deadline=1.0))
+        old = make_segment("watchdog", 0.5, timestamp=datetime.now() - timedelta(hours=1))
+        scheduler.put_nowait(old)
+
+        assert scheduler.get() is old
+
+
+class TestLifecycle:
+    """Test blocking and closing behaviour."""
+
+    def test_close_unblocks_get(self, scheduler):
+        """Test that closing the scheduler releases waiting workers."""
+        results = []
+        worker = threading.Thread(target=lambda: results.append(scheduler.get()))
+        worker.start()
+
+        scheduler.put_nowait(None)
+        worker.join(timeout=1.0)
+
+        assert not worker.is_alive()
+        assert results == [None]
+
+    def test_wait_stats_per_class(self, scheduler):
+        """Test that queue wait time is recorded per source."""
+        scheduler.put_nowait(make_segment("mumble", 0.5))
+        scheduler.put_nowait(make_segment("watchdog", 0.5))
+        scheduler.get()
+        scheduler.get()
+
+        stats = scheduler.stats()
+        assert stats.pending == 0
+        assert stats.wait["mumble"].count == 1
+        assert stats.wait["watchdog"].count == 1
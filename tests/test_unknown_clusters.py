@@ -0,0 +1,128 @@
+"""
+Tests for online clustering and compaction of unknown speakers.
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from assistant.components.voice_id.clusters import (
+    ClusteringConfig,
+    UnknownCluster,
+    UnknownClusters,
+    clusters_from_points,
+    compact,
+    promote_cluster,
+)
+from assistant.components.voice_id.storage import NumpyStore
+
+A = np.array([1.0, 0.0, 0.0])
+A2 = np.array([0.95, 0.1, 0.0])
+B = np.array([0.0, 1.0, 0.0])
+
+
+@pytest.fixture
+def clusters():
+    return UnknownClusters(ClusteringConfig(assign_threshold=0.8, max_points_per_cluster=2))
+
+
+class TestUnknownClusters:
+    """Test assignment, retention and compaction of pseudo-speakers."""
+
+    def test_assign(self, clusters: UnknownClusters):
+        """Test that similar embeddings share a cluster and distinct ones do not."""
+        first, _ = clusters.assign(A)
+        second, _ = clusters.assign(A2)
+        other, _ = clusters.assign(B)
+
+        assert first is second
+        assert first.count == 2
+        assert other is not first
+        assert len(clusters) == 2
+
+    def test_running_mean(self):
+        """Test that the centroid is the normalised mean of its members."""
+        cluster = UnknownCluster(A)
+        cluster.add(B)
+
+        expected = (A + B) / np.linalg.norm(A + B)
+        assert np.allclose(cluster.centroid, expected)
+
+    def test_max_points(self, clusters: UnknownClusters):
+        """Test that raw points stop being kept once a cluster is full."""
+        kept = [clusters.assign(A)[1] for _ in range(4)]
+
+        assert kept == [True, True, False, False]
+
+    def test_compact_merges(self):
+        """Test that close centroids are merged into the bigger cluster."""
+        big = UnknownCluster(A, count=5)
+        small = UnknownCluster(A2, count=1)
+        other = UnknownCluster(B)
+
+        kept = compact([small, other, big], ClusteringConfig(merge_threshold=0.9), now=big.last_seen)
+
+        assert {c.cluster_id for c in kept} == {big.cluster_id, other.cluster_id}
+        assert big.count == 6
+
+    def test_compact_expires(self):
+        """Test that clusters not heard within the TTL are dropped."""
+        old = UnknownCluster(A, last_seen=100.0, first_seen=100.0)
+        fresh = UnknownCluster(B, last_seen=1000.0, first_seen=1000.0)
+
+        kept = compact([old, fresh], ClusteringConfig(ttl=500), now=1100.0)
+
+        assert kept == [fresh]
+
+    def test_clusters_from_points(self):
+        """Test rebuilding clusters from centroids, raw points and legacy points."""
+        centroid = UnknownCluster(A, count=7)
+        points = [
+            SimpleNamespace(id=centroid.cluster_id, vector=A.tolist(), payload=centroid.payload()),
+            SimpleNamespace(id="p1", vector=A.tolist(), payload={"cluster_id": centroid.cluster_id, "kind": "point"}),
+            SimpleNamespace(id="p2", vector=B.tolist(), payload={"cluster_id": "orphan", "kind": "point", "seen": 10.0}),
+            SimpleNamespace(id="p3", vector=B.tolist(), payload={"source": "mumble"}),
+        ]
+
+        rebuilt = {c.cluster_id: c for c in clusters_from_points(points)}
+
+        assert rebuilt[centroid.cluster_id].count == 7
+        assert rebuilt["orphan"].count == 1
+        assert rebuilt["orphan"].last_seen == 10.0
+        assert len(rebuilt) == 3
+        assert [p.id for p in rebuilt[centroid.cluster_id].members] == ["p1"]
+        assert [p.id for c in rebuilt.values() for p in c.members] == ["p1", "p2", "p3"]
+
+    def test_compact_keeps_raw_points(self):
+        """Test that compaction keeps the newest raw points of every cluster, merged ones relabelled."""
+        big = UnknownCluster(A, count=5)
+        small = UnknownCluster(A2, count=1)
+        raw = lambda id, seen: SimpleNamespace(id=id, vector=A.tolist(), payload={"kind": "point", "seen": seen})
+        big.members = [raw("b1", 1.0), raw("b2", 4.0)]
+        small.members = [raw("s1", 3.0), raw("s2", 2.0)]
+
+        config = ClusteringConfig(merge_threshold=0.9, max_points_per_cluster=3)
+        [kept] = compact([small, big], config, now=big.last_seen)
+
+        assert [p.id for p in kept.members] == ["s2", "s1", "b2"]
+        assert kept.points == 3
+        assert {p.payload["cluster_id"] for p in kept.member_points()} == {big.cluster_id}
+
+    def test_promote_raw_points_only(self):
+        """Test that promotion moves the raw points of a cluster but not its centroid."""
+        store = NumpyStore(":memory:")
+        for collection in ("known", "unknown"):
+            store.ensure_collection(collection, 3)
+        cluster = UnknownCluster(A)
+        cluster.members = [
+            SimpleNamespace(id=f"00000000-0000-0000-0000-00000000000{i}", vector=A.tolist(), payload={})
+            for i in range(3)
+        ]
+        store.upsert("unknown", [cluster.point(), *cluster.member_points()])
+
+        promoted = promote_cluster(store, "unknown", "known", cluster.cluster_id, "alice")
+
+        assert len(promoted) == len(cluster.members)
+        assert store.count("known") == 3
+        assert store.count("unknown") == 0
@@ -0,0 +1,107 @@
+"""
+Tests for the VoiceID vector store backends.
+"""
+
+import numpy as np
+import pytest
+from qdrant_client.models import PointStruct
+
+from assistant.components.voice_id.storage import NumpyCollection, NumpyStore, QdrantStore
+
+DIM = 4
+
+
+def point(i: int, vector, speaker: str) -> PointStruct:
+    return PointStruct(id=i, vector=list(vector), payload={"speaker_id": speaker})
+
+
+@pytest.fixture(params=["numpy", "numpy_mmap", "qdrant_local"])
+def store(request, tmp_path):
+    if request.param == "numpy":
+        store = NumpyStore(":memory:")
+    elif request.param == "numpy_mmap":
+        store = NumpyStore(str(tmp_path))
+    else:
+        store = QdrantStore.local(":memory:")
+    store.ensure_collection("speakers", DIM)
+    yield store
+    store.close()
+
+
+class TestVectorStore:
+    """Test the operations VoiceID relies on against every backend."""
+
+    def test_search(self, store):
+        """Test that the closest point is found with its payload and cosine score."""
+        store.upsert("speakers", [point(1, [1, 0, 0, 0], "alice"), point(2, [0, 1, 0, 0], "bob")])
+
+        (matches,) = store.search("speakers", np.array([[0.9, 0.1, 0, 0]], dtype=np.float32), limit=2)
+
+        assert [m.payload["speaker_id"] for m in matches] == ["alice", "bob"]
+        assert matches[0].score == pytest.approx(0.9 / np.hypot(0.9, 0.1), abs=1e-4)
+
+    def test_scroll_match(self, store):
+        """Test that scrolling filters on payload values and returns vectors."""
+        store.upsert("speakers", [point(1, [1, 0, 0, 0], "alice"), point(2, [0, 1, 0, 0], "bob")])
+
+        points = store.scroll("speakers", {"speaker_id": "bob"})
+
+        assert [p.id for p in points] == [2]
+        assert np.allclose(points[0].vector, [0, 1, 0, 0])
+        assert len(store.scroll("speakers")) == 2
+
+    def test_upsert_and_delete(self, store):
+        """Test that upserting an id replaces it and deleted points are gone."""
+        store.upsert("speakers", [point(1, [1, 0, 0, 0], "alice")])
+        store.upsert("speakers", [point(1, [0, 0, 1, 0], "carol"), point(2, [0, 1, 0, 0], "bob")])
+        store.delete("speakers", [2])
+
+        (matches,) = store.search("speakers", np.array([[0, 1, 0, 0]], dtype=np.float32), limit=5)
+
+        assert store.count("speakers") == 1
+        assert [m.payload["speaker_id"] for m in matches] == ["carol"]
+
+    def test_empty(self, store):
+        """Test that searching an empty collection finds nothing."""
+        assert store.search("speakers", np.ones((2, DIM), dtype=np.float32)) == [[], []]
+
+
+class TestNumpyStore:
+    """Test growth and persistence of the memory-mapped store."""
+
+    def test_grow(self):
+        """Test that the matrix grows past its initial capacity."""
+        collection = NumpyCollection(None, DIM, capacity=2)
+        collection.upsert([point(i, np.eye(DIM)[i % DIM] + i, "x") for i in range(5)])
+
+        assert len(collection.rows) == 5
+        assert len(collection.vectors) >= 5
+
+    def test_reopen(self, tmp_path):
+        """Test that points, deletions and grown matrices survive a restart."""
+        collection = NumpyCollection(str(tmp_path), DIM, capacity=2)
+        collection.upsert([point(i, np.eye(DIM)[i % DIM], f"s{i}") for i in range(4)])
+        collection.delete([0])
+        collection.close()
+
+        reopened = NumpyCollection(str(tmp_path), DIM, capacity=2)
+        (matches,) = reopened.search(np.array([[0, 0, 0, 1]], dtype=np.float32), limit=1)
+
+        assert sorted(reopened.rows) == [1, 2, 3]
+        assert matches[0].payload == {"speaker_id": "s3"}
+        reopened.upsert([point(9, [1, 0, 0, 0], "s9")])
+        assert len(reopened.rows) == 4
+
+    def test_snapshot(self, tmp_path):
+        """Test that a compacted log keeps the live points and later appends."""
+        collection = NumpyCollection(str(tmp_path), DIM)
+        for _ in range(600):
+            collection.upsert([point(1, [1, 0, 0, 0], "s1")])
+            collection.delete([1])
+        collection.upsert([point(2, [0, 1, 0, 0], "s2"), point(3, [0, 0, 1, 0], "s3")])
+        collection.delete([3])
+        collection.close()
+
+        with open(tmp_path / "points.jsonl") as f:
+            assert len(f.readlines()) < 1203
+        assert sorted(NumpyCollection(str(tmp_path), DIM).rows) == [2]
@@ -0,0 +1,87 @@
+"""
+Tests for bulk enrollment and identification in the void tool.
+"""
+
+import csv
+import json
+
+import numpy as np
+import pytest
+import soundfile as sf
+import torch
+from click.testing import CliRunner
+
+import tools.void as void
+from assistant.components.voice_id.storage import NumpyStore
+
+
+class LevelModel(torch.nn.Module):
+    """Toy embedding model that embeds a waveform by its mean level."""
+
+    def forward(self, waveforms: torch.Tensor, weights: torch.Tensor = None) -> torch.Tensor:
+        samples = waveforms[:, 0, :]
+        if weights is None:
+            weights = torch.ones_like(samples)
+        level = (samples.abs() * weights).sum(dim=1) / weights.sum(dim=1)
+        embedding = torch.zeros(len(samples), 512)
+        embedding[:, 0] = level
+        embedding[:, 1] = 1.0 - level
+        return embedding
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(void, "embedding_model", lambda hf_token=None: LevelModel())
+    return str(tmp_path / "store")
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "audio"
+    folder.mkdir()
+    for i, level in enumerate([0.1, 0.2]):
+        # Stereo at another rate with a silent channel, decoding downmixes and resamples it.
+        audio = np.zeros((8000, 2), dtype=np.float32)
+        audio[:, 0] = level
+        sf.write(folder / f"{i}.wav", audio, 8000)
+    return folder
+
+
+def run(*args):
+    result = CliRunner().invoke(void.cli, [*args, "--storage", "numpy", "--workers", "1"])
+    assert result.exit_code == 0, result.output
+    return result
+
+
+class TestEnroll:
+    """Test resumable bulk enrollment and its per-file results."""
+
+    def test_resume_skips_enrolled(self, folder, store_path, tmp_path):
+        """Test that a second run skips files whose content is enrolled already."""
+        first, second = tmp_path / "first.json", tmp_path / "second.csv"
+        run("enroll", str(folder), "-s", "alice", "--path", store_path, "-o", str(first))
+        run("enroll", str(folder), "-s", "alice", "--path", store_path, "-o", str(second))
+
+        rows = json.loads(first.read_text())
+        assert [r["status"] for r in rows] == ["enrolled", "enrolled"]
+        with open(second, newline="") as f:
+            resumed = list(csv.DictReader(f))
+        assert [r["status"] for r in resumed] == ["skipped", "skipped"]
+        assert [r["sha256"] for r in resumed] == [r["sha256"] for r in rows]
+
+        store = NumpyStore(store_path)
+        store.ensure_collection("speaker_embeddings", 512)
+        assert store.count("speaker_embeddings") == 2
+        store.close()
+
+    def test_single_file_matches_bulk(self, folder, store_path):
+        """Test that a single file is preprocessed like bulk enrollment and finds its own embedding."""
+        run("enroll", str(folder), "-s", "alice", "--path", store_path)
+
+        store = NumpyStore(store_path)
+        recognizer = void.SpeakerRecognizer(store)
+        speaker_id, confidence = recognizer.identify_speaker(str(folder / "0.wav"))
+        store.close()
+
+        assert speaker_id == "alice"
+        assert confidence == pytest.approx(1.0, abs=1e-4)
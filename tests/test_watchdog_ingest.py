@@ -0,0 +1,97 @@
+"""
+Tests for parallel Watchdog file ingestion in worker processes.
+"""
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from assistant.components.watchdog.ingest import FileIngestor, IngestConfig, IngestResult, decode_audio
+
+
+@pytest.fixture
+def emitted():
+    return {"speech": [], "done": []}
+
+
+@pytest.fixture
+def ingestor(emitted):
+    ingestor = FileIngestor(
+        lambda file, speech: emitted["speech"].append((file, int(speech[0]))),
+        lambda result: emitted["done"].append(result.file),
+        IngestConfig(workers=2),
+    )
+    yield ingestor
+    ingestor.close()
+
+
+class TestDecode:
+    """Test decoding files into pipeline audio."""
+
+    def test_downmix_and_resample(self, tmp_path):
+        """Test that a stereo 44.1 kHz file becomes 16 kHz mono int16."""
+        path = str(tmp_path / "stereo.wav")
+        t = np.arange(44100) / 44100
+        tone = 0.5 * np.sin(2 * np.pi * 440 * t)
+        sf.write(path, np.stack([tone, tone], axis=1), 44100)
+
+        audio = decode_audio(path)
+
+        assert audio.dtype == np.int16 and audio.ndim == 1
+        assert abs(len(audio) - 16000) <= 1
+        assert 0.4 < np.abs(audio).max() / np.iinfo(np.int16).max < 0.6
+
+
+class TestFileOrder:
+    """Test that segments are emitted in file order however the workers interleave."""
+
+    def test_held_until_earlier_files_done(self, ingestor, emitted):
+        """Test that the oldest file streams at once and later files wait for it."""
+        ingestor.files = {0: "a", 1: "b", 2: "c"}
+        ingestor.submitted = 3
+        speech = lambda value: np.full(4, value, dtype=np.int16)
+
+        ingestor._receive(1, "speech", speech(10))
+        ingestor._receive(0, "speech", speech(0))
+        assert emitted["speech"] == [("a", 0)]
+
+        ingestor._receive(2, "speech", speech(20))
+        ingestor._receive(1, "end", None)
+        ingestor._receive(1, "result", IngestResult(file="b"))
+        ingestor._receive(0, "result", IngestResult(file="a"))
+        ingestor._receive(0, "speech", speech(1))
+        assert emitted["speech"] == [("a", 0), ("a", 1)]
+
+        ingestor._receive(0, "end", None)
+        assert emitted["speech"] == [("a", 0), ("a", 1), ("b", 10), ("c", 20)]
+        assert emitted["done"] == ["a", "b"]
+
+        ingestor._receive(2, "result", IngestResult(file="c"))
+        ingestor._receive(2, "end", None)
+        assert emitted["done"] == ["a", "b", "c"]
+        assert ingestor.wait(1)
+
+
+class TestProcessIngestion:
+    """Test ingesting real files on the process pool."""
+
+    def test_files_in_order(self, tmp_path):
+        """Test that every file is reported in submission order, failures included."""
+        results = []
+        ingestor = FileIngestor(lambda file, speech: None, results.append, IngestConfig(workers=2))
+        files = []
+        for i, seconds in enumerate([2.0, 0.5, 1.0]):
+            path = str(tmp_path / f"{i}.wav")
+            sf.write(path, np.zeros(int(16000 * seconds), dtype=np.float32), 16000)
+            files.append(path)
+        broken = tmp_path / "broken.wav"
+        broken.write_bytes(b"not audio")
+        files.insert(1, str(broken))
+
+        for path in files:
+            ingestor.submit(path)
+        ingestor.close()
+
+        assert [r.file for r in results] == files
+        assert [r.seconds for r in results] == [2.0, 0.0, 0.5, 1.0]
+        assert results[1].error is not None and all(r.error is None for r in results[:1] + results[2:])
@@ -0,0 +1,132 @@
+"""
+Tests for the write-behind buffer of VoiceID enrollments.
+"""
+
+import threading
+
+import pytest
+from qdrant_client.models import PointStruct
+
+from assistant.components.voice_id.writer import WriteBehindConfig, WriteBehindWriter
+
+
+class FakeClient:
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.batches = []
+        self.written = threading.Event()
+
+    def upsert(self, collection, points):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("unavailable")
+        self.batches.append((collection, [p.id for p in points]))
+        self.written.set()
+
+
+def point(i: int) -> PointStruct:
+    return PointStruct(id=i, vector=[1.0, 0.0], payload={})
+
+
+def config(**kwargs) -> WriteBehindConfig:
+    defaults = dict(flush_interval=60.0, retry_backoff=0.01, max_backoff=0.01)
+    return WriteBehindConfig(**{**defaults, **kwargs})
+
+
+class TestWriteBehindWriter:
+    """Test batching, coalescing, retries and bounded memory."""
+
+    def test_flush_on_size(self):
+        """Test that a full batch is written without waiting for the interval."""
+        client = FakeClient()
+        writer = WriteBehindWriter(client, config(max_batch_size=3))
+
+        for i in range(3):
+            writer.put("known", point(i))
+
+        assert client.written.wait(2.0)
+        assert client.batches == [("known", [0, 1, 2])]
+        writer.close()
+
+    def test_flush_on_close(self):
+        """Test that pending points are written on close."""
+        client = FakeClient()
+        writer = WriteBehindWriter(client, config())
+        writer.put("known", point(1))
+        writer.put("unknown", point(2))
+
+        writer.close()
+
+        assert sorted(client.batches) == [("known", [1]), ("unknown", [2])]
+        assert writer.get_stats().written == 2
+
+    def test_coalesce(self):
+        """Test that a point upserted twice before a flush is written once."""
+        client = FakeClient()
+        writer = WriteBehindWriter(client, config())
+        writer.put("unknown", point(1))
+        writer.put("unknown", point(2))
+        writer.put("unknown", point(1))
+
+        assert writer.flush()
+        assert client.batches == [("unknown", [2, 1])]
+        writer.close()
+
+    def test_retry(self):
+        """Test that a failed batch is kept and written by a later flush."""
+        client = FakeClient(failures=1)
+        writer = WriteBehindWriter(client, config())
+        writer.put("known", point(1))
+
+        assert not writer.flush()
+        assert writer.get_stats().pending == 1
+        assert writer.flush()
+        assert client.batches == [("known", [1])]
+        assert writer.get_stats().failed_flushes == 1
+        writer.close()
+
+    def test_bounded(self):
+        """Test that the oldest points are dropped beyond `max_pending`."""
+        client = FakeClient()
+        writer = WriteBehindWriter(client, config(max_pending=2))
+        for i in range(4):
+            writer.put("known", point(i))
+
+        assert writer.get_stats().dropped == 2
+        writer.close()
+        assert client.batches == [("known", [2, 3])]
+
+    @pytest.mark.parametrize("failures", [10])
+    def test_close_gives_up(self, failures):
+        """Test that close drops what cannot be written instead of blocking."""
+        writer = WriteBehindWriter(FakeClient(failures=failures), config(close_retries=2))
+        writer.put("known", point(1))
+
+        writer.close()
+
+        assert writer.get_stats().pending == 0
+        assert writer.get_stats().dropped == 1
+
+    def test_disabled(self):
+        """Test that a disabled writer upserts synchronously."""
+        client = FakeClient()
+        writer = WriteBehindWriter(client, WriteBehindConfig(enabled=False))
+        writer.put("known", point(1))
+
+        assert client.batches == [("known", [1])]
+        writer.close()
+
+    def test_concurrent_stats(self):
+        """Test that counters stay exact when many threads write at once."""
+        writer = WriteBehindWriter(FakeClient(), WriteBehindConfig(enabled=False))
+        threads = [
+            threading.Thread(target=lambda t=t: [writer.put("known", point(t * 1000 + i)) for i in range(200)])
+            for t in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert writer.get_stats().written == 1600
+        writer.close()
@@ -0,0 +1,493 @@
+"""Benchmarks for the assistant pipeline, run from the repository root with `python -m tools.bench`."""
+
+import time
+
+import click
+import numpy as np
+import resampy
+import soundfile as sf
+
+from assistant.config import SPEECH_PIPELINE_SAMPLERATE
+from assistant.core.config_manager import ConfigManager
+
+
+def load_audio(path: str) -> np.ndarray:
+    data, samplerate = sf.read(path, dtype="float32")
+    if len(data.shape) > 1:
+        data = data.mean(axis=1)
+    if samplerate != SPEECH_PIPELINE_SAMPLERATE:
+        data = resampy.resample(data, samplerate, SPEECH_PIPELINE_SAMPLERATE)
+    return (data * np.iinfo(np.int16).max).astype(np.int16)
+
+
+@click.group()
+def cli():
+    """Micro-benchmarks for pipeline components."""
+    pass
+
+
+@cli.command()
+@click.argument("files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--backend", "-b", "backends", multiple=True, default=["whisperx", "faster_whisper"])
+@click.option("--repeat", "-r", default=3, help="Runs per file")
+@click.option("--config", "config_path", default="config.yaml", help="Assistant configuration")
+def transcriber_rtf(files, backends, repeat, config_path):
+    """Real-time factor of transcription backends (lower is faster)."""
+    from assistant.components.transcriber.backends import create_backend
+    from assistant.components.transcriber.types import TranscriptionOptions
+
+    config = ConfigManager(config_path).get_plugin_config("transcriber")
+    audio = [load_audio(f) for f in files]
+    audio_seconds = sum(len(a) for a in audio) / SPEECH_PIPELINE_SAMPLERATE
+    click.echo(f"{len(files)} files, {audio_seconds:.1f}s of audio, {repeat} runs each")
+
+    for name in backends:
+        backend_config = config.get(name, {})
+        backend = create_backend(name, backend_config)
+        options = TranscriptionOptions(
+            model=backend_config.get("model", "small"),
+            diarize=backend_config.get("diarize", False),
+            align_words=backend_config.get("align", False),
+        )
+
+        started = time.perf_counter()
+        backend.load()
+        loaded = time.perf_counter()
+        backend.warmup()
+        warmed = time.perf_counter()
+
+        elapsed = []
+        for data in audio:
+            for _ in range(repeat):
+                t = time.perf_counter()
+                backend.transcribe(data, options)
+                elapsed.append(time.perf_counter() - t)
+
+        rtf = sum(elapsed) / (audio_seconds * repeat)
+        click.echo(
+            f"{name:>16}: load {loaded - started:.2f}s, warm-up {warmed - loaded:.2f}s, "
+            f"RTF {rtf:.3f}, p50 {np.percentile(elapsed, 50):.3f}s per file"
+        )
+
+
+@cli.command()
+@click.option("--size", "-n", "sizes", multiple=True, type=int, default=[10, 1000, 100000])
+@click.option("--queries", "-q", default=200, help="Queries per size")
+@click.option("--dim", default=512, help="Embedding size")
+@click.option("--store", "-s", "stores", multiple=True, default=["numpy", "qdrant_local", "qdrant"])
+@click.option("--host", default="localhost", help="Qdrant server host")
+@click.option("--port", default=6334, help="Qdrant server gRPC port")
+@click.option("--skip-qdrant", is_flag=True, help="Skip the Qdrant server")
+def speaker_index(sizes, queries, dim, stores, host, port, skip_qdrant):
+    """Top-1 speaker lookup latency, local index against the vector stores."""
+    from qdrant_client.models import PointStruct
+
+    from assistant.components.voice_id.index import SpeakerIndex
+    from assistant.components.voice_id.storage import StorageConfig, create_store
+
+    rng = np.random.default_rng(0)
+    stores = [name for name in stores if not (skip_qdrant and name == "qdrant")]
+
+    def report(size, name, elapsed):
+        click.echo(
+            f"{size:>8} {name:<12}: p50 {np.percentile(elapsed, 50) * 1e6:9.1f}us, "
+            f"p95 {np.percentile(elapsed, 95) * 1e6:9.1f}us"
+        )
+
+    for size in sizes:
+        vectors = rng.standard_normal((size, dim)).astype(np.float32)
+        labels = [f"speaker-{i % 1000}" for i in range(size)]
+        probes = rng.standard_normal((queries, dim)).astype(np.float32)
+
+        index = SpeakerIndex(dim)
+        index.add_many([str(i) for i in range(size)], vectors, labels)
+        elapsed = []
+        for probe in probes:
+            t = time.perf_counter()
+            index.search(probe, k=1)
+            elapsed.append(time.perf_counter() - t)
+        report(size, "local index", elapsed)
+
+        for name in stores:
+            store = create_store(StorageConfig(backend=name, host=host, port=port, path=":memory:"))
+            collection = f"bench_speaker_index_{size}"
+            store.ensure_collection(collection, dim)
+            for start in range(0, size, 1000):
+                store.upsert(
+                    collection,
+                    [
+                        PointStruct(id=i, vector=vectors[i].tolist(), payload={"speaker_id": labels[i]})
+                        for i in range(start, min(start + 1000, size))
+                    ],
+                )
+
+            elapsed = []
+            for probe in probes:
+                t = time.perf_counter()
+                store.search(collection, probe[None, :], limit=1)
+                elapsed.append(time.perf_counter() - t)
+            if name == "qdrant":
+                store.client.delete_collection(collection)
+            store.close()
+            report(size, name, elapsed)
+
+
+@cli.command()
+@click.option("--streams", "-n", "counts", multiple=True, type=int, default=[1, 10, 100])
+def vad_streams(counts):
+    """Startup time and RSS of VAD streams, one Silero session each against the shared session."""
+    from pysilero_vad import SileroVoiceActivityDetector
+
+    from assistant.utils.audio.vad import SileroStream
+    from assistant.utils.models import rss_bytes
+
+    chunk = np.zeros(SileroVoiceActivityDetector.chunk_samples(), dtype=np.int16).tobytes()
+    for count in counts:
+        for name, factory in [("own session", SileroVoiceActivityDetector), ("shared", SileroStream)]:
+            rss = rss_bytes()
+            started = time.perf_counter()
+            streams = [factory() for _ in range(count)]
+            for stream in streams:
+                stream(chunk)
+            elapsed = time.perf_counter() - started
+            click.echo(
+                f"{count:>5} {name:<12}: startup {elapsed * 1e3:8.1f}ms, +{(rss_bytes() - rss) / 2**20:7.1f} MiB RSS"
+            )
+            del streams
+
+
+@cli.command()
+@click.argument("files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--workers", "-w", "worker_counts", multiple=True, type=int, default=[1, 2, 4, 8])
+def watchdog_ingest(files, worker_counts):
+    """Audio-hours ingested per wall-hour, serial in one thread against the process pool."""
+    from assistant.components.watchdog.ingest import FileIngestor, IngestConfig, detect_speech
+
+    files = list(files)
+    started = time.perf_counter()
+    results = [detect_speech(file, lambda speech: None) for file in files]
+    elapsed = time.perf_counter() - started
+    audio = sum(result.seconds for result in results)
+    segments = sum(result.segments for result in results)
+    click.echo(f"{len(files)} files, {audio / 3600:.2f} audio-hours, {segments} segments")
+    click.echo(f"serial    : {audio / elapsed:8.1f} audio-hours/wall-hour, {elapsed:.1f}s")
+
+    for workers in worker_counts:
+        ingestor = FileIngestor(lambda file, speech: None, config=IngestConfig(workers=workers))
+        # NOTE: Workers are spawned and load Silero on their first file, warm them up outside the timing.
+        for future in [ingestor.submit(file) for file in files[:workers]]:
+            future.result()
+        ingestor.wait()
+
+        started = time.perf_counter()
+        for file in files:
+            ingestor.submit(file)
+        ingestor.wait()
+        elapsed = time.perf_counter() - started
+        ingestor.close()
+        click.echo(f"{workers:>2} workers: {audio / elapsed:8.1f} audio-hours/wall-hour, {elapsed:.1f}s")
+
+
+def _ingest_profile(path: str, streaming: bool) -> dict:
+    """Ingest one file through VAD and report peak RSS, runs in a fresh process."""
+    import resource
+
+    from assistant.config import SPEECH_PIPELINE_BUFFER_SIZE_MILIS
+    from assistant.components.watchdog.ingest import detect_speech, to_int16
+    from assistant.utils.audio import VadFilter, chop_audio
+    from assistant.utils.models import rss_bytes
+
+    baseline = rss_bytes()
+    started = time.perf_counter()
+    first_segment = []
+
+    def on_speech(speech):
+        if not first_segment:
+            first_segment.append(time.perf_counter() - started)
+
+    if streaming:
+        segments = detect_speech(path, on_speech).segments
+    else:
+        # The previous whole-file path: float64 read, downmix, one resample call.
+        data, samplerate = sf.read(path)
+        if data.ndim > 1:
+            data = data.mean(axis=1)
+        audio = to_int16(resampy.resample(data, samplerate, SPEECH_PIPELINE_SAMPLERATE))
+        vad_filter = VadFilter(on_speech)
+        for chunk in chop_audio(audio, SPEECH_PIPELINE_SAMPLERATE, SPEECH_PIPELINE_BUFFER_SIZE_MILIS):
+            vad_filter(chunk)
+        segments = None
+
+    return {
+        "baseline": baseline,
+        "peak": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "elapsed": time.perf_counter() - started,
+        "first_segment": first_segment[0] if first_segment else None,
+        "segments": segments,
+    }
+
+
+@cli.command()
+@click.option("--file", "path", default=None, type=click.Path(exists=True, dir_okay=False), help="Recording to ingest")
+@click.option("--hours", default=2.0, help="Length of the synthetic recording written without --file")
+@click.option("--samplerate", default=44100, help="Sample rate of the synthetic recording")
+@click.option("--full/--no-full", default=False, help="Also read the file whole, needs RAM for it as float64")
+def watchdog_memory(path, hours, samplerate, full):
+    """Peak RSS ingesting one long file, block-wise streaming against reading it whole."""
+    import multiprocessing
+    import os
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    with tempfile.TemporaryDirectory() as folder:
+        if path is None:
+            path = os.path.join(folder, "long.wav")
+            rng = np.random.default_rng(0)
+            with sf.SoundFile(path, "w", samplerate=samplerate, channels=2, subtype="PCM_16") as f:
+                for _ in range(int(hours * 360)):
+                    f.write((0.05 * rng.standard_normal((samplerate * 10, 2))).astype(np.float32))
+
+        info = sf.info(path)
+        click.echo(
+            f"{info.duration / 3600:.2f}h, {info.samplerate} Hz, {info.channels} channels, "
+            f"{os.path.getsize(path) / 2**20:.0f} MiB on disk"
+        )
+        for streaming in [True] + ([False] if full else []):
+            # NOTE: One fresh process per run, so peak RSS is not carried over between them.
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                profile = pool.submit(_ingest_profile, path, streaming).result()
+            first = profile["first_segment"]
+            click.echo(
+                f"{'streaming' if streaming else 'whole file':<10}: peak {profile['peak'] / 2**20:7.0f} MiB "
+                f"(+{(profile['peak'] - profile['baseline']) / 2**20:.0f} MiB over imports), "
+                f"{profile['elapsed']:.1f}s, first segment "
+                + (f"after {first:.2f}s" if first is not None else "none (no speech found)")
+            )
+
+
+SAMPLE_TRANSCRIPTS = [
+    "so I was thinking we could move the meeting to Thursday",
+    "uh yeah",
+    "the build server is down again since this morning",
+    "can you remind me to call Anna at five",
+    "mm-hmm",
+    "I think the issue is in the audio resampler",
+    "what was the name of that restaurant we went to last week",
+    "okay okay",
+]
+
+
+@cli.command()
+@click.option("--transcripts", "-n", default=32, help="Number of transcripts")
+@click.option("--batch-size", "-b", "batch_sizes", multiple=True, type=int, default=[1, 4, 8, 16])
+@click.option("--config", "config_path", default="config.yaml", help="Assistant configuration")
+def shadow_decisions(transcripts, batch_sizes, config_path):
+    """Shadow decisions per second, one prompt per transcript against batched prompts."""
+    from assistant.components.shadow.main import Shadow
+    from assistant.components.transcriber.types import Transcript
+
+    shadow = Shadow(config=ConfigManager(config_path))
+    shadow.initialize()
+    shadow.ready.wait()
+    items = [
+        Transcript(transcript=SAMPLE_TRANSCRIPTS[i % len(SAMPLE_TRANSCRIPTS)], language="en", duration=2.0)
+        for i in range(transcripts)
+    ]
+    conversation = shadow.conversation("bench")
+    # Warm the model up so the first configuration does not pay for loading it.
+    shadow.decide(items[0], conversation)
+
+    for batch_size in batch_sizes:
+        started = time.perf_counter()
+        for i in range(0, len(items), batch_size):
+            batch = items[i : i + batch_size]
+            if len(batch) == 1:
+                shadow.decide(batch[0], conversation)
+            else:
+                shadow.decide_batch(batch, conversation)
+        elapsed = time.perf_counter() - started
+        click.echo(f"batch {batch_size:>3}: {len(items) / elapsed:6.2f} decisions/s, {elapsed:.1f}s total")
+
+    shadow.shutdown()
+
+
+@cli.command()
+@click.option("--config", "config_path", default="config.yaml", help="Assistant configuration")
+def time_to_ready(config_path):
+    """Startup of the Ollama backed components, background provisioning against blocking checks."""
+    from assistant.components.memory.main import Memory
+    from assistant.components.shadow.main import Shadow
+    from assistant.utils.provisioning import provisioner
+    from assistant.utils.utils import ensure_model_exists
+
+    config = ConfigManager(config_path)
+    components = [Shadow(config=config), Memory(config=config)]
+
+    started = time.perf_counter()
+    for component in components:
+        component.initialize()
+    initialized = time.perf_counter() - started
+    for component in components:
+        component.ready.wait()
+    ready = time.perf_counter() - started
+    click.echo(f"background: initialized in {initialized:.3f}s, ready in {ready:.3f}s")
+    for component in components:
+        click.echo(f"  {component.name:>8}: ready {component.model_status().time_to_ready:.3f}s after initialization")
+
+    # NOTE: The models are on the server by now, this is the floor of the old blocking path.
+    provisioner.invalidate()
+    started = time.perf_counter()
+    for component in components:
+        ensure_model_exists(component.get_config("url", "http://localhost:11434"), component.model)
+    click.echo(f"blocking:   initialized in {time.perf_counter() - started:.3f}s (models already pulled)")
+
+    for component in components:
+        component.shutdown()
+
+
+@cli.command()
+@click.option("--size", "-n", "sizes", multiple=True, type=int, default=[1000, 10000, 100000])
+@click.option("--queries", "-q", default=200, help="Queries per size")
+@click.option("--dim", default=768, help="Embedding size")
+def memory_search(sizes, queries, dim):
+    """Top-10 memory retrieval latency and recall, unfiltered and with filters."""
+    from assistant.components.memory.index import MemoryIndex, MemoryRecord, normalize
+
+    rng = np.random.default_rng(0)
+    # NOTE: Real embeddings are clustered, uniform noise would make any IVF index look bad.
+    centers = rng.standard_normal((500, dim)).astype(np.float32)
+
+    def sample(count):
+        noise = 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+        return centers[rng.integers(0, len(centers), count)] + noise
+
+    for size in sizes:
+        vectors = sample(size)
+        index = MemoryIndex(None)
+        started = time.perf_counter()
+        for start in range(0, size, 5000):
+            end = min(size, start + 5000)
+            index.add_many(
+                vectors[start:end],
+                [
+                    MemoryRecord(id=str(i), summary="", entities=[f"entity-{i % 300}"], topics=[f"topic-{i % 20}"])
+                    for i in range(start, end)
+                ],
+            )
+        built = time.perf_counter() - started
+
+        probes = sample(queries)
+        units = normalize(vectors)
+        for name, filters in [("all", {}), ("topic", {"topics": ["topic-3"]}), ("entity", {"entities": ["entity-7"]})]:
+            elapsed = []
+            for probe in probes:
+                t = time.perf_counter()
+                index.search(probe, k=10, **filters)
+                elapsed.append(time.perf_counter() - t)
+            click.echo(
+                f"{size:>8} {name:<7}: p50 {np.percentile(elapsed, 50) * 1e3:6.2f}ms, "
+                f"p95 {np.percentile(elapsed, 95) * 1e3:6.2f}ms"
+            )
+
+        found = 0
+        for probe in probes[:50]:
+            exact = set(np.argsort(-(units @ normalize(probe)))[:10].tolist())
+            found += len(exact & {int(h.memory.id) for h in index.search(probe, k=10)})
+        click.echo(f"{size:>8} recall@10 {found / 500:.3f}, built in {built:.1f}s")
+
+
+def load_embedding_model(hf_token):
+    import torch
+
+    from assistant.components.voice_id.export import embedding_model
+
+    return embedding_model(hf_token), torch
+
+
+def synthetic_segments(count: int, min_seconds: float, max_seconds: float) -> list:
+    rng = np.random.default_rng(0)
+    lengths = rng.uniform(min_seconds, max_seconds, count) * SPEECH_PIPELINE_SAMPLERATE
+    return [(0.1 * rng.standard_normal(int(n))).astype(np.float32) for n in lengths]
+
+
+@cli.command()
+@click.option("--segments", "-n", default=64, help="Number of synthetic segments")
+@click.option("--min-seconds", default=0.5)
+@click.option("--max-seconds", default=4.0)
+@click.option("--concurrency", "-c", default=8, help="Threads submitting segments")
+@click.option("--torch-threads", default=None, type=int)
+@click.option("--batch-size", default=16)
+@click.option("--hf-token", help="HuggingFace token for model access")
+def speaker_embeddings(segments, min_seconds, max_seconds, concurrency, torch_threads, batch_size, hf_token):
+    """Embeddings/s on CPU, per-segment forward passes against the batching worker."""
+    from concurrent.futures import ThreadPoolExecutor
+
+    from assistant.components.voice_id.batching import BatchingConfig, EmbeddingBatcher
+
+    model, torch = load_embedding_model(hf_token)
+    waveforms = synthetic_segments(segments, min_seconds, max_seconds)
+    audio_seconds = sum(len(w) for w in waveforms) / SPEECH_PIPELINE_SAMPLERATE
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+
+    def per_segment(waveform):
+        with torch.no_grad():
+            return model(torch.from_numpy(waveform).unsqueeze(0)).numpy()
+
+    batcher = EmbeddingBatcher(model, "cpu", BatchingConfig(max_batch_size=batch_size, torch_threads=torch_threads))
+
+    for name, fn in [("per-segment", per_segment), ("batched", batcher.embed)]:
+        fn(waveforms[0])
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(fn, waveforms))
+        elapsed = time.perf_counter() - started
+        click.echo(f"{name:>12}: {segments / elapsed:7.1f} embeddings/s, {audio_seconds / elapsed:7.1f} audio-s/s")
+
+    batcher.close()
+
+
+@cli.command()
+@click.option("--backend", "-b", "backends", multiple=True, default=["eager", "torchscript", "onnx"])
+@click.option("--quantize/--no-quantize", default=None, help="Only run with or without quantisation")
+@click.option("--segments", "-n", default=32, help="Number of synthetic segments")
+@click.option("--min-seconds", default=0.5)
+@click.option("--max-seconds", default=8.0)
+@click.option("--threads", default=None, type=int, help="Intra-op threads")
+@click.option("--cache-dir", default="./.cache/voice_id")
+@click.option("--hf-token", help="HuggingFace token for model access")
+def speaker_export(backends, quantize, segments, min_seconds, max_seconds, threads, cache_dir, hf_token):
+    """Exported embedding models: cosine to eager embeddings and latency per second of audio."""
+    from assistant.components.voice_id.export import InferenceConfig, cosine, load_inference_model
+
+    model, torch = load_embedding_model(hf_token)
+    waveforms = [torch.from_numpy(w).reshape(1, 1, -1) for w in synthetic_segments(segments, min_seconds, max_seconds)]
+    audio_seconds = sum(w.shape[-1] for w in waveforms) / SPEECH_PIPELINE_SAMPLERATE
+
+    with torch.no_grad():
+        reference = np.concatenate([model(w).numpy() for w in waveforms])
+
+    variants = [False, True] if quantize is None else [quantize]
+    for backend in backends:
+        for quantized in variants:
+            config = InferenceConfig(backend=backend, quantize=quantized, intra_op_threads=threads, cache_dir=cache_dir)
+            started = time.perf_counter()
+            exported = load_inference_model(model, config, "cpu")
+            loaded = time.perf_counter() - started
+
+            with torch.no_grad():
+                exported(waveforms[0])
+                started = time.perf_counter()
+                embeddings = np.concatenate([exported(w).numpy() for w in waveforms])
+                elapsed = time.perf_counter() - started
+
+            similarity = cosine(reference, embeddings)
+            name = f"{backend}{'+int8' if quantized else ''}"
+            click.echo(
+                f"{name:>16}: load {loaded:6.2f}s, {elapsed / audio_seconds * 1e3:6.2f}ms per audio-s, "
+                f"cosine min {similarity.min():.5f} mean {similarity.mean():.5f}"
+            )
+
+
+if __name__ == "__main__":
+    cli()
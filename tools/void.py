@@ -1,21 +1,144 @@
+import csv
+import hashlib
+import json
+import multiprocessing
 import os
+import time
 import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterator, List, NamedTuple, Optional, Set
 import click
 import numpy as np
+import resampy
 import soundfile as sf
 import torch
-from pyannote.audio import Model
-from qdrant_client import QdrantClient
-from qdrant_client.models import (
-    Distance,
-    VectorParams,
-    PointStruct,
-)
+from qdrant_client.models import PointStruct
+
+from assistant.config import SPEECH_PIPELINE_SAMPLERATE
+from assistant.components.voice_id.batching import bucket_by_length, pad_batch
+from assistant.components.voice_id.clusters import clusters_from_points, promote_cluster
+from assistant.components.voice_id.export import embedding_model
+from assistant.components.voice_id.storage import StorageConfig, VectorStore, create_store
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.flac')
+
+
+class DecodedFile(NamedTuple):
+    path: str
+    sha256: str
+    waveform: Optional[np.ndarray] = None
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+_skip_hashes: Set[str] = set()
+
+
+def _init_decoder(skip_hashes: Set[str]) -> None:
+    global _skip_hashes
+    _skip_hashes = skip_hashes
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def decode_file(path: str) -> DecodedFile:
+    """Hash, decode, downmix and resample one file, runs in a worker process."""
+    sha256 = file_sha256(path)
+    if sha256 in _skip_hashes:
+        return DecodedFile(path, sha256)
+
+    try:
+        data, samplerate = sf.read(path, dtype='float32')
+        if len(data.shape) > 1:
+            data = data.mean(axis=1)
+        if samplerate != SPEECH_PIPELINE_SAMPLERATE:
+            data = resampy.resample(data, samplerate, SPEECH_PIPELINE_SAMPLERATE)
+        return DecodedFile(path, sha256, data.astype(np.float32), len(data) / SPEECH_PIPELINE_SAMPLERATE)
+    except Exception as e:
+        return DecodedFile(path, sha256, error=str(e))
+
+
+def decode_files(paths: List[str], workers: int, skip_hashes: Set[str] = frozenset()) -> Iterator[DecodedFile]:
+    """Decode files in a process pool, in order, with a bounded number of decoded files in memory."""
+    # NOTE: The embedding model is loaded already, forking after torch started its threads can deadlock.
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_decoder,
+        initargs=(set(skip_hashes),),
+    ) as pool:
+        pending = deque()
+        for path in paths:
+            pending.append(pool.submit(decode_file, path))
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def batched(items: Iterator, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def list_audio_files(folder: str) -> List[str]:
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.endswith(AUDIO_EXTENSIONS))
+
+
+def write_results(rows: List[dict], output: str) -> None:
+    if output.endswith('.csv'):
+        with open(output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()) if rows else [])
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(output, 'w') as f:
+            json.dump(rows, f, indent=2)
+    click.echo(f"Results written to {output}")
+
+
+def open_store(storage: str, host: str, port: int, path: str) -> VectorStore:
+    return create_store(StorageConfig(backend=storage.replace('-', '_'), host=host, port=port, path=path))
+
+
+def storage_options(command):
+    """Vector store selection shared by every command."""
+    command = click.option('--path', default='./.storage/voice_id', help='Directory of an embedded store')(command)
+    command = click.option(
+        '--storage',
+        type=click.Choice(['qdrant', 'qdrant-local', 'numpy']),
+        default='qdrant',
+        help='Qdrant server, embedded Qdrant or numpy store',
+    )(command)
+    command = click.option('--port', default=6334, help='Qdrant server gRPC port')(command)
+    command = click.option('--host', default='localhost', help='Qdrant server host')(command)
+    return command
+
+
+def report_throughput(files: int, seconds: float, elapsed: float) -> None:
+    click.echo(
+        f"Throughput: {files / elapsed:.1f} files/s, {seconds / elapsed:.1f} audio-s/s "
+        f"({files} files, {seconds:.1f}s of audio in {elapsed:.1f}s)"
+    )
 
 
 class SpeakerRecognizer:
-    def __init__(self, host="localhost", grpc_port=6334, collection_name="speaker_embeddings", hf_token=None):
-        self.client = QdrantClient(host=host, grpc_port=grpc_port, prefer_grpc=True)
+    def __init__(self, store: VectorStore, collection_name="speaker_embeddings", hf_token=None):
+        self.store = store
         self.collection_name = collection_name
         self.embedding_size = 512
         self._initialize_collection()
@@ -23,58 +146,65 @@ class SpeakerRecognizer:
         device = "cuda" if torch.cuda.is_available() else "cpu"
         click.echo(f"Loading model on {device}...")
 
-        self.model = Model.from_pretrained("pyannote/embedding", use_auth_token=hf_token)
+        self.model = embedding_model(hf_token)
         self.model.eval()
         self.device = device
         self.model = self.model.to(device)
 
     def _initialize_collection(self) -> None:
         try:
-            collections = self.client.get_collections().collections
-            collection_names = [collection.name for collection in collections]
-
-            if self.collection_name not in collection_names:
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=self.embedding_size, distance=Distance.COSINE
-                    ),
-                )
-                click.echo(f"Created collection '{self.collection_name}' in Qdrant")
-            else:
-                click.echo(f"Collection '{self.collection_name}' already exists in Qdrant")
+            self.store.ensure_collection(self.collection_name, self.embedding_size)
+            click.echo(f"Using collection '{self.collection_name}' with {self.store.count(self.collection_name)} points")
         except Exception as e:
-            click.echo(f"Failed to initialize Qdrant collection: {str(e)}")
+            click.echo(f"Failed to initialize collection: {str(e)}")
 
     def process_audio(self, audio_file_path):
-        audio_data, sample_rate = sf.read(audio_file_path)
-
-        if len(audio_data.shape) > 1:
-            audio_data = audio_data[:, 0]
-
-        if audio_data.dtype != np.int16:
-            audio_data = (audio_data * 32768).astype(np.int16)
-
-        waveform = torch.tensor(audio_data, dtype=torch.float32) / 32768.0
-        waveform = waveform.unsqueeze(0).to(self.device)
-
-        with torch.no_grad():
-            embedding = self.model(waveform)
+        # NOTE: Decoded like bulk enrollment, so single files match the enrolled embeddings.
+        decoded = decode_file(audio_file_path)
+        if decoded.error:
+            raise ValueError(f"Failed to decode {audio_file_path}: {decoded.error}")
+        return self.embed_batch([decoded.waveform])[0]
+
+    def embed_batch(self, waveforms: List[np.ndarray], bucket_ratio: float = 1.5) -> np.ndarray:
+        """Embeddings of several waveforms, padded into length buckets and passed through the model together."""
+        embeddings = np.zeros((len(waveforms), self.embedding_size), dtype=np.float32)
+        for bucket in bucket_by_length([len(w) for w in waveforms], bucket_ratio):
+            audio, mask = pad_batch([waveforms[i] for i in bucket])
+            with torch.no_grad():
+                output = self.model(
+                    torch.from_numpy(audio).to(self.device),
+                    weights=torch.from_numpy(mask).to(self.device),
+                )
+            embeddings[bucket] = output.cpu().numpy().reshape(len(bucket), -1)
+        return embeddings
+
+    def enrolled_hashes(self, speaker_id: str) -> Set[str]:
+        points = self.store.scroll(self.collection_name, {"speaker_id": speaker_id})
+        return {point.payload["sha256"] for point in points if "sha256" in point.payload}
+
+    def add_embeddings(self, embeddings: np.ndarray, payloads: List[dict]) -> None:
+        self.store.upsert(
+            self.collection_name,
+            [
+                PointStruct(id=str(uuid.uuid4()), vector=embedding.tolist(), payload=payload)
+                for embedding, payload in zip(embeddings, payloads)
+            ],
+        )
 
-        return embedding.cpu().numpy().flatten()
+    def identify_embeddings(self, embeddings: np.ndarray) -> List[tuple]:
+        """Top speaker and score for every embedding, one batched query."""
+        return [
+            (matches[0].payload.get("speaker_id"), matches[0].score) if matches else (None, 0.0)
+            for matches in self.store.search(self.collection_name, embeddings, limit=1)
+        ]
 
     def identify_speaker(self, audio_file_path, threshold=0.25):
         embedding_np = self.process_audio(audio_file_path)
 
-        search_results = self.client.query_points(
-            collection_name=self.collection_name,
-            query=embedding_np.tolist(),
-            with_payload=True,
-            limit=1,
-        )
+        (matches,) = self.store.search(self.collection_name, embedding_np[None, :], limit=1)
 
-        if search_results.points:
-            top_result = search_results.points[0]
+        if matches:
+            top_result = matches[0]
             found_speaker_id = top_result.payload.get("speaker_id")
             confidence = top_result.score
 
@@ -89,9 +219,9 @@ class SpeakerRecognizer:
             raise ValueError("Generated embedding contains NaN or inf values")
 
         point_id = str(uuid.uuid4())
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=[
+        self.store.upsert(
+            self.collection_name,
+            [
                 PointStruct(
                     id=point_id,
                     vector=embedding_np.tolist(),
@@ -111,41 +241,84 @@ def cli():
 @cli.command()
 @click.argument('folder', type=click.Path(exists=True, file_okay=False, dir_okay=True))
 @click.option('--speaker-id', '-s', required=True, help='ID for the speaker to enroll')
-@click.option('--host', default='localhost', help='Qdrant server host')
-@click.option('--port', default=6334, help='Qdrant server gRPC port')
+@storage_options
 @click.option('--hf-token', help='HuggingFace token for model access')
-def enroll(folder, speaker_id, host, port, hf_token):
-    """Enroll a speaker using all audio files in the specified folder."""
-    recognizer = SpeakerRecognizer(host=host, grpc_port=port, hf_token=hf_token)
+@click.option('--workers', '-w', default=os.cpu_count(), help='Decoding processes')
+@click.option('--batch-size', '-b', default=16, help='Files per model forward pass and upsert')
+@click.option('--output', '-o', help='Write per-file results to a .json or .csv file')
+def enroll(folder, speaker_id, host, port, storage, path, hf_token, workers, batch_size, output):
+    """Enroll a speaker using all audio files in the specified folder.
 
-    audio_files = [f for f in os.listdir(folder) if f.endswith(('.wav', '.mp3', '.flac'))]
+    Files already enrolled for the speaker, by content hash, are skipped, so an
+    interrupted run can simply be started again.
+    """
+    recognizer = SpeakerRecognizer(open_store(storage, host, port, path), hf_token=hf_token)
+
+    audio_files = list_audio_files(folder)
 
     if not audio_files:
         click.echo(f"No audio files found in {folder}")
         return
 
-    success_count = 0
-    for audio_file in audio_files:
-        audio_path = os.path.join(folder, audio_file)
-        try:
-            point_id = recognizer.add_speaker(audio_path, speaker_id)
-            success_count += 1
-            click.echo(f"✓ Enrolled {audio_file}")
-        except Exception as e:
-            click.echo(f"✗ Error processing {audio_file}: {e}")
+    enrolled = recognizer.enrolled_hashes(speaker_id)
+    rows, audio_seconds = [], 0.0
+    started = time.perf_counter()
+
+    with click.progressbar(length=len(audio_files), label='Enrolling audio files') as bar:
+        for batch in batched(decode_files(audio_files, workers, enrolled), batch_size):
+            fresh = []
+            for decoded in batch:
+                name = os.path.basename(decoded.path)
+                if decoded.error:
+                    rows.append({"file": name, "sha256": decoded.sha256, "status": "failed", "error": decoded.error})
+                elif decoded.waveform is None or decoded.sha256 in enrolled:
+                    rows.append({"file": name, "sha256": decoded.sha256, "status": "skipped", "error": None})
+                else:
+                    enrolled.add(decoded.sha256)
+                    fresh.append(decoded)
+
+            if fresh:
+                embeddings = recognizer.embed_batch([d.waveform for d in fresh])
+                valid = np.isfinite(embeddings).all(axis=1)
+                recognizer.add_embeddings(
+                    embeddings[valid],
+                    [
+                        {"speaker_id": speaker_id, "sha256": d.sha256, "file": os.path.basename(d.path)}
+                        for d, ok in zip(fresh, valid)
+                        if ok
+                    ],
+                )
+                for decoded, ok in zip(fresh, valid):
+                    audio_seconds += decoded.seconds
+                    rows.append({
+                        "file": os.path.basename(decoded.path),
+                        "sha256": decoded.sha256,
+                        "status": "enrolled" if ok else "failed",
+                        "error": None if ok else "embedding contains NaN or inf values",
+                    })
+
+            bar.update(len(batch))
+
+    elapsed = time.perf_counter() - started
+    counts = {status: sum(1 for r in rows if r["status"] == status) for status in ("enrolled", "skipped", "failed")}
+    click.echo(
+        f"Enrolled {counts['enrolled']}/{len(audio_files)} files for speaker '{speaker_id}' "
+        f"({counts['skipped']} already enrolled, {counts['failed']} failed)"
+    )
+    report_throughput(len(audio_files), audio_seconds, elapsed)
 
-    click.echo(f"Successfully enrolled {success_count}/{len(audio_files)} files for speaker '{speaker_id}'")
+    if output:
+        write_results(rows, output)
 
 
 @cli.command()
 @click.argument('audio_file', type=click.Path(exists=True, file_okay=True, dir_okay=False))
 @click.option('--threshold', '-t', default=0.25, help='Confidence threshold (0-1)')
-@click.option('--host', default='localhost', help='Qdrant server host')
-@click.option('--port', default=6334, help='Qdrant server gRPC port')
+@storage_options
 @click.option('--hf-token', help='HuggingFace token for model access')
-def identify(audio_file, threshold, host, port, hf_token):
+def identify(audio_file, threshold, host, port, storage, path, hf_token):
     """Identify a speaker from a single audio file."""
-    recognizer = SpeakerRecognizer(host=host, grpc_port=port, hf_token=hf_token)
+    recognizer = SpeakerRecognizer(open_store(storage, host, port, path), hf_token=hf_token)
 
     try:
         speaker_id, confidence = recognizer.identify_speaker(audio_file, threshold=threshold)
@@ -160,32 +333,53 @@ def identify(audio_file, threshold, host, port, hf_token):
 @cli.command()
 @click.argument('folder', type=click.Path(exists=True, file_okay=False, dir_okay=True))
 @click.option('--threshold', '-t', default=0.25, help='Confidence threshold (0-1)')
-@click.option('--host', default='localhost', help='Qdrant server host')
-@click.option('--port', default=6334, help='Qdrant server gRPC port')
+@storage_options
 @click.option('--hf-token', help='HuggingFace token for model access')
-def identify_batch(folder, threshold, host, port, hf_token):
+@click.option('--workers', '-w', default=os.cpu_count(), help='Decoding processes')
+@click.option('--batch-size', '-b', default=16, help='Files per model forward pass and query')
+@click.option('--output', '-o', help='Write per-file results to a .json or .csv file')
+def identify_batch(folder, threshold, host, port, storage, path, hf_token, workers, batch_size, output):
     """Identify speakers from a folder of audio files and show results summary."""
-    recognizer = SpeakerRecognizer(host=host, grpc_port=port, hf_token=hf_token)
+    recognizer = SpeakerRecognizer(open_store(storage, host, port, path), hf_token=hf_token)
 
-    audio_files = [f for f in os.listdir(folder) if f.endswith(('.wav', '.mp3', '.flac'))]
+    audio_files = list_audio_files(folder)
 
     if not audio_files:
         click.echo(f"No audio files found in {folder}")
         return
 
     results = {}
-    processed = 0
-
-    with click.progressbar(audio_files, label='Processing audio files') as bar:
-        for audio_file in bar:
-            audio_path = os.path.join(folder, audio_file)
-            try:
-                speaker_id, confidence = recognizer.identify_speaker(audio_path, threshold=threshold)
-                if speaker_id:
-                    results[speaker_id] = results.get(speaker_id, 0) + 1
-                processed += 1
-            except Exception:
-                continue
+    rows, processed, audio_seconds = [], 0, 0.0
+    started = time.perf_counter()
+
+    with click.progressbar(length=len(audio_files), label='Processing audio files') as bar:
+        for batch in batched(decode_files(audio_files, workers), batch_size):
+            decoded = [d for d in batch if d.waveform is not None]
+            rows.extend(
+                {"file": os.path.basename(d.path), "speaker_id": None, "confidence": None, "seconds": 0.0}
+                for d in batch
+                if d.waveform is None
+            )
+
+            if decoded:
+                matches = recognizer.identify_embeddings(recognizer.embed_batch([d.waveform for d in decoded]))
+                for d, (speaker_id, confidence) in zip(decoded, matches):
+                    if confidence < threshold:
+                        speaker_id = None
+                    if speaker_id:
+                        results[speaker_id] = results.get(speaker_id, 0) + 1
+                    processed += 1
+                    audio_seconds += d.seconds
+                    rows.append({
+                        "file": os.path.basename(d.path),
+                        "speaker_id": speaker_id,
+                        "confidence": round(float(confidence), 4),
+                        "seconds": round(d.seconds, 2),
+                    })
+
+            bar.update(len(batch))
+
+    elapsed = time.perf_counter() - started
 
     click.echo("\nResults summary:")
     if not results:
@@ -198,6 +392,50 @@ def identify_batch(folder, threshold, host, port, hf_token):
             percentage = (count / processed) * 100
             click.echo(f"  {speaker}: {count} files ({percentage:.1f}%)")
 
+    report_throughput(len(audio_files), audio_seconds, elapsed)
+
+    if output:
+        write_results(rows, output)
+
+
+@cli.command()
+@click.option('--collection', default='unknown_speaker_embeddings', help='Unknown speakers collection')
+@storage_options
+def clusters(collection, host, port, storage, path):
+    """List unknown pseudo-speakers, most frequently heard first."""
+    store = open_store(storage, host, port, path)
+    store.ensure_collection(collection, 512)
+    found = clusters_from_points(store.scroll(collection))
+
+    if not found:
+        click.echo(f"No unknown speakers in '{collection}'")
+        return
+
+    for cluster in sorted(found, key=lambda c: c.count, reverse=True):
+        last_seen = datetime.fromtimestamp(cluster.last_seen).isoformat(timespec='seconds')
+        click.echo(f"  {cluster.cluster_id}: {cluster.count} segments, last seen {last_seen}")
+
+
+@cli.command()
+@click.argument('cluster_id')
+@click.option('--speaker-id', '-s', required=True, help='ID to give the promoted speaker')
+@click.option('--collection', default='speaker_embeddings', help='Known speakers collection')
+@click.option('--unknown-collection', default='unknown_speaker_embeddings', help='Unknown speakers collection')
+@storage_options
+def promote(cluster_id, speaker_id, collection, unknown_collection, host, port, storage, path):
+    """Promote an unknown pseudo-speaker to a known speaker."""
+    store = open_store(storage, host, port, path)
+    store.ensure_collection(collection, 512)
+    store.ensure_collection(unknown_collection, 512)
+    points = promote_cluster(store, unknown_collection, collection, cluster_id, speaker_id)
+
+    if not points:
+        click.echo(f"No cluster '{cluster_id}' in '{unknown_collection}'")
+        return
+
+    click.echo(f"Promoted {len(points)} embeddings of cluster '{cluster_id}' to speaker '{speaker_id}'")
+    click.echo("A running VoiceID picks the speaker up on restart, or use its 'promote_cluster' service instead.")
+
 
 if __name__ == "__main__":
     cli()